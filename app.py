@@ -1,16 +1,32 @@
-from flask import Flask, render_template, request, redirect, url_for, session, flash, jsonify
-from flask_mysqldb import MySQL
+from flask import Flask, render_template, request, redirect, url_for, session, flash, jsonify, Response
 from werkzeug.security import generate_password_hash, check_password_hash
 from werkzeug.utils import secure_filename
 import os
 import cv2
 import numpy as np
 import base64
+import MySQLdb
 from datetime import datetime, date
-import insightface
-from insightface.app import FaceAnalysis
-import pickle
 from functools import wraps
+from face_gallery import FaceGallery, record_change
+from face_models import FaceModelManager, ModelsNotReady
+from inference_service import InferenceService, InferenceBusy
+from config import Config
+from db_pool import PooledMySQL, PoolExhausted
+from class_sessions import (open_session, close_session, get_roster, note_recognized, recognized_students,
+                            EmptyRoster)
+from attendance_db import mark_present, mark_absent
+from attendance_stats import get_student_stats, percentage
+from attendance_export import (EXPORT_FORMATS, build_export_query, cursor_batches, export_chunks,
+                               export_filename, open_export, xlsx_available)
+from listings import (page_students, page_faculty, page_attendance, to_dicts,
+                      STUDENT_COLUMNS, FACULTY_COLUMNS, ATTENDANCE_COLUMNS)
+from embedding_format import encode_embedding
+from student_templates import add_templates, learn_templates
+from dashboard_stats import Reconciler, bump, get_counters, reconcile
+from attendance_jobs import JobManager, JobQueueFull, JobStore
+from face_tracking import StreamRegistry
+from frame_cache import FrameCache
 
 app = Flask(__name__)
 app.secret_key = 'your-secret-key-change-this-in-production'
@@ -25,63 +41,103 @@ app.config['MYSQL_DB'] = 'attendance_system'
 UPLOAD_FOLDER = 'static/uploads'
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg'}
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
+app.config['MAX_CONTENT_LENGTH'] = Config.MAX_CONTENT_LENGTH
 
-mysql = MySQL(app)
+# Pooled connections: mysql.connection is checked out per request context
+mysql = PooledMySQL(
+    app,
+    min_size=Config.MYSQL_POOL_MIN_SIZE,
+    max_size=Config.MYSQL_POOL_MAX_SIZE,
+    recycle=Config.MYSQL_POOL_RECYCLE,
+    timeout=Config.MYSQL_POOL_TIMEOUT,
+    health_check_interval=Config.MYSQL_POOL_HEALTH_CHECK_INTERVAL
+)
 
-# Initialize Face Recognition
-class FaceRecognitionSystem:
-    def __init__(self):
-        self.app = FaceAnalysis(providers=['CUDAExecutionProvider', 'CPUExecutionProvider'])
-        self.app.prepare(ctx_id=0, det_size=(640, 640))
-        
-    def extract_embedding(self, image):
-        """Extract face embedding from image - returns single face"""
-        faces = self.app.get(image)
-        if len(faces) == 1:
-            return faces[0].embedding, True
-        elif len(faces) == 0:
-            return None, False  # No face detected
-        else:
-            return None, False  # Multiple faces detected
-    
-    def extract_multiple_embeddings(self, image):
-        """
-        Extract embeddings from all detected faces in the image
-        
-        Returns:
-            list of tuples: [(embedding, bbox, confidence), ...]
-            success: boolean
-        """
-        faces = self.app.get(image)
-        
-        if len(faces) == 0:
-            return [], False
-        
-        # Extract all face embeddings with their metadata
-        face_data = []
-        for face in faces:
-            face_info = {
-                'embedding': face.embedding,
-                'bbox': face.bbox,
-                'confidence': face.det_score,
-                'landmarks': face.kps if hasattr(face, 'kps') else None
-            }
-            face_data.append(face_info)
-        
-        return face_data, True
-    
-    def compare_embeddings(self, emb1, emb2, threshold=0.4):
-        """Compare two face embeddings"""
-        similarity = np.dot(emb1, emb2) / (np.linalg.norm(emb1) * np.linalg.norm(emb2))
-        return similarity > threshold, similarity
+# Face recognition models are loaded and warmed up in the background on
+# first use, so importing the app (tests, admin scripts) stays cheap
+def create_face_system():
+    options = dict(
+        use_gpu=Config.USE_GPU,
+        registration_det_size=Config.REGISTRATION_DETECTION_SIZE,
+        attendance_det_sizes=Config.ATTENDANCE_DETECTION_SIZES,
+        max_input_size=Config.MAX_INPUT_SIZE,
+        modules=Config.FACE_MODEL_MODULES
+    )
+    if Config.INFERENCE_WORKERS:
+        # Worker processes with cross-request batching of recognition calls
+        return InferenceService(
+            options,
+            workers=Config.INFERENCE_WORKERS,
+            max_batch=Config.INFERENCE_MAX_BATCH,
+            max_wait_ms=Config.INFERENCE_MAX_WAIT_MS,
+            queue_size=Config.INFERENCE_QUEUE_SIZE,
+            result_timeout=Config.INFERENCE_RESULT_TIMEOUT
+        )
+    from face_recognition_system import FaceRecognitionSystem
+    return FaceRecognitionSystem(**options)
+
+face_models = FaceModelManager(create_face_system, warm_up=Config.FACE_MODEL_WARM_UP)
+
+# Student embeddings, mapped from the shared snapshot and matched with a
+# single matrix multiply
+gallery = FaceGallery(
+    snapshot_dir=Config.GALLERY_SNAPSHOT_DIR,
+    snapshot_tail_rows=Config.GALLERY_SNAPSHOT_TAIL_ROWS,
+    index_kind=Config.FACE_INDEX,
+    index_params={'nlist': Config.FACE_IVF_NLIST, 'nprobe': Config.FACE_IVF_NPROBE}
+)
+
+# Asynchronous /attendance/mark requests (async=1) run on these threads;
+# their state is shared through the database so any worker can report it
+attendance_jobs = JobManager(workers=Config.ATTENDANCE_JOB_WORKERS, ttl=Config.ATTENDANCE_JOB_TTL,
+                             queue_size=Config.ATTENDANCE_JOB_QUEUE_SIZE,
+                             store=JobStore(mysql.pool.connection))
+
+# Last processed frame of each class, to skip unchanged resubmissions
+frame_cache = FrameCache(max_entries=Config.FRAME_CACHE_SIZE)
 
-# Initialize face recognition system
-face_system = FaceRecognitionSystem()
+# Continuous-mode captures and their face trackers
+attendance_streams = StreamRegistry(idle_timeout=Config.STREAM_IDLE_TIMEOUT)
 
 # Helper functions
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
+def read_uploaded_image(file_field='face_image', legacy_field='face_data'):
+    """
+    Decode the uploaded frame into a BGR image
+    
+    Accepts, in order: a multipart file, a raw JPEG/PNG request body
+    (application/octet-stream, image/jpeg or image/png), or the legacy
+    base64 data URL form field. Returns None if no image was sent or it
+    could not be decoded.
+    """
+    if file_field in request.files:
+        stream = request.files[file_field].stream
+        # Small uploads are held in a BytesIO: decode from its buffer without copying
+        buffer = stream.getbuffer() if hasattr(stream, 'getbuffer') else stream.read()
+    elif request.mimetype in ('application/octet-stream', 'image/jpeg', 'image/png'):
+        buffer = request.get_data(cache=False)
+    elif request.form.get(legacy_field):
+        # "data:image/jpeg;base64,<payload>"; anything malformed is no image
+        _, comma, payload = request.form[legacy_field].partition(',')
+        if not comma:
+            return None
+        try:
+            buffer = base64.b64decode(payload)
+        except ValueError:
+            return None
+    else:
+        return None
+    
+    return decode_image(buffer)
+
+def decode_image(buffer):
+    """Decode JPEG/PNG bytes into a BGR image (None if empty or invalid)"""
+    if len(buffer) == 0:
+        return None
+    return cv2.imdecode(np.frombuffer(buffer, np.uint8), cv2.IMREAD_COLOR)
+
 def login_required(f):
     @wraps(f)
     def decorated_function(*args, **kwargs):
@@ -91,7 +147,39 @@ def login_required(f):
         return f(*args, **kwargs)
     return decorated_function
 
+def reconcile_dashboard_counters():
+    with app.app_context():
+        cur = mysql.connection.cursor()
+        try:
+            drift = reconcile(cur)
+            mysql.connection.commit()
+            return drift
+        finally:
+            cur.close()
+
+# Periodically corrects any drift in the dashboard counters
+dashboard_reconciler = Reconciler(reconcile_dashboard_counters, interval=Config.DASHBOARD_RECONCILE_SECONDS)
+
+@app.before_request
+def start_background_work():
+    # Kick off model loading and counter reconciling with the first request of any kind
+    face_models.start()
+    dashboard_reconciler.start()
+
 # Routes
+@app.route('/healthz')
+def healthz():
+    """Liveness: the process is up and serving requests"""
+    return jsonify({'status': 'ok'})
+
+@app.route('/readyz')
+def readyz():
+    """Readiness: face models are loaded and warmed up"""
+    status = face_models.status()
+    ready = status['status'] == 'ready'
+    status['db_pool'] = mysql.pool.stats()
+    return jsonify(status), 200 if ready else 503
+
 @app.route('/')
 def index():
     return render_template('index.html')
@@ -123,28 +211,16 @@ def admin_login():
 def admin_dashboard():
     cur = mysql.connection.cursor()
     
-    # Get statistics
-    cur.execute("SELECT COUNT(*) FROM students")
-    total_students = cur.fetchone()[0]
-    
-    cur.execute("SELECT COUNT(*) FROM faculty")
-    total_faculty = cur.fetchone()[0]
-    
-    # Get today's attendance
-    today = date.today()
-    cur.execute("""
-        SELECT COUNT(DISTINCT student_id) 
-        FROM attendance 
-        WHERE session_date = %s AND status = 'present'
-    """, [today])
-    present_today = cur.fetchone()[0]
+    # Incrementally maintained counters (see dashboard_stats.py)
+    counters = get_counters(cur)
+    mysql.connection.commit()
     
     cur.close()
     
     return render_template('admin_dashboard.html', 
-                         total_students=total_students,
-                         total_faculty=total_faculty,
-                         present_today=present_today)
+                         total_students=counters['total_students'],
+                         total_faculty=counters['total_faculty'],
+                         present_today=counters['present_today'])
 
 @app.route('/admin/logout')
 def admin_logout():
@@ -164,39 +240,67 @@ def register_student():
         mobile = request.form['mobile']
         email = request.form['email']
         address = request.form['address']
+        section = request.form.get('section') or None
         
         # Get face image from webcam
-        face_data = request.form['face_data']
+        image = read_uploaded_image()
+        if image is None:
+            flash('No face image received. Please capture a photo and try again.', 'danger')
+            return redirect(url_for('register_student'))
         
-        # Decode base64 image
-        image_data = base64.b64decode(face_data.split(',')[1])
-        nparr = np.frombuffer(image_data, np.uint8)
-        image = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+        try:
+            face_system = face_models.get(timeout=Config.FACE_MODEL_WAIT_SECONDS)
+        except ModelsNotReady as e:
+            flash(str(e), 'danger')
+            return redirect(url_for('register_student'))
         
         # Extract face embedding (single face for registration)
-        embedding, success = face_system.extract_embedding(image)
+        try:
+            embedding, success = face_system.extract_embedding(image)
+        except InferenceBusy as e:
+            flash(str(e), 'danger')
+            return redirect(url_for('register_student'))
         
         if not success:
             flash('Face not detected or multiple faces detected. Please try again with only one person.', 'danger')
             return redirect(url_for('register_student'))
         
+        # Further captures (other angles/lighting) become extra templates
+        extra_embeddings = []
+        extra_files = request.files.getlist('face_image')[1:Config.TEMPLATE_MAX_PER_STUDENT]
+        for extra_file in extra_files:
+            extra_image = decode_image(extra_file.read())
+            try:
+                extra, ok = face_system.extract_embedding(extra_image) if extra_image is not None else (None, False)
+            except InferenceBusy:
+                extra, ok = None, False
+            if ok:
+                extra_embeddings.append(extra)
+        if len(extra_embeddings) < len(extra_files):
+            flash(f'{len(extra_files) - len(extra_embeddings)} extra capture(s) skipped: '
+                  'no single face found', 'warning')
+        
         # Save photo
         photo_filename = f"{roll_number}_{datetime.now().strftime('%Y%m%d%H%M%S')}.jpg"
         photo_path = os.path.join(app.config['UPLOAD_FOLDER'], 'students', photo_filename)
         os.makedirs(os.path.dirname(photo_path), exist_ok=True)
         cv2.imwrite(photo_path, image)
         
-        # Serialize embedding
-        embedding_blob = pickle.dumps(embedding)
+        # Serialize embedding (fixed-size binary record, see embedding_format.py)
+        embedding_blob = encode_embedding(embedding)
         
         # Insert into database
         cur = mysql.connection.cursor()
         try:
             cur.execute("""
                 INSERT INTO students 
-                (roll_number, name, branch, date_of_birth, mobile_number, mail_id, address, photo_path, face_embedding)
-                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
-            """, (roll_number, name, branch, dob, mobile, email, address, photo_path, embedding_blob))
+                (roll_number, name, branch, section, date_of_birth, mobile_number, mail_id, address, photo_path, face_embedding)
+                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+            """, (roll_number, name, branch, section, dob, mobile, email, address, photo_path, embedding_blob))
+            student_id = cur.lastrowid
+            add_templates(cur, student_id, extra_embeddings)
+            record_change(cur, student_id)
+            bump(cur, 'students', 1)
             mysql.connection.commit()
             flash('Student registered successfully!', 'success')
             return redirect(url_for('admin_dashboard'))
@@ -233,6 +337,7 @@ def register_faculty():
                 INSERT INTO faculty (emp_id, name, department, mobile_number, photo_path)
                 VALUES (%s, %s, %s, %s, %s)
             """, (emp_id, name, department, mobile, photo_path))
+            bump(cur, 'faculty', 1)
             mysql.connection.commit()
             flash('Faculty registered successfully!', 'success')
             return redirect(url_for('admin_dashboard'))
@@ -244,6 +349,241 @@ def register_faculty():
     
     return render_template('register_faculty.html')
 
+@app.route('/attendance/session/start', methods=['POST'])
+@login_required
+def start_session():
+    """
+    Open a class session and resolve its roster (explicit roll numbers,
+    or the students of a branch/section)
+    """
+    faculty_id = request.form['faculty_id']
+    subject = request.form['subject']
+    period = request.form['period']
+    branch = request.form.get('branch')
+    section = request.form.get('section')
+    roll_numbers = [r.strip() for r in request.form.get('roll_numbers', '').replace('\n', ',').split(',')
+                    if r.strip()]
+    
+    cur = mysql.connection.cursor()
+    try:
+        session_id, roster_size, unmatched = open_session(cur, faculty_id, subject, period,
+                                                          branch=branch, section=section,
+                                                          roll_numbers=roll_numbers)
+        mysql.connection.commit()
+        return jsonify({
+            'success': True,
+            'session_id': session_id,
+            'roster_size': roster_size,
+            'unmatched_roll_numbers': unmatched
+        })
+    except EmptyRoster as e:
+        mysql.connection.rollback()
+        return jsonify({
+            'success': False,
+            'message': str(e),
+            'unmatched_roll_numbers': e.unmatched
+        }), 400
+    except Exception as e:
+        mysql.connection.rollback()
+        return jsonify({
+            'success': False,
+            'message': f'Error starting session: {str(e)}'
+        })
+    finally:
+        cur.close()
+
+def recognize_frame(image, faculty_id, subject, period, session_id, report):
+    """
+    Detect, match and record attendance for one decoded frame
+    
+    Returns: (response dict, HTTP status, summary) where summary holds
+    total_faces and students for the frame cache, or None if the outcome
+    must not be cached
+    """
+    report('loading_models', 0.05)
+    try:
+        face_system = face_models.get(timeout=Config.FACE_MODEL_WAIT_SECONDS)
+    except ModelsNotReady as e:
+        return {'success': False, 'message': str(e)}, 503, None
+    
+    # Extract embeddings for ALL faces in the image
+    report('detecting', 0.1)
+    try:
+        face_data_list, success = face_system.extract_multiple_embeddings(image)
+    except InferenceBusy as e:
+        return {'success': False, 'message': str(e)}, 503, None
+    
+    if not success or len(face_data_list) == 0:
+        return {'success': False, 'message': 'No faces detected in the image'}, 200, {'total_faces': 0, 'students': []}
+    
+    # Apply pending enrolments, then match all faces in one shot,
+    # searching the session roster before the whole institution
+    report('matching', 0.6)
+    cur = mysql.connection.cursor()
+    gallery.refresh(cur)
+    roster = get_roster(cur, session_id) if session_id else None
+    matches = gallery.match([f['embedding'] for f in face_data_list], threshold=0.4,
+                            candidates=roster)
+    
+    today = date.today()
+    recognized_students = []
+    recognized = [m for m in matches if m]
+    unrecognized_count = len(matches) - len(recognized)
+    already_marked_count = 0
+    
+    # Write every recognised student in one statement and one commit
+    report('saving', 0.8)
+    # Confident roster matches also teach the gallery the student's current look
+    sightings = [(m[0], face['embedding'], m[3]) for face, m in zip(face_data_list, matches)
+                 if m and (roster is None or m[0] in roster)]
+    try:
+        marked_ids, already_ids = mark_present(cur, recognized, faculty_id, subject, today, period)
+        for student_id in learn_templates(cur, sightings,
+                                          min_similarity=Config.TEMPLATE_LEARN_MIN_SIMILARITY,
+                                          max_similarity=Config.TEMPLATE_LEARN_MAX_SIMILARITY,
+                                          max_templates=Config.TEMPLATE_MAX_PER_STUDENT):
+            record_change(cur, student_id)
+        mysql.connection.commit()
+    except Exception as e:
+        mysql.connection.rollback()
+        cur.close()
+        return {'success': False, 'message': f'Error marking attendance: {str(e)}'}, 200, None
+    if session_id:
+        note_recognized(session_id, marked_ids | already_ids)
+    
+    for student_id, roll_no, name, max_similarity in recognized:
+        # A second face matching the same student counts as already marked
+        if student_id in marked_ids:
+            marked_ids.discard(student_id)
+            status = 'marked'
+        else:
+            already_marked_count += 1
+            status = 'already_marked'
+        
+        recognized_students.append({
+            'name': name,
+            'roll_number': roll_no,
+            'status': status,
+            'confidence': float(max_similarity),
+            'in_roster': roster is None or student_id in roster
+        })
+    
+    cur.close()
+    
+    # Prepare response message
+    total_faces = len(face_data_list)
+    summary = {'total_faces': total_faces, 'students': recognized_students}
+    marked_count = len([s for s in recognized_students if s['status'] == 'marked'])
+    
+    if marked_count > 0:
+        message = f"Marked {marked_count} student(s) present. "
+        if already_marked_count > 0:
+            message += f"{already_marked_count} already marked. "
+        if unrecognized_count > 0:
+            message += f"{unrecognized_count} face(s) not recognized."
+        
+        return {
+            'success': True,
+            'message': message,
+            'details': {
+                'total_faces': total_faces,
+                'marked': marked_count,
+                'already_marked': already_marked_count,
+                'unrecognized': unrecognized_count,
+                'students': recognized_students
+            }
+        }, 200, summary
+    elif already_marked_count > 0:
+        return {
+            'success': False,
+            'message': f"All {already_marked_count} student(s) already marked present",
+            'details': {
+                'total_faces': total_faces,
+                'already_marked': already_marked_count,
+                'students': recognized_students
+            }
+        }, 200, summary
+    else:
+        return {
+            'success': False,
+            'message': f"Detected {total_faces} face(s) but none recognized",
+            'details': {
+                'total_faces': total_faces,
+                'unrecognized': unrecognized_count
+            }
+        }, 200, summary
+
+def process_attendance_frame(image, faculty_id, subject, period, session_id=None, progress=None):
+    """
+    Record attendance for one frame, skipping work the last frame of the
+    same class already did
+    
+    Runs inside a request, or inside an app context on an attendance job
+    thread. ``progress(stage, fraction)`` is called as each stage starts.
+    
+    Returns: (response dict, HTTP status)
+    """
+    def report(stage, fraction):
+        if progress:
+            progress(stage, fraction)
+    
+    report('checking', 0.02)
+    # A new session for the same class (e.g. re-opened with another roster)
+    # must not reuse the last one's frames
+    key = (faculty_id, subject, str(period), str(session_id or ''), date.today())
+    decision, signature, previous, region = frame_cache.check(key, image)
+    
+    if decision == 'hit':
+        return unchanged_frame_response(previous, 'Frame unchanged since the last capture'), 200
+    
+    if decision == 'region':
+        # Only part of the class moved: run the models on that part alone
+        x1, y1, x2, y2 = region
+        payload, status, summary = recognize_frame(image[y1:y2, x1:x2], faculty_id, subject, period,
+                                                   session_id, report)
+        if summary is None:
+            return payload, status
+        frame_cache.region_processed(region, image.shape)
+        
+        # Students outside the changed region are still those of the last frame
+        students = {s['roll_number']: dict(s, status='already_marked') for s in previous['students']}
+        students.update({s['roll_number']: s for s in summary['students']})
+        merged = {
+            'total_faces': max(previous['total_faces'], len(students)),
+            'students': list(students.values())
+        }
+        frame_cache.store(key, signature, merged)
+        
+        if summary['total_faces'] == 0:
+            return unchanged_frame_response(merged, 'No new faces in the changed area'), 200
+        payload['details']['total_faces'] = merged['total_faces']
+        payload['region'] = list(region)
+        return payload, status
+    
+    payload, status, summary = recognize_frame(image, faculty_id, subject, period, session_id, report)
+    if summary is not None:
+        frame_cache.store(key, signature, summary)
+    return payload, status
+
+def unchanged_frame_response(summary, reason):
+    """Response for a frame whose faces were all handled by an earlier one"""
+    students = [dict(s, status='already_marked') for s in summary['students']]
+    return {
+        'success': False,
+        'cached': True,
+        'message': f"{reason} - {len(students)} student(s) already marked, nothing new to record",
+        'details': {
+            'total_faces': summary['total_faces'],
+            'already_marked': len(students),
+            'students': students
+        }
+    }
+
+def run_attendance_job(*args, **kwargs):
+    # Job threads have no request: give them an app context for mysql.connection
+    with app.app_context():
+        return process_attendance_frame(*args, **kwargs)
+
 @app.route('/attendance/mark', methods=['GET', 'POST'])
 @login_required
 def mark_attendance():
@@ -256,165 +596,189 @@ def mark_attendance():
         return render_template('mark_attendance.html', faculty_list=faculty_list)
     
     if request.method == 'POST':
-        faculty_id = request.form['faculty_id']
-        subject = request.form['subject']
-        period = request.form['period']
-        face_data = request.form['face_data']
+        # Decode the image first: a raw octet-stream body carries the
+        # session fields in the query string instead of the form
+        image = read_uploaded_image()
+        faculty_id = request.values['faculty_id']
+        subject = request.values['subject']
+        period = request.values['period']
+        session_id = request.values.get('session_id')
         
-        # Decode image
-        image_data = base64.b64decode(face_data.split(',')[1])
-        nparr = np.frombuffer(image_data, np.uint8)
-        image = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+        if image is None:
+            return jsonify({'success': False, 'message': 'No image received or image could not be decoded'}), 400
         
-        # Extract embeddings for ALL faces in the image
-        face_data_list, success = face_system.extract_multiple_embeddings(image)
+        if request.values.get('async') == '1':
+            # Hand the frame to a job thread and answer straight away
+            try:
+                job = attendance_jobs.submit(run_attendance_job, image, faculty_id, subject, period,
+                                             session_id, owner=session.get('admin_id'))
+            except JobQueueFull as e:
+                return jsonify({'success': False, 'message': str(e)}), 503
+            return jsonify({
+                'success': True,
+                'job_id': job.id,
+                'status_url': url_for('attendance_job_status', job_id=job.id),
+                'events_url': url_for('attendance_job_events', job_id=job.id)
+            }), 202
         
-        if not success or len(face_data_list) == 0:
-            return jsonify({'success': False, 'message': 'No faces detected in the image'})
+        result, status_code = process_attendance_frame(image, faculty_id, subject, period, session_id)
+        return jsonify(result), status_code
+
+@app.route('/attendance/jobs/<job_id>')
+@login_required
+def attendance_job_status(job_id):
+    """Poll an attendance job: current stage, and the result once done"""
+    job = attendance_jobs.get(job_id, owner=session.get('admin_id'))
+    if job is None:
+        return jsonify({'success': False, 'message': 'Unknown or expired job'}), 404
+    return jsonify(job.to_dict())
+
+@app.route('/attendance/jobs/<job_id>/events')
+@login_required
+def attendance_job_events(job_id):
+    """Server-Sent Events: one event per stage, then the result"""
+    job = attendance_jobs.get(job_id, owner=session.get('admin_id'))
+    if job is None:
+        return jsonify({'success': False, 'message': 'Unknown or expired job'}), 404
+    return Response(attendance_jobs.stream(job), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@app.route('/attendance/cache/stats')
+@login_required
+def frame_cache_stats():
+    """Frames skipped entirely (hits) or cropped to a changed region"""
+    return jsonify(frame_cache.stats())
+
+@app.route('/attendance/stream/start', methods=['POST'])
+@login_required
+def start_attendance_stream():
+    """Open a continuous-mode capture for the current class"""
+    stream = attendance_streams.open(
+        session.get('admin_id'),
+        request.form['faculty_id'],
+        request.form['subject'],
+        request.form['period'],
+        session_id=request.form.get('session_id') or None
+    )
+    return jsonify({
+        'success': True,
+        'stream_id': stream.id,
+        'frame_url': url_for('attendance_stream_frame', stream_id=stream.id),
+        'stop_url': url_for('stop_attendance_stream', stream_id=stream.id),
+        'interval_ms': Config.STREAM_FRAME_INTERVAL_MS
+    })
+
+@app.route('/attendance/stream/<stream_id>/frame', methods=['POST'])
+@login_required
+def attendance_stream_frame(stream_id):
+    """
+    Process one continuous-mode frame
+    
+    Every frame is detected; only faces on new or uncertain tracks are
+    embedded and matched. Students are marked the first time a track
+    resolves to them.
+    """
+    stream = attendance_streams.get(stream_id, owner=session.get('admin_id'))
+    if stream is None:
+        return jsonify({'success': False, 'message': 'Unknown or expired stream'}), 404
+    
+    image = read_uploaded_image()
+    if image is None:
+        return jsonify({'success': False, 'message': 'No image received or image could not be decoded'}), 400
+    
+    try:
+        face_system = face_models.get(timeout=Config.FACE_MODEL_WAIT_SECONDS)
+    except ModelsNotReady as e:
+        return jsonify({'success': False, 'message': str(e)}), 503
+    
+    with stream.lock:
+        tracker = stream.tracker
+        try:
+            bboxes, kpss = face_system.detect_faces(image)
+            tracks, pending = tracker.update(bboxes)
+            embeddings = face_system.embed_faces(image, kpss[pending]) if pending else []
+        except InferenceBusy as e:
+            return jsonify({'success': False, 'message': str(e)}), 503
         
-        # Get all students from database
         cur = mysql.connection.cursor()
-        cur.execute("SELECT id, roll_number, name, face_embedding FROM students")
-        students = cur.fetchall()
-        
-        today = date.today()
-        recognized_students = []
-        unrecognized_count = 0
-        already_marked_count = 0
-        
-        # Process each detected face
-        for face_info in face_data_list:
-            detected_embedding = face_info['embedding']
-            detected_confidence = face_info['confidence']
-            
-            # Try to match with database
-            best_match = None
-            max_similarity = 0
+        try:
+            if pending:
+                gallery.refresh(cur)
+                roster = get_roster(cur, stream.session_id) if stream.session_id else None
+                matches = gallery.match(embeddings, threshold=0.4, candidates=roster)
+                for index, match in zip(pending, matches):
+                    tracker.resolve(tracks[index], match)
             
-            for student in students:
-                student_id, roll_no, name, emb_blob = student
-                stored_embedding = pickle.loads(emb_blob)
-                is_match, similarity = face_system.compare_embeddings(
-                    detected_embedding, 
-                    stored_embedding,
-                    threshold=0.4
-                )
-                
-                if is_match and similarity > max_similarity:
-                    max_similarity = similarity
-                    best_match = (student_id, roll_no, name)
+            # Write students seen for the first time in this stream
+            newcomers = {}
+            for track in tracks:
+                if track.identity and track.identity[0] not in stream.marked:
+                    newcomers[track.identity[0]] = track.identity + (track.similarity,)
             
-            # If match found, mark attendance
-            if best_match:
-                student_id, roll_no, name = best_match
-                
-                # Check if already marked
-                cur.execute("""
-                    SELECT id FROM attendance 
-                    WHERE student_id = %s AND session_date = %s AND period_number = %s
-                """, (student_id, today, period))
-                
-                existing = cur.fetchone()
-                
-                if existing:
-                    already_marked_count += 1
-                    recognized_students.append({
-                        'name': name,
-                        'roll_number': roll_no,
-                        'status': 'already_marked',
-                        'confidence': float(max_similarity)
-                    })
-                else:
-                    # Mark attendance
-                    cur.execute("""
-                        INSERT INTO attendance 
-                        (student_id, faculty_id, subject, session_date, period_number, status, confidence_score)
-                        VALUES (%s, %s, %s, %s, %s, 'present', %s)
-                    """, (student_id, faculty_id, subject, today, period, float(max_similarity)))
-                    
-                    mysql.connection.commit()
-                    
-                    recognized_students.append({
-                        'name': name,
-                        'roll_number': roll_no,
-                        'status': 'marked',
-                        'confidence': float(max_similarity)
-                    })
-            else:
-                unrecognized_count += 1
-        
-        cur.close()
-        
-        # Prepare response message
-        total_faces = len(face_data_list)
-        marked_count = len([s for s in recognized_students if s['status'] == 'marked'])
+            marked_ids = set()
+            if newcomers:
+                marked_ids, _ = mark_present(cur, list(newcomers.values()), stream.faculty_id,
+                                             stream.subject, date.today(), stream.period)
+                mysql.connection.commit()
+                stream.marked.update(newcomers)
+                if stream.session_id:
+                    note_recognized(stream.session_id, newcomers)
+        except Exception as e:
+            mysql.connection.rollback()
+            return jsonify({'success': False, 'message': f'Error marking attendance: {str(e)}'})
+        finally:
+            cur.close()
         
-        if marked_count > 0:
-            message = f"Marked {marked_count} student(s) present. "
-            if already_marked_count > 0:
-                message += f"{already_marked_count} already marked. "
-            if unrecognized_count > 0:
-                message += f"{unrecognized_count} face(s) not recognized."
-            
-            return jsonify({
-                'success': True,
-                'message': message,
-                'details': {
-                    'total_faces': total_faces,
-                    'marked': marked_count,
-                    'already_marked': already_marked_count,
-                    'unrecognized': unrecognized_count,
-                    'students': recognized_students
-                }
-            })
-        elif already_marked_count > 0:
-            return jsonify({
-                'success': False,
-                'message': f"All {already_marked_count} student(s) already marked present",
-                'details': {
-                    'total_faces': total_faces,
-                    'already_marked': already_marked_count,
-                    'students': recognized_students
-                }
-            })
-        else:
-            return jsonify({
-                'success': False,
-                'message': f"Detected {total_faces} face(s) but none recognized",
-                'details': {
-                    'total_faces': total_faces,
-                    'unrecognized': unrecognized_count
-                }
-            })
+        return jsonify({
+            'success': True,
+            'faces': [{
+                'track_id': track.id,
+                'bbox': [float(v) for v in track.bbox],
+                'name': track.identity[2] if track.identity else None,
+                'roll_number': track.identity[1] if track.identity else None,
+                'confidence': track.similarity
+            } for track in tracks],
+            'newly_marked': [{
+                'name': name,
+                'roll_number': roll_no,
+                'status': 'marked' if student_id in marked_ids else 'already_marked',
+                'confidence': float(similarity)
+            } for student_id, roll_no, name, similarity in newcomers.values()],
+            'stats': tracker.stats()
+        })
+
+@app.route('/attendance/stream/<stream_id>/stop', methods=['POST'])
+@login_required
+def stop_attendance_stream(stream_id):
+    stream = attendance_streams.get(stream_id, owner=session.get('admin_id'))
+    if stream is None:
+        return jsonify({'success': False, 'message': 'Unknown or expired stream'}), 404
+    attendance_streams.close(stream_id)
+    return jsonify({'success': True, 'marked': len(stream.marked), 'stats': stream.tracker.stats()})
 
 @app.route('/attendance/end-session', methods=['POST'])
 @login_required
 def end_session():
     """
-    Mark all students who haven't been marked as absent when session ends
+    Mark the session's students who haven't been marked as absent when it ends
     """
     faculty_id = request.form['faculty_id']
     subject = request.form['subject']
     period = request.form['period']
+    session_id = request.form.get('session_id')
     today = date.today()
     
     cur = mysql.connection.cursor()
     
     try:
-        # Mark absent for all students who don't have attendance record
-        cur.execute("""
-            INSERT INTO attendance (student_id, faculty_id, subject, session_date, period_number, status)
-            SELECT s.id, %s, %s, %s, %s, 'absent'
-            FROM students s
-            WHERE NOT EXISTS (
-                SELECT 1 FROM attendance a 
-                WHERE a.student_id = s.id 
-                AND a.session_date = %s 
-                AND a.period_number = %s
-            )
-        """, (faculty_id, subject, today, period, today, period))
-        
-        absent_count = cur.rowcount
+        # Absent = the session's roster minus everyone already marked; without
+        # a session (or roster criteria) every student is considered
+        roster = get_roster(cur, session_id) if session_id else None
+        recognized = recognized_students(session_id) if session_id else ()
+        absent_count = mark_absent(cur, faculty_id, subject, today, period,
+                                   roster=roster, recognized=recognized)
+        if session_id:
+            close_session(cur, session_id)
         mysql.connection.commit()
         
         return jsonify({
@@ -432,45 +796,157 @@ def end_session():
     finally:
         cur.close()
 
+def page_args():
+    """(cursor, limit) for a paginated listing, limit clamped to the configured maximum"""
+    limit = request.args.get('limit', Config.LISTING_PAGE_SIZE, type=int)
+    return request.args.get('cursor') or None, max(1, min(limit, Config.LISTING_MAX_PAGE_SIZE))
+
+def filter_args(*names):
+    """The non-empty query string filters among ``names``"""
+    return {name: request.args[name].strip() for name in names if request.args.get(name, '').strip()}
+
+def listing_page(fetch, **filters):
+    """Run a page query for an HTML listing; an invalid cursor restarts at the first page"""
+    after, limit = page_args()
+    cur = mysql.connection.cursor()
+    try:
+        try:
+            rows, next_cursor = fetch(cur, after=after, limit=limit, **filters)
+        except ValueError:
+            rows, next_cursor = fetch(cur, limit=limit, **filters)
+            after = None
+        # Unfiltered student/faculty listings show totals from the dashboard counters
+        totals = None if filters else get_counters(cur)
+        mysql.connection.commit()
+    finally:
+        cur.close()
+    return rows, next_cursor, after is not None, totals
+
+def listing_json(fetch, columns, **filters):
+    """JSON variant of a paginated listing"""
+    after, limit = page_args()
+    cur = mysql.connection.cursor()
+    try:
+        rows, next_cursor = fetch(cur, after=after, limit=limit, **filters)
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    finally:
+        cur.close()
+    return jsonify({'success': True, 'items': to_dicts(columns, rows),
+                    'next_cursor': next_cursor, 'limit': limit})
+
+def attendance_filters():
+    filters = filter_args('search', 'period', 'status', 'subject')
+    filters['session_date'] = request.args.get('date') or date.today().isoformat()
+    return filters
+
 @app.route('/attendance/view')
 @login_required
 def view_attendance():
-    date_filter = request.args.get('date', date.today())
+    filters = attendance_filters()
+    attendance_records, next_cursor, paged, _ = listing_page(page_attendance, **filters)
     
-    cur = mysql.connection.cursor()
-    cur.execute("""
-        SELECT s.roll_number, s.name, a.subject, a.period_number, 
-               a.status, a.marked_at, a.confidence_score
-        FROM attendance a
-        JOIN students s ON a.student_id = s.id
-        WHERE a.session_date = %s
-        ORDER BY a.period_number, s.roll_number
-    """, [date_filter])
-    
-    attendance_records = cur.fetchall()
-    cur.close()
+    return render_template('view_attendance.html', records=attendance_records,
+                           date=filters.pop('session_date'), filters=filters,
+                           next_cursor=next_cursor, paged=paged)
+
+@app.route('/attendance/export')
+@login_required
+def export_attendance():
+    """Stream attendance for a date range as CSV (optionally gzip'd) or XLSX"""
+    try:
+        start = datetime.strptime(request.args.get('start') or date.today().isoformat(), '%Y-%m-%d').date()
+        end = datetime.strptime(request.args.get('end') or start.isoformat(), '%Y-%m-%d').date()
+    except ValueError:
+        return jsonify({'success': False, 'message': 'Dates must be YYYY-MM-DD'}), 400
+    if end < start:
+        return jsonify({'success': False, 'message': 'End date is before start date'}), 400
+    
+    fmt = request.args.get('format', 'csv')
+    if fmt not in EXPORT_FORMATS:
+        return jsonify({'success': False, 'message': f'Unknown format: {fmt}'}), 400
+    if fmt == 'xlsx' and not xlsx_available():
+        return jsonify({'success': False, 'message': 'XLSX export needs xlsxwriter installed'}), 501
+    compress = request.args.get('gzip') == '1' and fmt == 'csv'
     
-    return render_template('view_attendance.html', records=attendance_records, date=date_filter)
+    filters = filter_args('faculty_id', 'subject', 'branch', 'section')
+    sql, params = build_export_query(start, end, **filters)
+    
+    # A dedicated connection (the body is sent after the request context
+    # ends), checked out and queried before the 200 goes out so a busy pool
+    # or a failing query is a 503 rather than a truncated file
+    try:
+        conn = mysql.pool.acquire()
+    except (PoolExhausted, MySQLdb.Error) as e:
+        return jsonify({'success': False, 'message': f'Export unavailable, please retry: {e}'}), 503
+    try:
+        cursor = open_export(conn, sql, params)
+    except MySQLdb.Error as e:
+        mysql.pool.release(conn, discard=True)
+        return jsonify({'success': False, 'message': f'Export failed, please retry: {e}'}), 503
+    
+    released = []
+    
+    def release(discard):
+        # Once only: after the first release the connection may be someone else's
+        if not released:
+            released.append(True)
+            mysql.pool.release(conn, discard=discard)
+    
+    def generate():
+        # Closed (not drained) if the client goes away before the last row
+        finished = False
+        try:
+            yield from export_chunks(cursor_batches(cursor, Config.EXPORT_BATCH_ROWS), fmt, compress)
+            finished = True
+        finally:
+            release(discard=not finished)
+    
+    mimetypes = {
+        'csv': 'text/csv',
+        'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+    }
+    filename = export_filename(start, end, fmt, compress)
+    response = Response(generate(), mimetype='application/gzip' if compress else mimetypes[fmt],
+                        headers={'Content-Disposition': f'attachment; filename="{filename}"'})
+    # A body that is never iterated never reaches the generator's finally
+    response.call_on_close(lambda: release(discard=True))
+    return response
 
 @app.route('/students/list')
 @login_required
 def list_students():
-    cur = mysql.connection.cursor()
-    cur.execute("SELECT id, roll_number, name, branch, mobile_number, mail_id FROM students")
-    students = cur.fetchall()
-    cur.close()
+    filters = filter_args('search', 'branch', 'section')
+    students, next_cursor, paged, totals = listing_page(page_students, **filters)
     
-    return render_template('list_students.html', students=students)
+    return render_template('list_students.html', students=students, filters=filters,
+                           next_cursor=next_cursor, paged=paged,
+                           total=totals['total_students'] if totals else None)
 
 @app.route('/faculty/list')
 @login_required
 def list_faculty():
-    cur = mysql.connection.cursor()
-    cur.execute("SELECT id, emp_id, name, department, mobile_number FROM faculty")
-    faculty = cur.fetchall()
-    cur.close()
+    filters = filter_args('search', 'department')
+    faculty, next_cursor, paged, totals = listing_page(page_faculty, **filters)
     
-    return render_template('list_faculty.html', faculty=faculty)
+    return render_template('list_faculty.html', faculty=faculty, filters=filters,
+                           next_cursor=next_cursor, paged=paged,
+                           total=totals['total_faculty'] if totals else None)
+
+@app.route('/api/attendance')
+@login_required
+def api_attendance():
+    return listing_json(page_attendance, ATTENDANCE_COLUMNS, **attendance_filters())
+
+@app.route('/api/students')
+@login_required
+def api_students():
+    return listing_json(page_students, STUDENT_COLUMNS, **filter_args('search', 'branch', 'section'))
+
+@app.route('/api/faculty')
+@login_required
+def api_faculty():
+    return listing_json(page_faculty, FACULTY_COLUMNS, **filter_args('search', 'department'))
 
 @app.route('/reports/student/<int:student_id>')
 @login_required
@@ -490,30 +966,25 @@ def student_report(student_id):
     """, [student_id])
     records = cur.fetchall()
     
-    # Calculate percentage
-    cur.execute("""
-        SELECT 
-            COUNT(*) as total,
-            SUM(CASE WHEN status = 'present' THEN 1 ELSE 0 END) as present
-        FROM attendance
-        WHERE student_id = %s
-    """, [student_id])
-    stats = cur.fetchone()
+    # Totals come from the materialized aggregates, not the history
+    present, total, subjects = get_student_stats(cur, student_id)
     
     cur.close()
     
-    percentage = (stats[1] / stats[0] * 100) if stats[0] > 0 else 0
-    
     return render_template('student_report.html', 
                          student=student, 
                          records=records,
-                         total=stats[0],
-                         present=stats[1],
-                         percentage=percentage)
+                         total=total,
+                         present=present,
+                         percentage=percentage(present, total),
+                         subjects=[(subject, p, t, percentage(p, t)) for subject, p, t in subjects])
 
 if __name__ == '__main__':
     # Create upload directories
     os.makedirs(os.path.join(UPLOAD_FOLDER, 'students'), exist_ok=True)
     os.makedirs(os.path.join(UPLOAD_FOLDER, 'faculty'), exist_ok=True)
     
+    # Start loading models while the server comes up
+    face_models.start()
+    
     app.run(debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
@@ -0,0 +1,190 @@
+"""
+Batched attendance writes.
+
+A classroom frame produces one bulk pre-read and one multi-row
+INSERT ... ON DUPLICATE KEY UPDATE against unique_attendance, however many
+faces it contains. The dashboard counters and the attendance aggregates
+are updated in the same transaction; callers commit once afterwards.
+
+Marking a whole period absent without a roster stays in MySQL: the
+candidates go into a temporary table, as in the mark_absent_students
+procedure, and the attendance rows and aggregates are filled from it with
+INSERT ... SELECT.
+"""
+
+from attendance_stats import rebuild, rebuild_from_table, record_attendance
+from dashboard_stats import bump, present_key
+
+
+def _record_inserted(cursor, inserted, expected, rows):
+    """
+    Update the aggregates for an INSERT ... ON DUPLICATE KEY UPDATE id = id
+
+    ``inserted`` is the statement's affected row count. When it is short of
+    ``expected`` a concurrent writer got some rows in first and we can't
+    tell which, so those students are recomputed from attendance instead.
+    """
+    if inserted == expected:
+        record_attendance(cursor, rows)
+    else:
+        rebuild(cursor, {student_id for student_id, _, _ in rows})
+
+
+def mark_present(cursor, matches, faculty_id, subject, session_date, period):
+    """
+    Mark recognised students present for one period
+
+    Args:
+        matches: iterable of (student_id, roll_number, name, similarity)
+
+    Returns:
+        (marked, already_marked): sets of student ids newly marked present
+        and already holding a row for this date/period
+    """
+    # Keep the most confident sighting when a student appears twice
+    best = {}
+    for student_id, _roll_no, _name, similarity in matches:
+        if student_id not in best or similarity > best[student_id]:
+            best[student_id] = similarity
+    if not best:
+        return set(), set()
+
+    student_ids = list(best)
+    placeholders = ', '.join(['%s'] * len(student_ids))
+    # One read of the day's rows answers both "already marked this period"
+    # and "already counted present today" (for the dashboard counter)
+    cursor.execute(f"""
+        SELECT student_id, period_number, status FROM attendance
+        WHERE session_date = %s AND student_id IN ({placeholders})
+    """, [session_date] + student_ids)
+    already_marked = set()
+    present_today = set()
+    for student_id, period_number, status in cursor.fetchall():
+        if str(period_number) == str(period):
+            already_marked.add(student_id)
+        if status == 'present':
+            present_today.add(student_id)
+
+    new_ids = [sid for sid in student_ids if sid not in already_marked]
+    if new_ids:
+        # ON DUPLICATE KEY keeps a concurrent writer's row instead of failing
+        values = ', '.join(["(%s, %s, %s, %s, %s, 'present', %s)"] * len(new_ids))
+        params = []
+        for student_id in new_ids:
+            params.extend([student_id, faculty_id, subject, session_date, period, float(best[student_id])])
+        cursor.execute(f"""
+            INSERT INTO attendance
+            (student_id, faculty_id, subject, session_date, period_number, status, confidence_score)
+            VALUES {values}
+            ON DUPLICATE KEY UPDATE id = id
+        """, params)
+        _record_inserted(cursor, cursor.rowcount, len(new_ids),
+                         [(student_id, subject, 'present') for student_id in new_ids])
+        bump(cursor, present_key(session_date), len(set(new_ids) - present_today))
+
+    return set(new_ids), already_marked
+
+
+def _mark_all_absent(cursor, faculty_id, subject, session_date, period):
+    """mark_absent() without a roster; returns the number marked absent"""
+    cursor.execute("DROP TEMPORARY TABLE IF EXISTS absent_candidates")
+    cursor.execute("CREATE TEMPORARY TABLE absent_candidates (id INT PRIMARY KEY)")
+    try:
+        cursor.execute("""
+            INSERT INTO absent_candidates (id)
+            SELECT s.id FROM students s
+            WHERE NOT EXISTS (
+                SELECT 1 FROM attendance a
+                WHERE a.student_id = s.id
+                AND a.session_date = %s
+                AND a.period_number = %s
+            )
+        """, (session_date, period))
+        expected = cursor.rowcount
+        if not expected:
+            return 0
+
+        cursor.execute("""
+            INSERT INTO attendance
+            (student_id, faculty_id, subject, session_date, period_number, status)
+            SELECT id, %s, %s, %s, %s, 'absent' FROM absent_candidates
+            ON DUPLICATE KEY UPDATE id = id
+        """, (faculty_id, subject, session_date, period))
+        inserted = cursor.rowcount
+
+        if inserted != expected:
+            # A concurrent writer got some rows in first. Rows other than
+            # our absent mark were counted by whoever wrote them
+            cursor.execute("""
+                DELETE c FROM absent_candidates c
+                JOIN attendance a ON a.student_id = c.id
+                WHERE a.session_date = %s AND a.period_number = %s
+                AND NOT (a.status = 'absent' AND a.faculty_id = %s AND a.subject = %s)
+            """, (session_date, period, faculty_id, subject))
+            expected -= cursor.rowcount
+        if inserted != expected:
+            # Still ambiguous (another identical end-session): recompute
+            # just the candidates from attendance
+            rebuild_from_table(cursor, 'absent_candidates')
+        else:
+            cursor.execute("""
+                INSERT INTO student_attendance_stats (student_id, present, total)
+                SELECT id, 0, 1 FROM absent_candidates
+                ON DUPLICATE KEY UPDATE total = total + 1
+            """)
+            cursor.execute("""
+                INSERT INTO student_subject_stats (student_id, subject, present, total)
+                SELECT id, %s, 0, 1 FROM absent_candidates
+                ON DUPLICATE KEY UPDATE total = total + 1
+            """, [subject])
+        return inserted
+    finally:
+        cursor.execute("DROP TEMPORARY TABLE IF EXISTS absent_candidates")
+
+
+def mark_absent(cursor, faculty_id, subject, session_date, period, roster=None, recognized=()):
+    """
+    Mark students without a row for this date/period absent
+
+    Args:
+        roster: student ids expected in the class; None falls back to
+            every student (a session without roster criteria), handled
+            server-side by _mark_all_absent()
+        recognized: student ids known to hold a row already (seen during
+            the session), skipped without a lookup
+
+    Returns:
+        number of students marked absent
+    """
+    if roster is None:
+        return _mark_all_absent(cursor, faculty_id, subject, session_date, period)
+
+    # Anyone left could still have been marked by another process:
+    # check just those students (unique_attendance point lookups)
+    candidates = sorted(set(roster) - set(recognized))
+    if not candidates:
+        return 0
+    placeholders = ', '.join(['%s'] * len(candidates))
+    cursor.execute(f"""
+        SELECT student_id FROM attendance
+        WHERE session_date = %s AND period_number = %s AND student_id IN ({placeholders})
+    """, [session_date, period] + candidates)
+    has_row = {row[0] for row in cursor.fetchall()}
+    absent_ids = [sid for sid in candidates if sid not in has_row]
+    if not absent_ids:
+        return 0
+
+    values = ', '.join(["(%s, %s, %s, %s, %s, 'absent')"] * len(absent_ids))
+    params = []
+    for student_id in absent_ids:
+        params.extend([student_id, faculty_id, subject, session_date, period])
+    cursor.execute(f"""
+        INSERT INTO attendance
+        (student_id, faculty_id, subject, session_date, period_number, status)
+        VALUES {values}
+        ON DUPLICATE KEY UPDATE id = id
+    """, params)
+    inserted = cursor.rowcount
+    _record_inserted(cursor, inserted, len(absent_ids),
+                     [(student_id, subject, 'absent') for student_id in absent_ids])
+    return inserted
@@ -0,0 +1,275 @@
+"""
+Attendance export (CSV, gzip'd CSV or XLSX) over a date range.
+
+Rows are read through an unbuffered server-side cursor (SSCursor) in
+batches and written out batch by batch, so memory stays flat whether an
+export holds a thousand rows or ten million. The query walks
+idx_date_period_student in order, so MySQL doesn't sort either.
+
+CSV is produced incrementally, and gzip compresses it on the fly. XLSX
+can't be streamed (it is a zip archive), so it is written to a temporary
+file in xlsxwriter's constant-memory mode and then sent in chunks.
+xlsxwriter is optional and only needed for XLSX.
+
+    python attendance_export.py --start 2024-01-01 --end 2024-06-30 -o term1.csv.gz --gzip
+    python attendance_export.py --start 2024-01-01 --end 2024-06-30 --benchmark
+"""
+
+import csv
+import io
+import os
+import tempfile
+import zlib
+
+from MySQLdb.cursors import SSCursor
+
+try:
+    import xlsxwriter
+except ImportError:
+    xlsxwriter = None
+
+HEADER = ('date', 'period', 'subject', 'roll_number', 'name', 'branch', 'section',
+          'emp_id', 'faculty', 'status', 'marked_at', 'confidence')
+
+EXPORT_FORMATS = ('csv', 'xlsx')
+
+# Rows fetched from the server per round trip
+BATCH_ROWS = 5000
+
+# Bytes per chunk when sending a finished XLSX file
+FILE_CHUNK_BYTES = 64 * 1024
+
+# Worksheet row limit; longer exports continue on another sheet
+XLSX_MAX_ROWS = 1048576
+
+
+def build_export_query(start, end, faculty_id=None, subject=None, branch=None, section=None):
+    """(sql, params) selecting HEADER columns for the filters, in index order"""
+    where, params = ["a.session_date BETWEEN %s AND %s"], [start, end]
+    if faculty_id:
+        where.append("a.faculty_id = %s")
+        params.append(faculty_id)
+    if subject:
+        where.append("a.subject = %s")
+        params.append(subject)
+    if branch:
+        where.append("s.branch = %s")
+        params.append(branch)
+    if section:
+        where.append("s.section = %s")
+        params.append(section)
+
+    sql = f"""
+        SELECT a.session_date, a.period_number, a.subject, s.roll_number, s.name,
+               s.branch, s.section, f.emp_id, f.name, a.status, a.marked_at, a.confidence_score
+        FROM attendance a
+        JOIN students s ON a.student_id = s.id
+        JOIN faculty f ON a.faculty_id = f.id
+        WHERE {' AND '.join(where)}
+        ORDER BY a.session_date, a.period_number, a.student_id
+    """
+    return sql, params
+
+
+def open_export(conn, sql, params):
+    """
+    Run the export query on an unbuffered cursor
+
+    Query errors surface here, so a web response can still report them
+    before any of the file has been sent.
+    """
+    cursor = conn.cursor(SSCursor)
+    cursor.execute(sql, params)
+    return cursor
+
+
+def fetch_batches(conn, sql, params, batch_rows=BATCH_ROWS):
+    """open_export() then cursor_batches()"""
+    return cursor_batches(open_export(conn, sql, params), batch_rows)
+
+
+def cursor_batches(cursor, batch_rows=BATCH_ROWS):
+    """
+    Yield lists of rows from an unbuffered cursor
+
+    The connection can't run anything else until the generator finishes.
+    If it is abandoned halfway, close the connection rather than reusing
+    it: closing the cursor would first read every remaining row.
+    """
+    while True:
+        rows = cursor.fetchmany(batch_rows)
+        if not rows:
+            break
+        yield rows
+    cursor.close()
+
+
+def _cell(value):
+    if value is None:
+        return ''
+    if hasattr(value, 'isoformat'):
+        return value.isoformat(sep=' ') if hasattr(value, 'hour') else value.isoformat()
+    if isinstance(value, float):
+        return round(value, 4)
+    return value
+
+
+def csv_chunks(batches):
+    """Encoded CSV, one chunk per batch (the header comes first)"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(HEADER)
+    for rows in batches:
+        writer.writerows([_cell(v) for v in row] for row in rows)
+        yield buffer.getvalue().encode('utf-8')
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode('utf-8')
+
+
+def gzip_chunks(chunks, level=6):
+    """Compress a byte stream into gzip format as it is produced"""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def xlsx_chunks(batches):
+    """
+    XLSX file contents in chunks
+
+    Raises:
+        RuntimeError: xlsxwriter is not installed
+    """
+    if xlsxwriter is None:
+        raise RuntimeError("XLSX export needs xlsxwriter (pip install xlsxwriter)")
+
+    fd, path = tempfile.mkstemp(suffix='.xlsx')
+    os.close(fd)
+    try:
+        workbook = xlsxwriter.Workbook(path, {'constant_memory': True})
+        bold = workbook.add_format({'bold': True})
+        sheet, row_index = None, XLSX_MAX_ROWS
+        for rows in batches:
+            for row in rows:
+                if row_index == XLSX_MAX_ROWS:
+                    sheet = workbook.add_worksheet()
+                    sheet.write_row(0, 0, HEADER, bold)
+                    row_index = 1
+                sheet.write_row(row_index, 0, [_cell(v) for v in row])
+                row_index += 1
+        if sheet is None:
+            workbook.add_worksheet().write_row(0, 0, HEADER, bold)
+        workbook.close()
+
+        with open(path, 'rb') as f:
+            while True:
+                data = f.read(FILE_CHUNK_BYTES)
+                if not data:
+                    break
+                yield data
+    finally:
+        os.remove(path)
+
+
+def xlsx_available():
+    return xlsxwriter is not None
+
+
+def export_chunks(batches, fmt='csv', compress=False):
+    """Output bytes for ``fmt``; ``compress`` gzips CSV (XLSX is already zipped)"""
+    if fmt == 'xlsx':
+        return xlsx_chunks(batches)
+    chunks = csv_chunks(batches)
+    return gzip_chunks(chunks) if compress else chunks
+
+
+def export_filename(start, end, fmt='csv', compress=False):
+    name = f"attendance_{start}_{end}.{fmt}"
+    return name + '.gz' if compress and fmt == 'csv' else name
+
+
+if __name__ == '__main__':
+    import argparse
+    import sys
+    import time
+    from datetime import date, datetime
+
+    import MySQLdb
+    from config import Config
+
+    def parse_date(value):
+        return datetime.strptime(value, '%Y-%m-%d').date()
+
+    parser = argparse.ArgumentParser(description="Export attendance for a date range")
+    parser.add_argument('--start', type=parse_date, default=date.today(), help="YYYY-MM-DD (default: today)")
+    parser.add_argument('--end', type=parse_date, help="YYYY-MM-DD (default: --start)")
+    parser.add_argument('--faculty-id', type=int)
+    parser.add_argument('--subject')
+    parser.add_argument('--branch')
+    parser.add_argument('--section')
+    parser.add_argument('--format', choices=EXPORT_FORMATS, default='csv')
+    parser.add_argument('--gzip', action='store_true', help="gzip the CSV")
+    parser.add_argument('-o', '--output', help="file to write (default: an attendance_<range> name)")
+    parser.add_argument('--batch-rows', type=int, default=Config.EXPORT_BATCH_ROWS, help="rows per server round trip")
+    parser.add_argument('--benchmark', action='store_true', help="discard the output and report throughput")
+    args = parser.parse_args()
+    end = args.end or args.start
+
+    print("=" * 60)
+    print("  Attendance Export")
+    print("=" * 60)
+
+    try:
+        conn = MySQLdb.connect(
+            host=Config.MYSQL_HOST,
+            user=Config.MYSQL_USER,
+            passwd=Config.MYSQL_PASSWORD,
+            db=Config.MYSQL_DB
+        )
+    except MySQLdb.Error as e:
+        print(f"\n❌ Database Error: {e}")
+        sys.exit(1)
+
+    sql, params = build_export_query(args.start, end, args.faculty_id, args.subject, args.branch, args.section)
+    output = None if args.benchmark else (args.output or export_filename(args.start, end, args.format, args.gzip))
+    counted = [0]
+
+    def counting(batches):
+        for rows in batches:
+            counted[0] += len(rows)
+            yield rows
+
+    start = time.perf_counter()
+    written = 0
+    try:
+        chunks = export_chunks(counting(fetch_batches(conn, sql, params, args.batch_rows)),
+                               args.format, args.gzip)
+        with open(output or os.devnull, 'wb') as f:
+            for chunk in chunks:
+                f.write(chunk)
+                written += len(chunk)
+                elapsed = time.perf_counter() - start
+                print(f"   {counted[0]:,} rows ({counted[0] / elapsed if elapsed else 0:,.0f} rows/s)",
+                      end='\r', flush=True)
+    except (MySQLdb.Error, RuntimeError, OSError) as e:
+        print(f"\n❌ {e}")
+        sys.exit(1)
+    finally:
+        conn.close()
+
+    elapsed = time.perf_counter() - start
+    print(f"\n✓ {counted[0]:,} rows, {written / 1e6:.1f} MB in {elapsed:.1f}s "
+          f"({counted[0] / elapsed if elapsed else 0:,.0f} rows/s)")
+    try:
+        import resource
+        # ru_maxrss is KiB on Linux
+        print(f"   Peak memory: {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.0f} MB")
+    except ImportError:  # Windows
+        pass
+    if output:
+        print(f"   Written to {output}")
@@ -0,0 +1,312 @@
+"""
+Background attendance jobs with progress reporting.
+
+POST /attendance/mark?async=1 hands the decoded frame to a JobManager and
+returns a job id at once. The job runs on a small thread pool and records
+each stage it reaches; clients poll /attendance/jobs/<id> or follow the
+Server-Sent Events stream at /attendance/jobs/<id>/events.
+
+Under several gunicorn workers the status or events request may reach a
+different process from the one running the job, so each job's state is
+also written to the attendance_jobs table (JobStore). A process that
+doesn't hold the job reads it from there, polling for the event stream.
+
+Finished jobs are kept for ``ttl`` seconds so a client that reconnects can
+still fetch the result. At most ``queue_size`` jobs wait for a thread; past
+that, submit() raises JobQueueFull instead of holding yet another decoded
+frame in memory, and the client gets a 503 to retry.
+"""
+
+import json
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+
+class JobQueueFull(RuntimeError):
+    """Raised when too many attendance jobs are already waiting"""
+
+
+class _JobState:
+    """What the status and events endpoints read, for local and stored jobs"""
+
+    @property
+    def done(self):
+        return self.finished is not None
+
+    def to_dict(self):
+        data = {
+            'job_id': self.id,
+            'stage': self.stage,
+            'progress': self.progress,
+            'done': self.done
+        }
+        if self.done:
+            data['result'] = self.result
+            if self.error:
+                data['error'] = self.error
+        return data
+
+    def _final_event(self):
+        event = {'stage': self.stage, 'progress': 1.0}
+        if self.error:
+            event['error'] = self.error
+        else:
+            event['result'] = self.result
+        return event
+
+
+class Job(_JobState):
+    def __init__(self, owner=None):
+        self.id = uuid.uuid4().hex
+        self.owner = owner
+        self.created = time.time()
+        self.finished = None
+        self.stage = 'queued'
+        self.progress = 0.0
+        self.result = None
+        self.status_code = None
+        self.error = None
+        self.events = [{'stage': 'queued', 'progress': 0.0}]
+        self._changed = threading.Condition()
+        self.on_change = None           # called with the job after each change
+
+    def report(self, stage, progress):
+        """Record that the job reached ``stage`` (progress in 0..1)"""
+        with self._changed:
+            self.stage = stage
+            self.progress = progress
+            self.events.append({'stage': stage, 'progress': progress})
+            self._changed.notify_all()
+        if self.on_change:
+            self.on_change(self)
+
+    def _finish(self, result=None, status_code=200, error=None):
+        with self._changed:
+            self.result = result
+            self.status_code = status_code
+            self.error = error
+            self.stage = 'failed' if error else 'done'
+            self.progress = 1.0
+            self.finished = time.time()
+            self.events.append(self._final_event())
+            self._changed.notify_all()
+        if self.on_change:
+            self.on_change(self)
+
+    def wait_for_events(self, seen, timeout):
+        """Events after the first ``seen`` ones, waiting up to ``timeout``"""
+        with self._changed:
+            if len(self.events) <= seen and not self.done:
+                self._changed.wait(timeout)
+            return self.events[seen:]
+
+
+class StoredJob(_JobState):
+    """A job read back from the JobStore (run by another process)"""
+
+    def __init__(self, store, job_id, row, poll_interval=0.5):
+        self.id = job_id
+        self.events = []
+        self._store = store
+        self._poll_interval = poll_interval
+        self._apply(row)
+
+    def _apply(self, row):
+        (self.owner, self.stage, self.progress, self.status_code,
+         self.result, self.error, self.finished) = row
+
+    def _refresh(self):
+        """Re-read the row; the event for a change since the last read, if any"""
+        before = (self.stage, self.progress)
+        row = self._store.load_row(self.id)
+        if row is None:
+            # Expired, or abandoned by a process that died
+            self.stage, self.error, self.finished = 'failed', 'Job lost', time.time()
+        else:
+            self._apply(row)
+        if self.done:
+            return self._final_event()
+        if (self.stage, self.progress) != before or not self.events:
+            return {'stage': self.stage, 'progress': self.progress}
+        return None
+
+    def wait_for_events(self, seen, timeout):
+        """Events after the first ``seen`` ones, polling the store up to ``timeout``"""
+        deadline = time.monotonic() + timeout
+        while True:
+            if not (self.events and self.events[-1]['stage'] in ('done', 'failed')):
+                event = self._refresh()
+                if event:
+                    self.events.append(event)
+            if len(self.events) > seen or self.done or time.monotonic() >= deadline:
+                return self.events[seen:]
+            time.sleep(self._poll_interval)
+
+
+class JobStore:
+    """
+    Job state in the attendance_jobs table, shared by every worker process
+
+    Args:
+        connection: ``with connection() as conn`` context manager factory,
+            e.g. ConnectionPool.connection
+    """
+
+    def __init__(self, connection):
+        self._connection = connection
+
+    def save(self, job):
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            try:
+                cursor.execute("""
+                    INSERT INTO attendance_jobs
+                    (id, owner, stage, progress, status_code, result, error, finished_at)
+                    VALUES (%s, %s, %s, %s, %s, %s, %s, IF(%s, NOW(), NULL))
+                    ON DUPLICATE KEY UPDATE
+                        stage = VALUES(stage), progress = VALUES(progress),
+                        status_code = VALUES(status_code), result = VALUES(result),
+                        error = VALUES(error), finished_at = VALUES(finished_at)
+                """, (job.id, job.owner, job.stage, job.progress, job.status_code,
+                      json.dumps(job.result) if job.result is not None else None,
+                      job.error, job.done))
+                conn.commit()
+            finally:
+                cursor.close()
+
+    def load_row(self, job_id):
+        """(owner, stage, progress, status_code, result, error, finished) or None"""
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            try:
+                cursor.execute("""
+                    SELECT owner, stage, progress, status_code, result, error,
+                           UNIX_TIMESTAMP(finished_at)
+                    FROM attendance_jobs WHERE id = %s
+                """, [job_id])
+                row = cursor.fetchone()
+            finally:
+                cursor.close()
+        if row is None:
+            return None
+        owner, stage, progress, status_code, result, error, finished = row
+        return (owner, stage, progress, status_code,
+                json.loads(result) if result is not None else None, error,
+                float(finished) if finished is not None else None)
+
+    def load(self, job_id):
+        row = self.load_row(job_id)
+        return StoredJob(self, job_id, row) if row is not None else None
+
+    def expire(self, ttl):
+        """Drop jobs finished over ``ttl`` seconds ago, or started that long ago and never finished"""
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            try:
+                cursor.execute("""
+                    DELETE FROM attendance_jobs
+                    WHERE COALESCE(finished_at, created_at) < NOW() - INTERVAL %s SECOND
+                """, [ttl])
+                conn.commit()
+            finally:
+                cursor.close()
+
+
+class JobManager:
+    def __init__(self, workers=4, ttl=600, queue_size=32, store=None):
+        """
+        Args:
+            workers: jobs processed concurrently
+            ttl: seconds a finished job stays available
+            queue_size: jobs waiting for a worker before new ones are refused
+            store: JobStore shared with the other worker processes (None
+                keeps jobs visible to this process only)
+        """
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='attendance-job')
+        # One slot per running or waiting job
+        self._slots = threading.BoundedSemaphore(workers + queue_size)
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self.ttl = ttl
+        self.store = store
+        self._last_store_expiry = 0.0
+
+    def _save(self, job):
+        # The process running the job can still answer for it, so a store
+        # outage only costs the other processes their view of it
+        try:
+            self.store.save(job)
+        except Exception as e:
+            print(f"⚠️  Could not save attendance job {job.id}: {e}")
+
+    def submit(self, fn, *args, owner=None, **kwargs):
+        """
+        Run ``fn(*args, progress=job.report, **kwargs)`` in the background
+
+        ``fn`` must return a (result, status_code) pair.
+
+        Raises:
+            JobQueueFull: every worker is busy and the queue is full
+        """
+        self._expire()
+        if not self._slots.acquire(blocking=False):
+            raise JobQueueFull("Too many attendance requests are queued, please retry shortly")
+        job = Job(owner)
+        with self._lock:
+            self._jobs[job.id] = job
+        if self.store is not None:
+            self._save(job)
+            job.on_change = self._save
+
+        def run():
+            try:
+                result, status_code = fn(*args, progress=job.report, **kwargs)
+                job._finish(result, status_code)
+            except Exception as e:
+                job._finish(error=str(e), status_code=500)
+            finally:
+                self._slots.release()
+
+        self._executor.submit(run)
+        return job
+
+    def get(self, job_id, owner=None):
+        """The job, or None if unknown, expired or owned by someone else"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is None and self.store is not None:
+            job = self.store.load(job_id)
+        if job is None or (owner is not None and job.owner != owner):
+            return None
+        return job
+
+    def stream(self, job, heartbeat=15):
+        """Server-Sent Events for a job, ending once it has finished"""
+        seen = 0
+        while True:
+            events = job.wait_for_events(seen, heartbeat)
+            if not events:
+                # Comment line keeps proxies from closing an idle stream
+                yield ": keep-alive\n\n"
+                continue
+            for event in events:
+                name = event['stage'] if event['stage'] in ('done', 'failed') else 'progress'
+                yield f"event: {name}\ndata: {json.dumps(event)}\n\n"
+            seen += len(events)
+            if job.done and seen >= len(job.events):
+                return
+
+    def _expire(self):
+        cutoff = time.time() - self.ttl
+        with self._lock:
+            for job_id in [jid for jid, job in self._jobs.items() if job.done and job.finished < cutoff]:
+                del self._jobs[job_id]
+        # The shared table only needs sweeping once a minute per process
+        if self.store is not None and time.time() - self._last_store_expiry > 60:
+            self._last_store_expiry = time.time()
+            try:
+                self.store.expire(self.ttl)
+            except Exception as e:
+                print(f"⚠️  Could not expire attendance jobs: {e}")
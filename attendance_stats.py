@@ -0,0 +1,167 @@
+"""
+Materialized attendance aggregates.
+
+Student reports and percentage lists used to scan a student's whole
+attendance history on every view. student_attendance_stats (per student)
+and student_subject_stats (per student and subject) hold running
+present/total counts instead, so a report is a primary-key lookup however
+many years of attendance exist.
+
+record_attendance() is called with the rows an attendance write actually
+inserted, in the same transaction, by mark_present and mark_absent.
+Anything that changes attendance some other way (a manual UPDATE, a bulk
+import) leaves the aggregates stale until they are rebuilt:
+
+    python attendance_stats.py                  # every student
+    python attendance_stats.py --student 42     # one student
+"""
+
+from collections import defaultdict
+
+REBUILD_SQL = """
+    INSERT INTO {table} ({columns}, present, total)
+    SELECT {columns}, SUM(status = 'present'), COUNT(*)
+    FROM attendance
+    {where}
+    GROUP BY {columns}
+"""
+
+
+def _upsert(cursor, table, key_columns, counts):
+    """Add {key: [present, total]} onto existing rows (or create them)"""
+    row = '(' + ', '.join(['%s'] * (len(key_columns) + 2)) + ')'
+    params = []
+    for key, (present, total) in counts.items():
+        params.extend((key if isinstance(key, tuple) else (key,)) + (present, total))
+    cursor.execute(f"""
+        INSERT INTO {table} ({', '.join(key_columns)}, present, total)
+        VALUES {', '.join([row] * len(counts))}
+        ON DUPLICATE KEY UPDATE present = present + VALUES(present), total = total + VALUES(total)
+    """, params)
+
+
+def record_attendance(cursor, rows):
+    """
+    Fold newly inserted attendance rows into the aggregates
+
+    Args:
+        rows: iterable of (student_id, subject, status), one per inserted
+            attendance row
+    """
+    per_student = defaultdict(lambda: [0, 0])
+    per_subject = defaultdict(lambda: [0, 0])
+    for student_id, subject, status in rows:
+        present = 1 if status == 'present' else 0
+        for counts in (per_student[student_id], per_subject[(student_id, subject)]):
+            counts[0] += present
+            counts[1] += 1
+    if not per_student:
+        return
+    _upsert(cursor, 'student_attendance_stats', ('student_id',), per_student)
+    _upsert(cursor, 'student_subject_stats', ('student_id', 'subject'), per_subject)
+
+
+def rebuild(cursor, student_ids=None):
+    """
+    Recompute the aggregates from the attendance table
+
+    Args:
+        student_ids: only these students (default every student)
+    """
+    where, params = '', []
+    if student_ids is not None:
+        student_ids = list(student_ids)
+        if not student_ids:
+            return
+        where = f"WHERE student_id IN ({', '.join(['%s'] * len(student_ids))})"
+        params = student_ids
+
+    for table, columns in (('student_attendance_stats', 'student_id'),
+                           ('student_subject_stats', 'student_id, subject')):
+        if student_ids is None:
+            cursor.execute(f"DELETE FROM {table}")
+        else:
+            cursor.execute(f"DELETE FROM {table} {where}", params)
+        cursor.execute(REBUILD_SQL.format(table=table, columns=columns, where=where), params)
+
+
+def rebuild_from_table(cursor, table):
+    """
+    rebuild() for the students listed in ``table`` (an ``id`` column),
+    without reading the ids into Python
+    """
+    where = f"WHERE student_id IN (SELECT id FROM {table})"
+    for stats_table, columns in (('student_attendance_stats', 'student_id'),
+                                 ('student_subject_stats', 'student_id, subject')):
+        cursor.execute(f"DELETE FROM {stats_table} {where}")
+        cursor.execute(REBUILD_SQL.format(table=stats_table, columns=columns, where=where))
+
+
+def get_student_stats(cursor, student_id):
+    """
+    One student's totals
+
+    Returns:
+        (present, total, subjects) where subjects is a list of
+        (subject, present, total) sorted by subject
+    """
+    cursor.execute("SELECT present, total FROM student_attendance_stats WHERE student_id = %s",
+                   [student_id])
+    row = cursor.fetchone()
+    present, total = (int(row[0]), int(row[1])) if row else (0, 0)
+
+    cursor.execute("""
+        SELECT subject, present, total FROM student_subject_stats
+        WHERE student_id = %s ORDER BY subject
+    """, [student_id])
+    subjects = [(subject, int(p), int(t)) for subject, p, t in cursor.fetchall()]
+    return present, total, subjects
+
+
+def percentage(present, total):
+    return present / total * 100 if total else 0
+
+
+if __name__ == '__main__':
+    import argparse
+    import sys
+    import time
+
+    import MySQLdb
+    from config import Config
+
+    parser = argparse.ArgumentParser(description="Rebuild the attendance aggregates from the attendance table")
+    parser.add_argument('--student', type=int, action='append', help="student id (repeatable; default all)")
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("  Rebuild Attendance Aggregates")
+    print("=" * 60)
+    try:
+        conn = MySQLdb.connect(
+            host=Config.MYSQL_HOST,
+            user=Config.MYSQL_USER,
+            passwd=Config.MYSQL_PASSWORD,
+            db=Config.MYSQL_DB
+        )
+    except MySQLdb.Error as e:
+        print(f"\n❌ Database Error: {e}")
+        sys.exit(1)
+
+    cursor = conn.cursor()
+    start = time.perf_counter()
+    try:
+        rebuild(cursor, args.student)
+        conn.commit()
+        cursor.execute("SELECT COUNT(*), COALESCE(SUM(total), 0) FROM student_attendance_stats")
+        students, rows = cursor.fetchone()
+    except MySQLdb.Error as e:
+        conn.rollback()
+        print(f"\n❌ Database Error: {e}")
+        sys.exit(1)
+    finally:
+        cursor.close()
+        conn.close()
+
+    print(f"\n✓ Rebuilt in {time.perf_counter() - start:.1f}s")
+    print(f"   Aggregates cover {students} student(s) and {rows} attendance row(s)")
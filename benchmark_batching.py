@@ -0,0 +1,69 @@
+"""
+Recognition batching micro-benchmark
+Compares embedding aligned faces one model call at a time (the old
+FaceAnalysis.get behaviour) against one batched call per frame, for
+typical classroom face counts on CPU.
+
+Crops are synthetic 112x112 images: the recognition model's cost does not
+depend on what is in them.
+
+    python benchmark_batching.py --faces 1 10 40 100
+"""
+
+import argparse
+import sys
+import time
+
+import numpy as np
+
+
+def time_call(fn, repeats):
+    """Median wall time of fn() in milliseconds"""
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return float(np.median(samples))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-face vs batched recognition latency")
+    parser.add_argument('--faces', type=int, nargs='+', default=[1, 10, 40, 100])
+    parser.add_argument('--repeats', type=int, default=5)
+    parser.add_argument('--gpu', action='store_true', help="use the CUDA provider")
+    args = parser.parse_args()
+
+    from face_recognition_system import FaceRecognitionSystem
+
+    print("=" * 60)
+    print("  Recognition Batching Benchmark")
+    print("=" * 60)
+
+    system = FaceRecognitionSystem(use_gpu=args.gpu)
+    system.warm_up()
+    rec_model = system.rec_model
+    crop_size = rec_model.input_size[0]
+    rng = np.random.default_rng(0)
+
+    print(f"\n{'faces':>6} {'per-face':>10} {'batched':>10} {'speedup':>8} {'ms/face':>8}")
+    for n_faces in args.faces:
+        crops = rng.integers(0, 256, (n_faces, crop_size, crop_size, 3), dtype=np.uint8)
+
+        per_face = time_call(lambda: [rec_model.get_feat(crop) for crop in crops], args.repeats)
+        batched = time_call(lambda: system.embed_crops(crops), args.repeats)
+
+        # Both paths must produce the same embeddings
+        single = np.concatenate([rec_model.get_feat(crop) for crop in crops])
+        if not np.allclose(single, system.embed_crops(crops), atol=1e-3):
+            print(f"❌ Batched embeddings differ from per-face embeddings for {n_faces} faces")
+            return False
+
+        print(f"{n_faces:>6} {per_face:>8.1f}ms {batched:>8.1f}ms {per_face / batched:>7.1f}x "
+              f"{batched / n_faces:>8.2f}")
+
+    return True
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
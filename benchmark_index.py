@@ -0,0 +1,153 @@
+"""
+Recall / latency benchmark for the approximate face index
+
+Compares IVFIndex against exact brute-force search on the real gallery
+(read from the shared snapshot, or from the database if there is none) and
+reports recall@1 plus how many accept/reject decisions at the recognition
+threshold would change. A student can own several template rows, so both
+compare the matched student, not the row: landing on another template of
+the right student is a hit, as it is in FaceGallery.match.
+
+Probes are gallery embeddings with Gaussian noise added (genuine probes)
+plus random unit vectors (impostors). Pass --probes with a .npy file of
+real captured embeddings to use those instead.
+
+    python benchmark_index.py --nprobe 4 8 16
+"""
+
+import argparse
+import sys
+import time
+
+import numpy as np
+
+import gallery_snapshot
+from config import Config
+from face_gallery import FaceGallery, normalize_rows
+from face_index import ExactIndex, IVFIndex
+
+
+def load_gallery_matrix():
+    """
+    Load the live gallery rows, preferring the snapshot over the DB
+
+    Returns:
+        (embeddings, student_ids): the rows and the student owning each
+    """
+    snapshot = gallery_snapshot.read_snapshot(Config.GALLERY_SNAPSHOT_DIR)
+    if snapshot is not None:
+        print(f"✓ Using snapshot v{snapshot['version']} from {Config.GALLERY_SNAPSHOT_DIR}")
+        return np.asarray(snapshot['embeddings']), snapshot['student_ids']
+
+    import MySQLdb
+    print("Snapshot not found, loading embeddings from the database...")
+    conn = MySQLdb.connect(
+        host=Config.MYSQL_HOST,
+        user=Config.MYSQL_USER,
+        passwd=Config.MYSQL_PASSWORD,
+        db=Config.MYSQL_DB
+    )
+    try:
+        cursor = conn.cursor()
+        gallery = FaceGallery()
+        gallery.load(cursor)
+        cursor.close()
+    finally:
+        conn.close()
+    return np.asarray(gallery.embeddings), gallery.student_ids
+
+
+def students_of(rows, student_ids):
+    """Student id per result row (-1 where the search found nothing)"""
+    return np.where(rows >= 0, student_ids[np.maximum(rows, 0)], -1)
+
+
+def make_probes(matrix, n_genuine, n_impostor, noise, seed):
+    """Noisy copies of random gallery rows plus random impostor vectors"""
+    rng = np.random.default_rng(seed)
+    rows = rng.choice(len(matrix), n_genuine, replace=len(matrix) < n_genuine)
+    dim = matrix.shape[1]
+    genuine = matrix[rows] + rng.normal(scale=noise / np.sqrt(dim), size=(n_genuine, dim))
+    impostor = rng.normal(size=(n_impostor, dim))
+    return normalize_rows(np.concatenate([genuine, impostor]).astype(np.float32))
+
+
+def timed_search(index, probes, batch):
+    """Search in request-sized batches; returns (scores, rows, ms per probe)"""
+    scores, rows = [], []
+    start = time.perf_counter()
+    for i in range(0, len(probes), batch):
+        s, r = index.search(probes[i:i + batch], k=1)
+        scores.append(s[:, 0])
+        rows.append(r[:, 0])
+    elapsed = time.perf_counter() - start
+    return np.concatenate(scores), np.concatenate(rows), elapsed * 1000 / len(probes)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--nlist', type=int, default=Config.FACE_IVF_NLIST,
+                        help='IVF partitions (0 = 4 * sqrt(rows))')
+    parser.add_argument('--nprobe', type=int, nargs='+', default=[Config.FACE_IVF_NPROBE],
+                        help='partitions scanned per query (several values allowed)')
+    parser.add_argument('--threshold', type=float, default=Config.FACE_RECOGNITION_THRESHOLD)
+    parser.add_argument('--probes', help='.npy file of real probe embeddings')
+    parser.add_argument('--genuine', type=int, default=2000, help='synthetic genuine probes')
+    parser.add_argument('--impostor', type=int, default=500, help='synthetic impostor probes')
+    parser.add_argument('--noise', type=float, default=1.2,
+                        help='genuine probe noise (1.2 gives cosine ~0.64 to the source row)')
+    parser.add_argument('--batch', type=int, default=40, help='faces per search call')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("  Face Index Recall Benchmark")
+    print("=" * 60)
+
+    matrix, student_ids = load_gallery_matrix()
+    matrix = np.ascontiguousarray(matrix, dtype=np.float32)
+    if matrix.size == 0:
+        print("❌ Gallery is empty, nothing to benchmark")
+        return False
+    print(f"Gallery: {matrix.shape[0]} rows x {matrix.shape[1]} dims, "
+          f"{len(np.unique(student_ids))} students")
+
+    if args.probes:
+        probes = normalize_rows(np.load(args.probes))
+    else:
+        probes = make_probes(matrix, args.genuine, args.impostor, args.noise, args.seed)
+    print(f"Probes:  {len(probes)}")
+
+    exact = ExactIndex()
+    exact.build(matrix)
+    exact_scores, exact_rows, exact_ms = timed_search(exact, probes, args.batch)
+    exact_students = students_of(exact_rows, student_ids)
+    exact_accept = exact_scores > args.threshold
+    print(f"\nExact:   {exact_ms:.3f} ms/face, {exact_accept.sum()} accepted at {args.threshold}")
+
+    start = time.perf_counter()
+    ivf = IVFIndex(nlist=args.nlist, seed=args.seed)
+    ivf.build(matrix)
+    print(f"IVF build: {time.perf_counter() - start:.2f}s, {len(ivf.lists)} partitions")
+
+    print(f"\n{'nprobe':>7} {'recall@1':>9} {'changed':>8} {'ms/face':>8} {'speedup':>8}")
+    for nprobe in args.nprobe:
+        ivf.nprobe = nprobe
+        scores, rows, ms = timed_search(ivf, probes, args.batch)
+        students = students_of(rows, student_ids)
+
+        # Recall over probes exact search accepts; an impostor's nearest row is noise
+        scope = exact_accept if exact_accept.any() else np.ones_like(exact_accept)
+        recall = np.mean(students[scope] == exact_students[scope])
+        # A decision changes if accept/reject flips or the accepted student differs
+        accept = scores > args.threshold
+        changed = np.sum((accept != exact_accept) | (accept & (students != exact_students)))
+        print(f"{nprobe:>7} {recall:>9.4f} {changed:>8} {ms:>8.3f} {exact_ms / ms:>7.1f}x")
+
+    print("\n'changed' counts probes whose match decision differs from exact search;")
+    print("keep it at 0 on real probes before enabling FACE_INDEX = 'ivf'.")
+    return True
+
+
+if __name__ == '__main__':
+    sys.exit(0 if main() else 1)
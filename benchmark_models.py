@@ -0,0 +1,166 @@
+"""
+Model set benchmark
+Compares loading the whole InsightFace pack against detection + recognition
+only: startup time, resident memory and per-face latency on a real photo.
+
+Each configuration runs in a fresh process so memory figures don't leak
+between runs.
+
+    python benchmark_models.py --image classroom.jpg
+"""
+
+import argparse
+import multiprocessing
+import os
+import queue as queue_module
+import sys
+import time
+
+import cv2
+
+CONFIGURATIONS = [
+    ('full pack', None),
+    ('detection + recognition', ['detection', 'recognition']),
+]
+
+
+def rss_mb():
+    """Current resident set size of this process in MB (Linux)"""
+    try:
+        with open('/proc/self/statm') as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024)
+    except (OSError, ValueError):
+        import resource
+        # Peak RSS; ru_maxrss is in KB on Linux
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def run_configuration(modules, image_path, repeats, use_gpu, queue):
+    """Measure one model set (runs in a child process)"""
+    try:
+        queue.put(measure(modules, image_path, repeats, use_gpu))
+    except Exception as e:
+        queue.put({'error': f"{type(e).__name__}: {e}"})
+
+
+def measure(modules, image_path, repeats, use_gpu):
+    """Startup time, memory and latency figures for one model set"""
+    from face_recognition_system import FaceRecognitionSystem
+
+    image = cv2.imread(image_path)
+    baseline = rss_mb()
+
+    start = time.perf_counter()
+    system = FaceRecognitionSystem(use_gpu=use_gpu, modules=modules)
+    startup = time.perf_counter() - start
+    loaded = rss_mb()
+
+    # Warm-up run so graph optimisation isn't counted
+    faces, _ = system.extract_multiple_embeddings(image)
+
+    start = time.perf_counter()
+    for _ in range(repeats):
+        system.extract_multiple_embeddings(image)
+    frame_ms = (time.perf_counter() - start) * 1000 / repeats
+
+    return {
+        'models': sorted(system.app.models),
+        'startup_s': startup,
+        'model_mb': loaded - baseline,
+        'rss_mb': rss_mb(),
+        'faces': len(faces),
+        'frame_ms': frame_ms,
+        'face_ms': frame_ms / len(faces) if faces else float('nan'),
+    }
+
+
+def wait_for_result(process, queue, timeout):
+    """
+    The child's result, or an error string if it crashed, reported a failure
+    or ran past ``timeout`` seconds
+    """
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            result = queue.get(timeout=1)
+            break
+        except queue_module.Empty:
+            pass
+        if not process.is_alive():
+            # It may have put its result just before exiting
+            try:
+                result = queue.get(timeout=1)
+                break
+            except queue_module.Empty:
+                return f"process exited with code {process.exitcode} without a result"
+        if time.monotonic() > deadline:
+            process.terminate()
+            process.join()
+            return f"no result after {timeout}s"
+
+    process.join(timeout=10)
+    if process.is_alive():
+        process.terminate()
+        process.join()
+    if 'error' in result:
+        return result['error']
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare InsightFace model sets")
+    parser.add_argument('--image', required=True, help="photo with one or more faces")
+    parser.add_argument('--repeats', type=int, default=10)
+    parser.add_argument('--gpu', action='store_true', help="use the CUDA provider")
+    parser.add_argument('--timeout', type=int, default=600, help="seconds allowed per configuration")
+    args = parser.parse_args()
+
+    if cv2.imread(args.image) is None:
+        print(f"❌ Could not read image: {args.image}")
+        return False
+
+    print("=" * 60)
+    print("  InsightFace Model Set Benchmark")
+    print("=" * 60)
+
+    context = multiprocessing.get_context('spawn')
+    results = []
+    failed = []
+    for label, modules in CONFIGURATIONS:
+        print(f"\nRunning: {label}...")
+        queue = context.Queue()
+        process = context.Process(target=run_configuration,
+                                  args=(modules, args.image, args.repeats, args.gpu, queue))
+        process.start()
+        result = wait_for_result(process, queue, args.timeout)
+        if isinstance(result, str):
+            print(f"   ❌ Failed: {result}")
+            failed.append(label)
+            continue
+        results.append((label, result))
+        print(f"   Models: {', '.join(result['models'])}")
+
+    if not results:
+        print(f"\n❌ Every model set failed: {', '.join(failed)}")
+        return False
+
+    print(f"\n{'configuration':<26} {'startup':>8} {'models':>9} {'rss':>8} {'frame':>9} {'per face':>9}")
+    for label, r in results:
+        print(f"{label:<26} {r['startup_s']:>7.2f}s {r['model_mb']:>7.0f}MB {r['rss_mb']:>6.0f}MB "
+              f"{r['frame_ms']:>7.1f}ms {r['face_ms']:>7.2f}ms")
+
+    if failed:
+        print(f"\n❌ Failed model sets: {', '.join(failed)}")
+        return False
+
+    full, minimal = results[0][1], results[1][1]
+    print(f"\nFaces per frame: {minimal['faces']}")
+    print(f"Savings: {full['startup_s'] - minimal['startup_s']:.2f}s startup, "
+          f"{full['rss_mb'] - minimal['rss_mb']:.0f}MB resident, "
+          f"{full['face_ms'] - minimal['face_ms']:.2f}ms per face")
+    return True
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
@@ -0,0 +1,273 @@
+"""
+Offline Bulk Attendance
+Computes attendance for one class from a folder of photos or a recorded
+lecture, then writes it in a single transaction.
+
+    python bulk_attendance.py --video lecture.mp4 --faculty-id 3 \\
+        --subject "Data Structures" --period 2 --date 2024-03-18
+    python bulk_attendance.py --images photos/ --faculty-id 3 \\
+        --subject "Data Structures" --period 2
+
+Video is sampled at --fps frames per second. The sampled frames are split
+into chunks of consecutive timestamps and fanned out over a process pool.
+Each worker opens the file itself and seeks to its chunk, so decoding is
+spread across every core just like inference. Recognitions are matched in
+the parent against the face gallery, and a student counts as present once
+seen in --min-sightings distinct frames.
+
+ONNX Runtime uses several threads per session, so the default worker count
+is half the cores. Raise it if the CPU is not saturated.
+"""
+
+import argparse
+import multiprocessing
+import os
+import sys
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import date, datetime
+
+import cv2
+import MySQLdb
+import numpy as np
+
+from attendance_db import mark_present
+from class_sessions import get_roster
+from config import Config
+from face_gallery import FaceGallery
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg')
+
+# Grab (decode without converting) across gaps shorter than this; seek past longer ones
+SEEK_GAP_SECONDS = 4
+
+# ---------------------------------------------------------------------------
+# Worker process side
+# ---------------------------------------------------------------------------
+
+_system = None
+
+
+def _init_worker(use_gpu):
+    global _system
+    from face_recognition_system import FaceRecognitionSystem
+    _system = FaceRecognitionSystem(
+        use_gpu=use_gpu,
+        attendance_det_sizes=Config.ATTENDANCE_DETECTION_SIZES,
+        max_input_size=Config.MAX_INPUT_SIZE,
+        modules=Config.FACE_MODEL_MODULES
+    )
+
+
+def _embed_frame(frame):
+    faces, _ = _system.extract_multiple_embeddings(frame)
+    if not faces:
+        return np.zeros((0, 512), dtype=np.float32)
+    return np.stack([face['embedding'] for face in faces]).astype(np.float32)
+
+
+def process_images(paths):
+    """Embeddings of every face in each photo: [(label, embeddings), ...]"""
+    results = []
+    for path in paths:
+        image = cv2.imread(path)
+        if image is None:
+            results.append((path, None))
+            continue
+        results.append((path, _embed_frame(image)))
+    return results
+
+
+def process_video_chunk(path, frame_indices, fps):
+    """Embeddings of every face in the given (ascending) frames of a video"""
+    capture = cv2.VideoCapture(path)
+    seek_gap = max(1, int(SEEK_GAP_SECONDS * fps))
+    position = 0
+    results = []
+    try:
+        for index in frame_indices:
+            if index - position > seek_gap or index < position:
+                capture.set(cv2.CAP_PROP_POS_FRAMES, index)
+                position = index
+            while position < index:
+                capture.grab()
+                position += 1
+            ok, frame = capture.read()
+            position += 1
+            label = f"{index / fps:.1f}s"
+            results.append((label, _embed_frame(frame) if ok else None))
+    finally:
+        capture.release()
+    return results
+
+
+# ---------------------------------------------------------------------------
+# Parent process side
+# ---------------------------------------------------------------------------
+
+def plan_video(path, sample_fps, chunk_size):
+    """Sampled frame indices of a video, split into chunks; returns (chunks, fps, duration)"""
+    capture = cv2.VideoCapture(path)
+    if not capture.isOpened():
+        raise ValueError(f"Could not open video: {path}")
+    fps = capture.get(cv2.CAP_PROP_FPS) or 25.0
+    frame_count = int(capture.get(cv2.CAP_PROP_FRAME_COUNT))
+    capture.release()
+
+    step = max(1, round(fps / sample_fps))
+    indices = list(range(0, frame_count, step))
+    chunks = [indices[i:i + chunk_size] for i in range(0, len(indices), chunk_size)]
+    return chunks, fps, frame_count / fps
+
+
+def plan_images(directory, chunk_size):
+    paths = sorted(os.path.join(directory, name) for name in os.listdir(directory)
+                   if name.lower().endswith(IMAGE_EXTENSIONS))
+    return [paths[i:i + chunk_size] for i in range(0, len(paths), chunk_size)]
+
+
+def aggregate(frames, gallery, threshold, roster=None):
+    """
+    Match every face and count sightings per student
+
+    Returns:
+        {student_id: (roll_number, name, sightings, best_similarity)}
+    """
+    frames = [(label, emb) for label, emb in frames if emb is not None and len(emb)]
+    if not frames:
+        return {}
+    embeddings = np.concatenate([emb for _, emb in frames])
+    frame_of_face = np.repeat(np.arange(len(frames)), [len(emb) for _, emb in frames])
+
+    seen = defaultdict(set)
+    best = {}
+    for frame, match in zip(frame_of_face, gallery.match(embeddings, threshold=threshold, candidates=roster)):
+        if not match:
+            continue
+        student_id, roll_no, name, similarity = match
+        seen[student_id].add(int(frame))
+        if student_id not in best or similarity > best[student_id][2]:
+            best[student_id] = (roll_no, name, float(similarity))
+
+    return {sid: (roll_no, name, len(seen[sid]), similarity)
+            for sid, (roll_no, name, similarity) in best.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mark attendance from a photo folder or recorded video")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--images', help="directory of class photos")
+    source.add_argument('--video', help="recorded lecture")
+    parser.add_argument('--faculty-id', type=int, required=True)
+    parser.add_argument('--subject', required=True)
+    parser.add_argument('--period', type=int, required=True)
+    parser.add_argument('--date', help="session date, YYYY-MM-DD (default: today)")
+    parser.add_argument('--session-id', type=int, help="match the class session's roster first")
+    parser.add_argument('--fps', type=float, default=0.5, help="video frames sampled per second")
+    parser.add_argument('--min-sightings', type=int,
+                        help="frames a student must appear in (default: 2 for video, 1 for photos)")
+    parser.add_argument('--threshold', type=float, default=0.4, help="minimum cosine similarity")
+    parser.add_argument('--workers', type=int, default=max(1, (os.cpu_count() or 2) // 2))
+    parser.add_argument('--chunk-size', type=int, default=16, help="frames per worker task")
+    parser.add_argument('--gpu', action='store_true', help="use the CUDA provider")
+    parser.add_argument('--dry-run', action='store_true', help="report without writing attendance")
+    args = parser.parse_args()
+
+    session_date = datetime.strptime(args.date, '%Y-%m-%d').date() if args.date else date.today()
+    min_sightings = args.min_sightings or (2 if args.video else 1)
+
+    print("=" * 60)
+    print("  Offline Bulk Attendance")
+    print("=" * 60)
+
+    duration = None
+    try:
+        if args.video:
+            chunks, fps, duration = plan_video(args.video, args.fps, args.chunk_size)
+            tasks = [(process_video_chunk, (args.video, chunk, fps)) for chunk in chunks]
+            print(f"\nVideo: {duration / 60:.1f} min at {fps:.1f} fps, sampling {args.fps} fps")
+        else:
+            chunks = plan_images(args.images, args.chunk_size)
+            tasks = [(process_images, (chunk,)) for chunk in chunks]
+        total = sum(len(chunk) for chunk in chunks)
+    except (OSError, ValueError) as e:
+        print(f"❌ {e}")
+        return False
+
+    if total == 0:
+        print("❌ No frames to process")
+        return False
+    print(f"Frames: {total} in {len(tasks)} chunks over {args.workers} workers")
+
+    # spawn: ONNX Runtime state must not be forked
+    start = time.perf_counter()
+    frames = []
+    unreadable = 0
+    with ProcessPoolExecutor(max_workers=args.workers,
+                             mp_context=multiprocessing.get_context('spawn'),
+                             initializer=_init_worker, initargs=(args.gpu,)) as pool:
+        futures = [pool.submit(fn, *fn_args) for fn, fn_args in tasks]
+        for future in as_completed(futures):
+            results = future.result()
+            frames.extend(results)
+            unreadable += sum(1 for _, emb in results if emb is None)
+            print(f"   ✓ {len(frames)}/{total} frames", end='\r', flush=True)
+    elapsed = time.perf_counter() - start
+
+    faces = sum(len(emb) for _, emb in frames if emb is not None)
+    print(f"\n✓ {len(frames)} frames, {faces} faces in {elapsed:.1f}s")
+    if duration:
+        print(f"   {duration / elapsed:.1f}x real time")
+    if unreadable:
+        print(f"⚠️  {unreadable} frame(s) could not be read")
+
+    try:
+        conn = MySQLdb.connect(
+            host=Config.MYSQL_HOST,
+            user=Config.MYSQL_USER,
+            passwd=Config.MYSQL_PASSWORD,
+            db=Config.MYSQL_DB
+        )
+    except MySQLdb.Error as e:
+        print(f"\n❌ Database Error: {e}")
+        return False
+
+    cursor = conn.cursor()
+    try:
+        gallery = FaceGallery(snapshot_dir=Config.GALLERY_SNAPSHOT_DIR)
+        gallery.load(cursor)
+        roster = get_roster(cursor, args.session_id) if args.session_id else None
+        students = aggregate(frames, gallery, args.threshold, roster)
+
+        present = {sid: s for sid, s in students.items() if s[2] >= min_sightings}
+        print(f"\nRecognized: {len(students)} student(s), {len(present)} seen in "
+              f"{min_sightings}+ frame(s)")
+        for sid, (roll_no, name, sightings, similarity) in sorted(present.items(), key=lambda s: s[1][0]):
+            print(f"   ✓ {roll_no:<15} {name:<30} {sightings:>4} sightings  {similarity:.2f}")
+        for sid, (roll_no, name, sightings, similarity) in students.items():
+            if sid not in present:
+                print(f"   ⚠️  {roll_no:<15} {name:<30} {sightings:>4} sighting(s), not marked")
+
+        if args.dry_run:
+            print("\nDry run: nothing written")
+            return True
+
+        matches = [(sid, roll_no, name, similarity) for sid, (roll_no, name, _, similarity) in present.items()]
+        marked, already_marked = mark_present(cursor, matches, args.faculty_id, args.subject,
+                                              session_date, args.period)
+        conn.commit()
+        print(f"\n✓ Marked {len(marked)} present for {session_date}, period {args.period}"
+              f" ({len(already_marked)} already marked)")
+        return True
+    except MySQLdb.Error as e:
+        conn.rollback()
+        print(f"\n❌ Database Error: {e}")
+        return False
+    finally:
+        cursor.close()
+        conn.close()
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
@@ -0,0 +1,248 @@
+"""
+Bulk Student Enrolment
+Enrols students from an admissions CSV and a folder of ID photos.
+
+    python bulk_enroll.py students.csv photos/
+    python bulk_enroll.py students.csv photos/ --workers 8 --report rejects.csv
+
+CSV columns: roll_number, name, branch, section, dob, mobile, email,
+address and, optionally, photo (a file name inside the photo folder). If
+there is no photo column, <roll_number>.jpg/.jpeg/.png is used.
+
+Embeddings are extracted in a process pool. Photos without exactly one
+face are rejected and listed in the report, and accepted students are
+inserted in multi-row batches (one transaction each, gallery changes
+included). Students whose roll number is already in the database are
+skipped, so an interrupted run can simply be started again.
+"""
+
+import argparse
+import csv
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import cv2
+import MySQLdb
+
+from config import Config
+from dashboard_stats import bump
+from embedding_format import encode_embedding
+
+PHOTO_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+
+# Same layout as photos saved by the registration form
+PHOTO_DIR = os.path.join('static', 'uploads', 'students')
+
+STUDENT_COLUMNS = ('roll_number', 'name', 'branch', 'section', 'date_of_birth',
+                   'mobile_number', 'mail_id', 'address', 'photo_path', 'face_embedding')
+
+# ---------------------------------------------------------------------------
+# Worker process side
+# ---------------------------------------------------------------------------
+
+_system = None
+
+
+def _init_worker(use_gpu):
+    global _system
+    from face_recognition_system import FaceRecognitionSystem
+    _system = FaceRecognitionSystem(
+        use_gpu=use_gpu,
+        registration_det_size=Config.REGISTRATION_DETECTION_SIZE,
+        max_input_size=Config.MAX_INPUT_SIZE,
+        modules=Config.FACE_MODEL_MODULES
+    )
+
+
+def enroll_photo(student):
+    """
+    Extract one student's embedding and save their photo
+
+    Returns:
+        (student, embedding_blob, photo_path, None) or
+        (student, None, None, rejection reason)
+    """
+    image = cv2.imread(student['photo_file'])
+    if image is None:
+        return student, None, None, 'photo could not be read'
+
+    bboxes, kpss = _system.detect(image, [_system.registration_det_size])
+    if len(bboxes) == 0:
+        return student, None, None, 'no face detected'
+    if len(bboxes) > 1:
+        return student, None, None, f'{len(bboxes)} faces detected'
+
+    embedding = _system.embed_faces(image, kpss)[0]
+
+    photo_filename = f"{student['roll_number']}_{datetime.now().strftime('%Y%m%d%H%M%S')}.jpg"
+    photo_path = os.path.join(PHOTO_DIR, photo_filename)
+    cv2.imwrite(os.path.join(Config.UPLOAD_FOLDER, 'students', photo_filename), image)
+    return student, encode_embedding(embedding), photo_path, None
+
+
+# ---------------------------------------------------------------------------
+# Parent process side
+# ---------------------------------------------------------------------------
+
+def find_photo(photo_dir, row):
+    if row.get('photo'):
+        path = os.path.join(photo_dir, row['photo'])
+        return path if os.path.isfile(path) else None
+    for extension in PHOTO_EXTENSIONS:
+        path = os.path.join(photo_dir, row['roll_number'] + extension)
+        if os.path.isfile(path):
+            return path
+    return None
+
+
+def read_students(csv_path, photo_dir):
+    """Parse the CSV; returns (students, rejects)"""
+    students, rejects = [], []
+    seen = set()
+    with open(csv_path, newline='', encoding='utf-8-sig') as f:
+        for row in csv.DictReader(f):
+            row = {key.strip().lower(): (value or '').strip() for key, value in row.items() if key}
+            roll_number = row.get('roll_number', '')
+            if not roll_number or not row.get('name'):
+                rejects.append((roll_number, row.get('photo', ''), 'missing roll_number or name'))
+                continue
+            if roll_number in seen:
+                rejects.append((roll_number, row.get('photo', ''), 'duplicate roll_number in CSV'))
+                continue
+            seen.add(roll_number)
+
+            photo_file = find_photo(photo_dir, row)
+            if photo_file is None:
+                rejects.append((roll_number, row.get('photo', ''), 'photo not found'))
+                continue
+
+            row['photo_file'] = photo_file
+            students.append(row)
+    return students, rejects
+
+
+def existing_roll_numbers(cursor):
+    cursor.execute("SELECT roll_number FROM students")
+    return {row[0] for row in cursor.fetchall()}
+
+
+def insert_batch(conn, cursor, batch):
+    """Insert accepted students and their gallery changes in one transaction"""
+    values = ', '.join(['(' + ', '.join(['%s'] * len(STUDENT_COLUMNS)) + ')'] * len(batch))
+    params = []
+    for student, blob, photo_path in batch:
+        params.extend([
+            student['roll_number'], student['name'], student.get('branch') or None,
+            student.get('section') or None, student.get('dob') or None, student.get('mobile') or None,
+            student.get('email') or None, student.get('address') or None, photo_path, blob
+        ])
+    cursor.execute(f"INSERT INTO students ({', '.join(STUDENT_COLUMNS)}) VALUES {values}", params)
+
+    # Auto-increment ids of a multi-row insert aren't guaranteed consecutive: look them up
+    roll_numbers = [student['roll_number'] for student, _, _ in batch]
+    placeholders = ', '.join(['%s'] * len(roll_numbers))
+    cursor.execute(f"SELECT id FROM students WHERE roll_number IN ({placeholders})", roll_numbers)
+    student_ids = [row[0] for row in cursor.fetchall()]
+    cursor.execute(
+        "INSERT INTO gallery_changes (student_id, operation) VALUES "
+        + ', '.join(["(%s, 'upsert')"] * len(student_ids)),
+        student_ids
+    )
+    bump(cursor, 'students', len(batch))
+    conn.commit()
+
+
+def write_report(path, rejects):
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['roll_number', 'photo', 'reason'])
+        writer.writerows(rejects)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Enrol students from a CSV and a photo folder")
+    parser.add_argument('csv', help="admissions CSV")
+    parser.add_argument('photos', help="directory of ID photos")
+    parser.add_argument('--workers', type=int, default=max(1, (os.cpu_count() or 2) // 2))
+    parser.add_argument('--batch-size', type=int, default=200, help="students per INSERT/transaction")
+    parser.add_argument('--report', default='enrollment_rejects.csv', help="where to write rejected rows")
+    parser.add_argument('--gpu', action='store_true', help="use the CUDA provider")
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("  Bulk Student Enrolment")
+    print("=" * 60)
+
+    try:
+        students, rejects = read_students(args.csv, args.photos)
+    except OSError as e:
+        print(f"❌ {e}")
+        return False
+
+    try:
+        conn = MySQLdb.connect(
+            host=Config.MYSQL_HOST,
+            user=Config.MYSQL_USER,
+            passwd=Config.MYSQL_PASSWORD,
+            db=Config.MYSQL_DB
+        )
+    except MySQLdb.Error as e:
+        print(f"\n❌ Database Error: {e}")
+        return False
+    cursor = conn.cursor()
+
+    # Resume: anything already enrolled is skipped
+    enrolled = existing_roll_numbers(cursor)
+    pending = [s for s in students if s['roll_number'] not in enrolled]
+    print(f"\nStudents in CSV: {len(students) + len(rejects)}")
+    print(f"Already enrolled: {len(students) - len(pending)}")
+    print(f"To enrol: {len(pending)} with {args.workers} workers")
+
+    os.makedirs(os.path.join(Config.UPLOAD_FOLDER, 'students'), exist_ok=True)
+    inserted = 0
+    batch = []
+    start = time.perf_counter()
+    try:
+        # spawn: ONNX Runtime state must not be forked
+        with ProcessPoolExecutor(max_workers=args.workers,
+                                 mp_context=multiprocessing.get_context('spawn'),
+                                 initializer=_init_worker, initargs=(args.gpu,)) as pool:
+            for student, blob, photo_path, reason in pool.map(enroll_photo, pending, chunksize=4):
+                if reason:
+                    rejects.append((student['roll_number'], student['photo_file'], reason))
+                    continue
+                batch.append((student, blob, photo_path))
+                if len(batch) >= args.batch_size:
+                    insert_batch(conn, cursor, batch)
+                    inserted += len(batch)
+                    batch = []
+                    rate = inserted / (time.perf_counter() - start) * 60
+                    print(f"   ✓ {inserted} enrolled ({rate:.0f}/min)")
+            if batch:
+                insert_batch(conn, cursor, batch)
+                inserted += len(batch)
+    except MySQLdb.Error as e:
+        conn.rollback()
+        print(f"\n❌ Database Error: {e}")
+        print("   Re-run the same command to resume")
+        return False
+    finally:
+        cursor.close()
+        conn.close()
+        write_report(args.report, rejects)
+
+    elapsed = time.perf_counter() - start
+    print(f"\n✓ Enrolled {inserted} student(s) in {elapsed:.1f}s"
+          f" ({inserted / elapsed * 60 if elapsed else 0:.0f}/min)")
+    if rejects:
+        print(f"⚠️  {len(rejects)} rejected, see {args.report}")
+    print("\nRun 'python gallery_snapshot.py' to publish a fresh gallery snapshot")
+    return True
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
@@ -0,0 +1,155 @@
+"""
+Class sessions and their rosters.
+
+A faculty member opens a session for a subject/period; its roster is either
+an explicit list of students (session_roster) or every student of the
+session's branch (and section, if given). An explicit list is final: it
+never widens to the branch or to everyone, even if every student on it is
+later deleted. Recognition matches faces against
+the roster first and only falls back to the whole institution for faces
+the roster doesn't explain.
+
+Each process also remembers which students it has recognised in a session,
+so ending the session only has to look up the rest of the roster before
+marking them absent.
+"""
+
+import threading
+from collections import OrderedDict
+from datetime import date, datetime
+
+# Rosters cached per process; a session lasts one period so entries are
+# never stale for long, and the oldest are dropped past this many
+ROSTER_CACHE_SIZE = 256
+
+_roster_cache = OrderedDict()
+_roster_lock = threading.Lock()
+
+# session id -> set of student ids recognised in this process
+_recognized = OrderedDict()
+_recognized_lock = threading.Lock()
+
+
+class EmptyRoster(ValueError):
+    """Raised when none of a session's explicit roll numbers match a student"""
+
+    def __init__(self, unmatched):
+        super().__init__(f"No student matches the roster's roll numbers: {', '.join(unmatched)}")
+        self.unmatched = unmatched
+
+
+def open_session(cursor, faculty_id, subject, period, branch=None, section=None, roll_numbers=None):
+    """
+    Create a session row and its explicit roster (if roll numbers are given)
+
+    Returns:
+        (session_id, roster_size, unmatched): roster_size is None when the
+        session matches against everyone; unmatched lists the given roll
+        numbers that no student has
+
+    Raises:
+        EmptyRoster: roll numbers were given but none of them matched
+    """
+    student_ids, unmatched = [], []
+    if roll_numbers:
+        roll_numbers = list(dict.fromkeys(roll_numbers))
+        placeholders = ', '.join(['%s'] * len(roll_numbers))
+        cursor.execute(f"SELECT id, roll_number FROM students WHERE roll_number IN ({placeholders})",
+                       roll_numbers)
+        # roll_number compares case-insensitively in MySQL, so here too
+        found = {roll_number.lower(): student_id for student_id, roll_number in cursor.fetchall()}
+        student_ids = sorted(set(found.values()))
+        unmatched = [roll for roll in roll_numbers if roll.lower() not in found]
+        if not student_ids:
+            raise EmptyRoster(unmatched)
+
+    now = datetime.now()
+    cursor.execute("""
+        INSERT INTO sessions (faculty_id, subject, session_date, period_number, branch, section,
+                              explicit_roster, start_time)
+        VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+    """, (faculty_id, subject, date.today(), period, branch or None, section or None,
+          bool(student_ids), now.time()))
+    session_id = cursor.lastrowid
+
+    if student_ids:
+        values = ', '.join(['(%s, %s)'] * len(student_ids))
+        params = []
+        for student_id in student_ids:
+            params.extend([session_id, student_id])
+        cursor.execute(f"INSERT INTO session_roster (session_id, student_id) VALUES {values}", params)
+
+    roster = get_roster(cursor, session_id)
+    return session_id, (len(roster) if roster is not None else None), unmatched
+
+
+def close_session(cursor, session_id):
+    """Stamp the session's end time and drop its cached roster and recognised students"""
+    cursor.execute("UPDATE sessions SET end_time = %s WHERE id = %s",
+                   (datetime.now().time(), session_id))
+    with _roster_lock:
+        _roster_cache.pop(int(session_id), None)
+    with _recognized_lock:
+        _recognized.pop(int(session_id), None)
+
+
+def note_recognized(session_id, student_ids):
+    """Remember students that now hold a row for the session's period"""
+    session_id = int(session_id)
+    with _recognized_lock:
+        _recognized.setdefault(session_id, set()).update(student_ids)
+        _recognized.move_to_end(session_id)
+        while len(_recognized) > ROSTER_CACHE_SIZE:
+            _recognized.popitem(last=False)
+
+
+def recognized_students(session_id):
+    """Students this process has recognised in a session (a hint, not the full set)"""
+    with _recognized_lock:
+        return frozenset(_recognized.get(int(session_id), ()))
+
+
+def get_roster(cursor, session_id):
+    """
+    Student ids on a session's roster (cached per process)
+
+    Returns:
+        frozenset of student ids, or None if the session doesn't exist or
+        has no roster criteria (match against everyone)
+    """
+    session_id = int(session_id)
+    with _roster_lock:
+        if session_id in _roster_cache:
+            _roster_cache.move_to_end(session_id)
+            return _roster_cache[session_id]
+
+    roster = _load_roster(cursor, session_id)
+
+    with _roster_lock:
+        _roster_cache[session_id] = roster
+        while len(_roster_cache) > ROSTER_CACHE_SIZE:
+            _roster_cache.popitem(last=False)
+    return roster
+
+
+def _load_roster(cursor, session_id):
+    cursor.execute("SELECT branch, section, explicit_roster FROM sessions WHERE id = %s", [session_id])
+    session_row = cursor.fetchone()
+    if session_row is None:
+        return None
+    branch, section, explicit_roster = session_row
+
+    # An explicit list wins over branch/section, and is used as-is even if
+    # it has emptied since (rows from before explicit_roster count too)
+    cursor.execute("SELECT student_id FROM session_roster WHERE session_id = %s", [session_id])
+    explicit = frozenset(row[0] for row in cursor.fetchall())
+    if explicit or explicit_roster:
+        return explicit
+
+    if not branch:
+        return None
+    if section:
+        cursor.execute("SELECT id FROM students WHERE branch = %s AND section = %s", (branch, section))
+    else:
+        cursor.execute("SELECT id FROM students WHERE branch = %s", [branch])
+    return frozenset(row[0] for row in cursor.fetchall())
@@ -12,6 +12,13 @@ class Config:
     MYSQL_DB = os.environ.get('MYSQL_DB') or 'attendance_system'
     MYSQL_CURSORCLASS = 'DictCursor'
     
+    # Connection pool (db_pool.py)
+    MYSQL_POOL_MIN_SIZE = int(os.environ.get('MYSQL_POOL_MIN_SIZE', 2))
+    MYSQL_POOL_MAX_SIZE = int(os.environ.get('MYSQL_POOL_MAX_SIZE', 10))
+    MYSQL_POOL_RECYCLE = 3600                 # Replace connections older than this (seconds)
+    MYSQL_POOL_TIMEOUT = 10                   # Seconds a request waits for a free connection
+    MYSQL_POOL_HEALTH_CHECK_INTERVAL = 30     # Ping connections idle longer than this
+    
     # Upload Configuration
     UPLOAD_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static', 'uploads')
     MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB max file size
@@ -27,6 +34,69 @@ class Config:
     FACE_RECOGNITION_THRESHOLD = 0.4
     FACE_DETECTION_SIZE = (640, 640)
     USE_GPU = True  # Set to False if no CUDA support
+    
+    # Detector input per use case. Registration photos hold one large face,
+    # so a small input is enough; classroom photos can list several sizes
+    # (e.g. [(640, 640), (1024, 1024)]) to catch small faces at the back.
+    REGISTRATION_DETECTION_SIZE = (320, 320)
+    ATTENDANCE_DETECTION_SIZES = [FACE_DETECTION_SIZE]
+    MAX_INPUT_SIZE = 1920  # Longest side before detection; larger frames are downscaled
+    
+    # InsightFace models to load. Attendance only needs these two; add e.g.
+    # 'genderage' or 'landmark_3d_68' only if something reads their output
+    # (see benchmark_models.py for the cost). None loads the whole pack.
+    # Inference workers (INFERENCE_WORKERS > 0) only run these two.
+    FACE_MODEL_MODULES = ['detection', 'recognition']
+    FACE_MODEL_WARM_UP = True       # Run a synthetic inference before /readyz reports ready
+    FACE_MODEL_WAIT_SECONDS = 30    # How long a request waits for models still loading
+    
+    # Inference worker pool (0 = run models in the request thread). Each
+    # worker process holds its own model copy; aligned crops from concurrent
+    # requests are batched into one recognition call.
+    INFERENCE_WORKERS = int(os.environ.get('INFERENCE_WORKERS', 0))
+    INFERENCE_MAX_BATCH = 64        # Crops per recognition call
+    INFERENCE_MAX_WAIT_MS = 10      # Longest a crop waits for its batch to fill
+    INFERENCE_QUEUE_SIZE = 32       # Frames in flight before requests get a 503
+    INFERENCE_RESULT_TIMEOUT = 30   # Seconds a request waits for the workers before a 503
+    
+    # Asynchronous attendance jobs (/attendance/mark with async=1)
+    ATTENDANCE_JOB_WORKERS = int(os.environ.get('ATTENDANCE_JOB_WORKERS', 4))
+    ATTENDANCE_JOB_TTL = 600        # Seconds a finished job's result stays available
+    ATTENDANCE_JOB_QUEUE_SIZE = 32  # Jobs waiting for a worker before requests get a 503
+    
+    # Face templates per student (primary embedding + student_templates)
+    TEMPLATE_MAX_PER_STUDENT = 5        # Oldest learned templates are pruned past this
+    TEMPLATE_LEARN_MIN_SIMILARITY = 0.6 # Attendance matches this confident add a template...
+    TEMPLATE_LEARN_MAX_SIMILARITY = 0.85  # ...unless they are this close to an existing one
+    
+    # Dashboard counters (dashboard_stats.py)
+    DASHBOARD_RECONCILE_SECONDS = 600   # Recompute counters from the tables this often (0 = never)
+    
+    # Student, faculty and attendance listings (listings.py)
+    LISTING_PAGE_SIZE = 50          # Rows per page unless ?limit= asks for fewer/more
+    LISTING_MAX_PAGE_SIZE = 500     # Largest ?limit= accepted
+    
+    # Attendance export (attendance_export.py)
+    EXPORT_BATCH_ROWS = 5000        # Rows fetched per round trip from the unbuffered cursor
+    
+    # Unchanged-frame detection for /attendance/mark
+    FRAME_CACHE_SIZE = 256          # Classes whose last frame is remembered
+    
+    # Continuous (video) attendance mode
+    STREAM_FRAME_INTERVAL_MS = 1000 # How often the browser sends a frame
+    STREAM_IDLE_TIMEOUT = 300       # Seconds without frames before a stream is dropped
+    
+    # Face Gallery Configuration
+    # Shared, memory-mapped embedding snapshot read by every worker process
+    GALLERY_SNAPSHOT_DIR = os.environ.get('GALLERY_SNAPSHOT_DIR') or \
+        os.path.join(os.path.dirname(os.path.abspath(__file__)), 'instance', 'gallery')
+    GALLERY_SNAPSHOT_TAIL_ROWS = 256  # Republish after this many new enrolments
+    
+    # Nearest-neighbour index: 'exact' (brute force) or 'ivf' (approximate).
+    # Check recall with benchmark_index.py before switching to 'ivf'.
+    FACE_INDEX = os.environ.get('FACE_INDEX') or 'exact'
+    FACE_IVF_NLIST = 0    # Partitions, 0 = 4 * sqrt(students)
+    FACE_IVF_NPROBE = 8   # Partitions scanned per face; higher = better recall
 
 class DevelopmentConfig(Config):
     """Development configuration"""
@@ -39,9 +109,10 @@ class ProductionConfig(Config):
     TESTING = False
     SESSION_COOKIE_SECURE = True
     
-    # Override with environment variables in production
+    # Override with environment variables in production. Only enforced when
+    # actually running in production so scripts can import Config anywhere.
     SECRET_KEY = os.environ.get('SECRET_KEY')
-    if not SECRET_KEY:
+    if not SECRET_KEY and os.environ.get('FLASK_ENV') == 'production':
         raise ValueError("SECRET_KEY environment variable must be set in production")
 
 class TestingConfig(Config):
@@ -0,0 +1,171 @@
+"""
+Dashboard counters.
+
+The admin dashboard shows total students, total faculty and students
+present today. Instead of COUNT queries over those tables on every page
+load, the numbers live in the dashboard_counters table and are bumped in
+the same transaction as the writes that change them:
+
+    students                    student registration / bulk enrolment
+    faculty                     faculty registration
+    present:<YYYY-MM-DD>        mark_present, once per student per day
+
+Reads go through a short per-process TTL cache, so a page left on
+auto-refresh costs at most one primary-key lookup per TTL. Bumps only
+update rows that exist; a missing counter (first read, or a new day) is
+computed from the base tables on read. reconcile() recomputes everything
+and runs periodically to correct any drift:
+
+    python dashboard_stats.py
+"""
+
+import threading
+import time
+from datetime import date
+
+# Seconds a process serves counters from memory
+CACHE_TTL = 5
+
+_cache = {}
+_cache_lock = threading.Lock()
+
+
+def present_key(day):
+    return f"present:{day.isoformat()}"
+
+
+def _count(cursor, name):
+    """Compute one counter from the base tables"""
+    if name == 'students':
+        cursor.execute("SELECT COUNT(*) FROM students")
+    elif name == 'faculty':
+        cursor.execute("SELECT COUNT(*) FROM faculty")
+    else:
+        cursor.execute("""
+            SELECT COUNT(DISTINCT student_id) FROM attendance
+            WHERE session_date = %s AND status = 'present'
+        """, [name.split(':', 1)[1]])
+    return cursor.fetchone()[0]
+
+
+def _store(cursor, values):
+    placeholders = ', '.join(['(%s, %s)'] * len(values))
+    params = []
+    for name, value in values.items():
+        params.extend([name, value])
+    cursor.execute(f"""
+        INSERT INTO dashboard_counters (name, value) VALUES {placeholders}
+        ON DUPLICATE KEY UPDATE value = VALUES(value)
+    """, params)
+
+
+def bump(cursor, name, delta):
+    """Adjust a counter inside the caller's transaction"""
+    if not delta:
+        return
+    cursor.execute("UPDATE dashboard_counters SET value = value + %s WHERE name = %s", (delta, name))
+    with _cache_lock:
+        _cache.clear()
+
+
+def get_counters(cursor, day=None):
+    """
+    Dashboard numbers for ``day`` (default today)
+
+    Returns:
+        dict with total_students, total_faculty and present_today
+    """
+    day = day or date.today()
+    names = ['students', 'faculty', present_key(day)]
+
+    with _cache_lock:
+        cached = _cache.get(day)
+        if cached and time.monotonic() - cached[0] < CACHE_TTL:
+            return dict(cached[1])
+
+    placeholders = ', '.join(['%s'] * len(names))
+    cursor.execute(f"SELECT name, value FROM dashboard_counters WHERE name IN ({placeholders})", names)
+    values = dict(cursor.fetchall())
+
+    missing = {name: _count(cursor, name) for name in names if name not in values}
+    if missing:
+        _store(cursor, missing)
+        values.update(missing)
+
+    counters = {
+        'total_students': int(values['students']),
+        'total_faculty': int(values['faculty']),
+        'present_today': int(values[present_key(day)])
+    }
+    with _cache_lock:
+        _cache[day] = (time.monotonic(), counters)
+    return dict(counters)
+
+
+def reconcile(cursor, days=None):
+    """
+    Recompute counters from the base tables
+
+    Returns:
+        {name: (stored, actual)} for every counter that had drifted
+    """
+    names = ['students', 'faculty'] + [present_key(day) for day in (days or [date.today()])]
+    placeholders = ', '.join(['%s'] * len(names))
+    cursor.execute(f"SELECT name, value FROM dashboard_counters WHERE name IN ({placeholders})", names)
+    stored = dict(cursor.fetchall())
+
+    actual = {name: _count(cursor, name) for name in names}
+    _store(cursor, actual)
+    with _cache_lock:
+        _cache.clear()
+    return {name: (stored.get(name), value) for name, value in actual.items() if stored.get(name) != value}
+
+
+class Reconciler:
+    """Runs a reconcile callback every ``interval`` seconds on a daemon thread"""
+
+    def __init__(self, run, interval=600):
+        self._run = run
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._thread = None
+        self.last_drift = None
+
+    def start(self):
+        """Begin the periodic loop (no-op once started)"""
+        with self._lock:
+            if self._thread is None and self.interval > 0:
+                self._thread = threading.Thread(target=self._loop, name='dashboard-reconcile', daemon=True)
+                self._thread.start()
+
+    def _loop(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.last_drift = self._run()
+            except Exception as e:
+                print(f"⚠️  Dashboard counter reconcile failed: {e}")
+
+
+if __name__ == '__main__':
+    import MySQLdb
+    from config import Config
+
+    conn = MySQLdb.connect(
+        host=Config.MYSQL_HOST,
+        user=Config.MYSQL_USER,
+        passwd=Config.MYSQL_PASSWORD,
+        db=Config.MYSQL_DB
+    )
+    try:
+        cursor = conn.cursor()
+        drift = reconcile(cursor)
+        conn.commit()
+        cursor.close()
+    finally:
+        conn.close()
+
+    if drift:
+        for name, (stored, value) in drift.items():
+            print(f"⚠️  {name}: {stored} -> {value}")
+    print("✓ Dashboard counters reconciled")
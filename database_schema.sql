@@ -24,10 +24,13 @@ CREATE TABLE students (
     mobile_number VARCHAR(15),
     mail_id VARCHAR(100),
     address TEXT,
+    section VARCHAR(10),
     photo_path VARCHAR(255),
     face_embedding LONGBLOB,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-    INDEX idx_roll_number (roll_number)
+    INDEX idx_roll_number (roll_number),
+    INDEX idx_student_name (name),
+    INDEX idx_branch_section (branch, section)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
 
 -- =============================================
@@ -41,7 +44,8 @@ CREATE TABLE faculty (
     mobile_number VARCHAR(15),
     photo_path VARCHAR(255),
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-    INDEX idx_emp_id (emp_id)
+    INDEX idx_emp_id (emp_id),
+    INDEX idx_faculty_name (name)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
 
 -- =============================================
@@ -60,11 +64,99 @@ CREATE TABLE attendance (
     FOREIGN KEY (student_id) REFERENCES students(id) ON DELETE CASCADE,
     FOREIGN KEY (faculty_id) REFERENCES faculty(id) ON DELETE CASCADE,
     UNIQUE KEY unique_attendance (student_id, session_date, period_number),
-    INDEX idx_date (session_date),
+    -- Day listings page through this in (period_number, student_id) order
+    INDEX idx_date_period_student (session_date, period_number, student_id),
     INDEX idx_student (student_id),
     INDEX idx_faculty (faculty_id)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
 
+-- =============================================
+-- Gallery Changes Table (face gallery versioning)
+-- =============================================
+-- Every write to students appends a row here in the same transaction.
+-- The highest id is the gallery version; app workers apply only the rows
+-- newer than the version they hold instead of reloading every embedding.
+CREATE TABLE gallery_changes (
+    id BIGINT PRIMARY KEY AUTO_INCREMENT,
+    student_id INT NOT NULL,
+    operation ENUM('upsert', 'delete') NOT NULL DEFAULT 'upsert',
+    changed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    INDEX idx_gallery_student (student_id)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+-- =============================================
+-- Student Templates Table (extra face templates)
+-- =============================================
+-- students.face_embedding is the primary template. Extra captures from
+-- registration ('enrolment') and templates learned from confident
+-- attendance matches ('attendance') live here; the gallery scores each
+-- student by their best template. Learned templates are capped per student.
+CREATE TABLE student_templates (
+    id INT PRIMARY KEY AUTO_INCREMENT,
+    student_id INT NOT NULL,
+    embedding LONGBLOB NOT NULL,
+    source ENUM('enrolment', 'attendance') NOT NULL DEFAULT 'enrolment',
+    quality FLOAT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (student_id) REFERENCES students(id) ON DELETE CASCADE,
+    INDEX idx_template_student (student_id, source, created_at)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+-- =============================================
+-- Dashboard Counters Table
+-- =============================================
+-- Admin dashboard numbers, bumped in the same transaction as the writes
+-- that change them: 'students', 'faculty' and 'present:<YYYY-MM-DD>'.
+-- See dashboard_stats.py; reconcile() recomputes them from the tables.
+CREATE TABLE dashboard_counters (
+    name VARCHAR(50) PRIMARY KEY,
+    value BIGINT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+-- =============================================
+-- Attendance Aggregates (materialized)
+-- =============================================
+-- Running present/total counts per student and per student and subject,
+-- updated in the same transaction as attendance inserts (attendance_db.py).
+-- Rebuild from the attendance table with: python attendance_stats.py
+CREATE TABLE student_attendance_stats (
+    student_id INT PRIMARY KEY,
+    present INT NOT NULL DEFAULT 0,
+    total INT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    FOREIGN KEY (student_id) REFERENCES students(id) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+CREATE TABLE student_subject_stats (
+    student_id INT NOT NULL,
+    subject VARCHAR(100) NOT NULL,
+    present INT NOT NULL DEFAULT 0,
+    total INT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    PRIMARY KEY (student_id, subject),
+    FOREIGN KEY (student_id) REFERENCES students(id) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+-- =============================================
+-- Attendance Jobs Table
+-- =============================================
+-- State of asynchronous /attendance/mark requests, shared by every web
+-- worker process (attendance_jobs.JobStore). Rows expire after
+-- ATTENDANCE_JOB_TTL seconds.
+CREATE TABLE attendance_jobs (
+    id CHAR(32) PRIMARY KEY,
+    owner INT,
+    stage VARCHAR(20) NOT NULL DEFAULT 'queued',
+    progress FLOAT NOT NULL DEFAULT 0,
+    status_code INT,
+    result LONGTEXT,
+    error TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    finished_at TIMESTAMP NULL,
+    INDEX idx_job_created (created_at)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
 -- =============================================
 -- Sessions Table
 -- =============================================
@@ -74,6 +166,9 @@ CREATE TABLE sessions (
     subject VARCHAR(100) NOT NULL,
     session_date DATE NOT NULL,
     period_number INT NOT NULL,
+    branch VARCHAR(50),
+    section VARCHAR(10),
+    explicit_roster BOOLEAN NOT NULL DEFAULT FALSE,
     start_time TIME,
     end_time TIME,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
@@ -81,6 +176,20 @@ CREATE TABLE sessions (
     INDEX idx_session_date (session_date)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
 
+-- =============================================
+-- Session Roster Table
+-- =============================================
+-- Explicit list of students expected in a session (sessions.explicit_roster
+-- set; never widened, even once empty). Otherwise the roster is every
+-- student of the session's branch/section, or everyone without a branch.
+CREATE TABLE session_roster (
+    session_id INT NOT NULL,
+    student_id INT NOT NULL,
+    PRIMARY KEY (session_id, student_id),
+    FOREIGN KEY (session_id) REFERENCES sessions(id) ON DELETE CASCADE,
+    FOREIGN KEY (student_id) REFERENCES students(id) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
 -- =============================================
 -- Attendance Log Table (for audit trail)
 -- =============================================
@@ -114,6 +223,9 @@ INSERT INTO faculty (emp_id, name, department, mobile_number) VALUES
 -- =============================================
 
 -- View: Attendance Summary by Student
+-- classes_attended / total_classes count days, as they always have;
+-- periods_attended, total_periods and period_percentage read the
+-- materialized per-period counts in student_attendance_stats
 CREATE VIEW attendance_summary AS
 SELECT 
     s.id as student_id,
@@ -126,9 +238,13 @@ SELECT
         (COUNT(DISTINCT CASE WHEN a.status = 'present' THEN a.session_date END) * 100.0 / 
         NULLIF(COUNT(DISTINCT a.session_date), 0)), 
         2
-    ) as attendance_percentage
+    ) as attendance_percentage,
+    COALESCE(MAX(st.present), 0) as periods_attended,
+    COALESCE(MAX(st.total), 0) as total_periods,
+    ROUND(MAX(st.present) * 100.0 / NULLIF(MAX(st.total), 0), 2) as period_percentage
 FROM students s
 LEFT JOIN attendance a ON s.id = a.student_id
+LEFT JOIN student_attendance_stats st ON st.student_id = s.id
 GROUP BY s.id, s.roll_number, s.name, s.branch;
 
 -- View: Daily Attendance Summary
@@ -153,6 +269,7 @@ ORDER BY a.session_date DESC, a.period_number;
 DELIMITER //
 
 -- Procedure: Mark all absent students for a session
+-- (keeps the attendance aggregates in step, like attendance_db.mark_absent)
 CREATE PROCEDURE mark_absent_students(
     IN p_session_date DATE,
     IN p_period_number INT,
@@ -160,14 +277,17 @@ CREATE PROCEDURE mark_absent_students(
     IN p_subject VARCHAR(100)
 )
 BEGIN
-    INSERT INTO attendance (student_id, faculty_id, subject, session_date, period_number, status)
-    SELECT 
-        s.id, 
-        p_faculty_id, 
-        p_subject, 
-        p_session_date, 
-        p_period_number, 
-        'absent'
+    -- Never leave the temporary table on a pooled connection: a failed
+    -- call would make the next one fail with "table already exists"
+    DECLARE EXIT HANDLER FOR SQLEXCEPTION
+    BEGIN
+        DROP TEMPORARY TABLE IF EXISTS absent_students;
+        RESIGNAL;
+    END;
+    DROP TEMPORARY TABLE IF EXISTS absent_students;
+
+    CREATE TEMPORARY TABLE absent_students AS
+    SELECT s.id
     FROM students s
     WHERE NOT EXISTS (
         SELECT 1 
@@ -176,6 +296,26 @@ BEGIN
         AND a.session_date = p_session_date 
         AND a.period_number = p_period_number
     );
+
+    INSERT INTO attendance (student_id, faculty_id, subject, session_date, period_number, status)
+    SELECT 
+        id, 
+        p_faculty_id, 
+        p_subject, 
+        p_session_date, 
+        p_period_number, 
+        'absent'
+    FROM absent_students;
+
+    INSERT INTO student_attendance_stats (student_id, present, total)
+    SELECT id, 0, 1 FROM absent_students
+    ON DUPLICATE KEY UPDATE total = total + 1;
+
+    INSERT INTO student_subject_stats (student_id, subject, present, total)
+    SELECT id, p_subject, 0, 1 FROM absent_students
+    ON DUPLICATE KEY UPDATE total = total + 1;
+
+    DROP TEMPORARY TABLE absent_students;
 END //
 
 -- Procedure: Get student attendance percentage
@@ -187,13 +327,12 @@ BEGIN
         s.roll_number,
         s.name,
         s.branch,
-        COUNT(CASE WHEN a.status = 'present' THEN 1 END) as present,
-        COUNT(*) as total,
-        ROUND((COUNT(CASE WHEN a.status = 'present' THEN 1 END) * 100.0 / COUNT(*)), 2) as percentage
+        COALESCE(st.present, 0) as present,
+        COALESCE(st.total, 0) as total,
+        ROUND(st.present * 100.0 / NULLIF(st.total, 0), 2) as percentage
     FROM students s
-    LEFT JOIN attendance a ON s.id = a.student_id
-    WHERE s.id = p_student_id
-    GROUP BY s.id, s.roll_number, s.name, s.branch;
+    LEFT JOIN student_attendance_stats st ON st.student_id = s.id
+    WHERE s.id = p_student_id;
 END //
 
 DELIMITER ;
@@ -0,0 +1,364 @@
+"""
+MySQL connection pool.
+
+Flask-MySQLdb opened a new connection (TCP connect plus authentication)
+for every request context. ConnectionPool keeps up to ``max_size``
+connections open and hands them out per request instead:
+
+- checkout waits up to ``timeout`` seconds when every connection is busy
+- a connection idle for longer than ``health_check_interval`` is pinged
+  before it is handed out, and replaced if the server dropped it
+- connections older than ``recycle`` seconds are closed and reopened,
+  staying clear of the server's wait_timeout
+- a returned connection is rolled back, so an uncommitted transaction
+  never leaks into the next request
+
+PooledMySQL is a drop-in for flask_mysqldb.MySQL: ``mysql.connection`` is
+checked out on first use in an app context and returned at teardown.
+
+Smoke test against a local MySQL or MariaDB (credentials from config.py):
+
+    python db_pool.py --threads 32 --max-size 4
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+
+import MySQLdb
+from flask import g, has_app_context
+
+
+class PoolExhausted(RuntimeError):
+    """Raised when no connection frees up within the checkout timeout"""
+
+
+class _Entry:
+    __slots__ = ('conn', 'created', 'last_used')
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.created = self.last_used = time.monotonic()
+
+
+class ConnectionPool:
+    def __init__(self, min_size=2, max_size=10, recycle=3600, timeout=10,
+                 health_check_interval=30, **connect_kwargs):
+        """
+        Args:
+            min_size: connections opened up front (on first checkout)
+            max_size: most connections open at once
+            recycle: seconds after which a connection is replaced
+            timeout: seconds a checkout waits for a free connection
+            health_check_interval: idle seconds after which a connection
+                is pinged before reuse (0 pings on every checkout)
+            connect_kwargs: passed to MySQLdb.connect
+        """
+        self.min_size = min(min_size, max_size)
+        self.max_size = max_size
+        self.recycle = recycle
+        self.timeout = timeout
+        self.health_check_interval = health_check_interval
+        self.connect_kwargs = connect_kwargs
+
+        self._cond = threading.Condition()
+        self._idle = []
+        self._in_use = {}
+        self._size = 0
+        self._filled = False
+        self._closed = False
+        self._stats = {
+            'checkouts': 0, 'timeouts': 0, 'opened': 0, 'closed': 0,
+            'recycled': 0, 'failed_health_checks': 0, 'wait_ms_total': 0.0, 'wait_ms_max': 0.0
+        }
+
+    # -- connections --------------------------------------------------------
+
+    def _open(self):
+        conn = MySQLdb.connect(**self.connect_kwargs)
+        with self._cond:
+            self._stats['opened'] += 1
+        return _Entry(conn)
+
+    def _close(self, entry):
+        try:
+            entry.conn.close()
+        except MySQLdb.Error:
+            pass
+        with self._cond:
+            self._stats['closed'] += 1
+
+    def _healthy(self, entry):
+        now = time.monotonic()
+        if now - entry.created > self.recycle:
+            with self._cond:
+                self._stats['recycled'] += 1
+            return False
+        if now - entry.last_used >= self.health_check_interval:
+            try:
+                entry.conn.ping()
+            except MySQLdb.Error:
+                with self._cond:
+                    self._stats['failed_health_checks'] += 1
+                return False
+        return True
+
+    def _fill(self):
+        """Open the first min_size connections"""
+        with self._cond:
+            if self._filled:
+                return
+            self._filled = True
+            wanted = max(0, self.min_size - self._size)
+            self._size += wanted
+        for _ in range(wanted):
+            try:
+                entry = self._open()
+            except MySQLdb.Error:
+                with self._cond:
+                    self._size -= 1
+                continue
+            with self._cond:
+                self._idle.append(entry)
+                self._cond.notify()
+
+    # -- checkout / checkin -------------------------------------------------
+
+    def acquire(self, timeout=None):
+        """
+        Check out a connection
+
+        Raises:
+            PoolExhausted: none became free within the timeout
+            MySQLdb.Error: a new connection could not be opened
+        """
+        self._fill()
+        timeout = self.timeout if timeout is None else timeout
+        start = time.monotonic()
+        deadline = start + timeout
+
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise PoolExhausted("Connection pool is closed")
+                if self._idle:
+                    # LIFO: busy periods reuse the warmest connections
+                    entry = self._idle.pop()
+                    break
+                if self._size < self.max_size:
+                    self._size += 1
+                    entry = None
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._stats['timeouts'] += 1
+                    raise PoolExhausted(f"No database connection free after {timeout}s "
+                                        f"({self.max_size} in use)")
+                self._cond.wait(remaining)
+
+        try:
+            if entry is not None and not self._healthy(entry):
+                self._close(entry)
+                entry = None
+            if entry is None:
+                entry = self._open()
+        except Exception:
+            with self._cond:
+                self._size -= 1
+                self._cond.notify()
+            raise
+
+        wait_ms = (time.monotonic() - start) * 1000
+        with self._cond:
+            self._in_use[id(entry.conn)] = entry
+            self._stats['checkouts'] += 1
+            self._stats['wait_ms_total'] += wait_ms
+            self._stats['wait_ms_max'] = max(self._stats['wait_ms_max'], wait_ms)
+        return entry.conn
+
+    def release(self, conn, discard=False):
+        """Return a connection (rolled back) to the pool"""
+        with self._cond:
+            entry = self._in_use.pop(id(conn), None)
+        if entry is None:
+            return
+
+        if not discard:
+            try:
+                conn.rollback()
+            except MySQLdb.Error:
+                discard = True
+        if self._closed or time.monotonic() - entry.created > self.recycle:
+            discard = True
+
+        if discard:
+            self._close(entry)
+        entry.last_used = time.monotonic()
+        with self._cond:
+            if discard:
+                self._size -= 1
+            else:
+                self._idle.append(entry)
+            self._cond.notify()
+
+    @contextmanager
+    def connection(self, timeout=None):
+        """``with pool.connection() as conn:`` - checked back in on exit"""
+        conn = self.acquire(timeout)
+        try:
+            yield conn
+        except MySQLdb.OperationalError:
+            # The connection itself may be broken: don't reuse it
+            self.release(conn, discard=True)
+            raise
+        except BaseException:
+            self.release(conn)
+            raise
+        else:
+            self.release(conn)
+
+    def close(self):
+        """Close idle connections; busy ones are closed as they come back"""
+        with self._cond:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._size -= len(idle)
+            self._cond.notify_all()
+        for entry in idle:
+            self._close(entry)
+
+    def stats(self):
+        with self._cond:
+            stats = dict(self._stats)
+            stats.update(size=self._size, in_use=len(self._in_use), idle=len(self._idle),
+                         max_size=self.max_size)
+        stats['wait_ms_mean'] = round(stats['wait_ms_total'] / stats['checkouts'], 3) if stats['checkouts'] else 0
+        stats['wait_ms_total'] = round(stats['wait_ms_total'], 3)
+        stats['wait_ms_max'] = round(stats['wait_ms_max'], 3)
+        return stats
+
+
+class PooledMySQL:
+    """Flask extension with the flask_mysqldb.MySQL interface, backed by a pool"""
+
+    def __init__(self, app=None, **pool_options):
+        self.pool_options = pool_options
+        self.pool = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        # Connections are only opened on first use, so importing the app stays cheap
+        self.pool = ConnectionPool(
+            host=app.config.get('MYSQL_HOST', 'localhost'),
+            user=app.config.get('MYSQL_USER', 'root'),
+            passwd=app.config.get('MYSQL_PASSWORD', ''),
+            db=app.config.get('MYSQL_DB'),
+            port=app.config.get('MYSQL_PORT', 3306),
+            charset=app.config.get('MYSQL_CHARSET', 'utf8mb4'),
+            use_unicode=True,
+            **self.pool_options
+        )
+        app.teardown_appcontext(self.teardown)
+
+    @property
+    def connection(self):
+        """This app context's connection, checked out on first use"""
+        if not has_app_context():
+            return None
+        if 'mysql_connection' not in g:
+            g.mysql_connection = self.pool.acquire()
+        return g.mysql_connection
+
+    def teardown(self, exception):
+        conn = g.pop('mysql_connection', None)
+        if conn is not None:
+            self.pool.release(conn)
+
+
+def smoke_test(threads, max_size, queries):
+    """Hammer the pool from many threads and check its invariants"""
+    from config import Config
+
+    pool = ConnectionPool(min_size=1, max_size=max_size, health_check_interval=0,
+                          host=Config.MYSQL_HOST, user=Config.MYSQL_USER,
+                          passwd=Config.MYSQL_PASSWORD, db=Config.MYSQL_DB)
+    peak = [0]
+    errors = []
+
+    def worker():
+        for _ in range(queries):
+            try:
+                with pool.connection() as conn:
+                    peak[0] = max(peak[0], pool.stats()['in_use'])
+                    cursor = conn.cursor()
+                    cursor.execute("SELECT SLEEP(0.01)")
+                    cursor.fetchall()
+                    cursor.close()
+            except Exception as e:
+                errors.append(e)
+
+    print(f"\n1. {threads} threads x {queries} queries over {max_size} connections...")
+    start = time.perf_counter()
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+    elapsed = time.perf_counter() - start
+    if errors:
+        print(f"❌ {len(errors)} checkout(s) failed, first: {errors[0]}")
+        return False
+    if peak[0] > max_size:
+        print(f"❌ {peak[0]} connections in use, above max_size {max_size}")
+        return False
+    print(f"✓ {threads * queries} queries in {elapsed:.2f}s, peak in use {peak[0]}")
+
+    print("\n2. Killing an idle connection server-side...")
+    victim = pool.acquire()
+    cursor = victim.cursor()
+    cursor.execute("SELECT CONNECTION_ID()")
+    victim_id = cursor.fetchone()[0]
+    cursor.close()
+    pool.release(victim)
+    admin = MySQLdb.connect(host=Config.MYSQL_HOST, user=Config.MYSQL_USER,
+                            passwd=Config.MYSQL_PASSWORD, db=Config.MYSQL_DB)
+    admin.cursor().execute(f"KILL {int(victim_id)}")
+    admin.close()
+
+    # The victim is the most recently returned, so the next checkout gets it
+    for _ in range(2):
+        with pool.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT 1")
+            cursor.close()
+    stats = pool.stats()
+    if stats['failed_health_checks'] < 1:
+        print("❌ The killed connection was not detected on checkout")
+        return False
+    print("✓ Dead connection detected by the health check and replaced")
+
+    print(f"\nPool stats: {stats}")
+    pool.close()
+    return True
+
+
+if __name__ == "__main__":
+    import argparse
+    import sys
+
+    parser = argparse.ArgumentParser(description="Connection pool smoke test against a live MySQL/MariaDB")
+    parser.add_argument('--threads', type=int, default=32)
+    parser.add_argument('--max-size', type=int, default=4)
+    parser.add_argument('--queries', type=int, default=20, help="queries per thread")
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("  Connection Pool Smoke Test")
+    print("=" * 60)
+    try:
+        ok = smoke_test(args.threads, args.max_size, args.queries)
+    except MySQLdb.Error as e:
+        print(f"\n❌ Database Error: {e}")
+        ok = False
+    sys.exit(0 if ok else 1)
@@ -0,0 +1,96 @@
+"""
+Binary storage format for face embeddings (students.face_embedding).
+
+Every blob is a fixed-size record:
+
+    offset  size  field
+    0       2     magic b'FE'
+    2       1     format version (1)
+    3       1     model id (1 = InsightFace buffalo_l / ArcFace R50)
+    4       2     dimension, uint16 little-endian (512)
+    6       2     reserved, zero
+    8       4*dim embedding, float32 little-endian
+
+so a 512-d embedding takes 2056 bytes. The 8-byte header is exactly two
+float32 words, which lets a whole table be decoded with one np.frombuffer
+over the concatenated blobs and a column slice.
+
+Rows written before this format hold pickled numpy arrays; they are still
+read (through an unpickler that only accepts numpy arrays) until
+migrate_embeddings.py has converted them.
+"""
+
+import io
+import pickle
+import struct
+
+import numpy as np
+
+MAGIC = b'FE'
+FORMAT_VERSION = 1
+MODEL_BUFFALO_L = 1
+EMBEDDING_DIM = 512
+
+_HEADER = struct.Struct('<2sBBHH')
+HEADER_SIZE = _HEADER.size  # 8 bytes
+_HEADER_WORDS = HEADER_SIZE // 4
+
+# Only what numpy needs to rebuild an ndarray from a pickle
+_ALLOWED_PICKLE_GLOBALS = {
+    ('numpy', 'ndarray'),
+    ('numpy', 'dtype'),
+    ('numpy.core.multiarray', '_reconstruct'),
+    ('numpy._core.multiarray', '_reconstruct'),
+    ('numpy.core.multiarray', 'scalar'),
+    ('numpy._core.multiarray', 'scalar'),
+}
+
+
+class _LegacyUnpickler(pickle.Unpickler):
+    """Unpickler for old embedding blobs that refuses anything but arrays"""
+
+    def find_class(self, module, name):
+        if (module, name) in _ALLOWED_PICKLE_GLOBALS:
+            return super().find_class(module, name)
+        raise pickle.UnpicklingError(f"Refusing to load {module}.{name} from an embedding blob")
+
+
+def encode_embedding(embedding, model_id=MODEL_BUFFALO_L):
+    """Serialise one embedding into the fixed-size binary record"""
+    vector = np.asarray(embedding, dtype='<f4').ravel()
+    return _HEADER.pack(MAGIC, FORMAT_VERSION, model_id, len(vector), 0) + vector.tobytes()
+
+
+def is_binary(blob):
+    """True if the blob is in the binary format (False for legacy pickles)"""
+    if len(blob) < HEADER_SIZE or bytes(blob[:2]) != MAGIC:
+        return False
+    _magic, version, _model, dim, _reserved = _HEADER.unpack_from(blob)
+    return version == FORMAT_VERSION and len(blob) == HEADER_SIZE + 4 * dim
+
+
+def decode_embedding(blob):
+    """Decode one blob in either format into a float32 vector"""
+    if is_binary(blob):
+        return np.frombuffer(blob, dtype='<f4', offset=HEADER_SIZE).astype(np.float32)
+    return np.asarray(_LegacyUnpickler(io.BytesIO(blob)).load(), dtype=np.float32).ravel()
+
+
+def decode_embeddings(blobs):
+    """
+    Decode many blobs into one (rows x dim) float32 matrix
+
+    Binary records of the same size are decoded together with a single
+    np.frombuffer; legacy pickles are decoded one at a time.
+    """
+    if not blobs:
+        return np.zeros((0, EMBEDDING_DIM), dtype=np.float32)
+
+    binary = [is_binary(blob) for blob in blobs]
+    record_size = len(blobs[0])
+    if all(binary) and all(len(blob) == record_size for blob in blobs):
+        words = record_size // 4
+        matrix = np.frombuffer(b''.join(blobs), dtype='<f4').reshape(len(blobs), words)
+        return matrix[:, _HEADER_WORDS:].astype(np.float32)
+
+    return np.stack([decode_embedding(blob) for blob in blobs])
@@ -0,0 +1,398 @@
+"""
+In-memory gallery of enrolled student face embeddings.
+
+All templates (the primary embedding plus any rows in student_templates)
+are held as a single L2-normalised float32 matrix with parallel id / roll
+number / name arrays, so matching every detected face against every
+template is one matrix multiply instead of a Python loop. A student may
+own several rows; each is scored by their best template.
+
+Writes to the students table are recorded in ``gallery_changes``; the id of
+the newest row is the gallery version. Each process applies only the rows
+newer than the version it holds (append upserts, tombstone deletes) and
+compacts the matrix once enough tombstones have built up.
+
+With a ``snapshot_dir`` the compacted matrix lives in a read-only mmap
+shared by every worker (see gallery_snapshot.py); only rows enrolled since
+the snapshot are held privately, and a cold worker starts matching without
+reading the face_embedding blobs at all.
+"""
+
+import threading
+
+import numpy as np
+
+import gallery_snapshot
+from embedding_format import decode_embeddings
+from face_index import create_index
+
+# Compact once this fraction of rows are tombstones
+COMPACT_RATIO = 0.2
+
+# Publish a new snapshot once this many rows are held outside it
+SNAPSHOT_TAIL_ROWS = 256
+
+# Every template of the selected students: the primary embedding, then the
+# extra templates. Ordered by student so a student's rows are contiguous.
+TEMPLATE_ROWS_SQL = """
+    SELECT id, roll_number, name, face_embedding FROM students {students}
+    UNION ALL
+    SELECT s.id, s.roll_number, s.name, t.embedding
+    FROM student_templates t JOIN students s ON s.id = t.student_id {templates}
+    ORDER BY 1
+"""
+
+
+def normalize_rows(matrix):
+    """L2-normalise each row of a 2-D array (zero rows are left as zeros)"""
+    matrix = np.asarray(matrix, dtype=np.float32)
+    if matrix.ndim == 1:
+        matrix = matrix.reshape(1, -1)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def record_change(cursor, student_id, operation='upsert'):
+    """
+    Bump the gallery version for one student
+
+    Must be executed in the same transaction as the students write so the
+    change is only visible once the row itself is committed.
+    """
+    cursor.execute(
+        "INSERT INTO gallery_changes (student_id, operation) VALUES (%s, %s)",
+        (student_id, operation)
+    )
+
+
+def segment_max(scores, starts):
+    """
+    Column-wise max over contiguous segments
+
+    ``scores`` is (queries x rows) with each student's rows adjacent;
+    ``starts`` holds the first column of every segment. Returns a
+    (queries x segments) array.
+    """
+    return np.maximum.reduceat(scores, starts, axis=1)
+
+
+def _decode_rows(rows):
+    """Split (id, roll_number, name, face_embedding) rows into parallel lists"""
+    rows = [row for row in rows if row[3] is not None]
+    ids = [row[0] for row in rows]
+    rolls = [row[1] for row in rows]
+    names = [row[2] for row in rows]
+    vectors = decode_embeddings([row[3] for row in rows]) if rows else []
+    return ids, rolls, names, vectors
+
+
+class FaceGallery:
+    """Resident, vectorised gallery used by mark_attendance"""
+
+    def __init__(self, snapshot_dir=None, snapshot_tail_rows=SNAPSHOT_TAIL_ROWS,
+                 index_kind='exact', index_params=None):
+        # _lock guards the swap of the row arrays read by match();
+        # _write_lock serialises loads and refreshes so that slow work
+        # (decoding, index builds, snapshot writes) happens outside _lock
+        self._lock = threading.Lock()
+        self._write_lock = threading.RLock()
+        self.index_kind = index_kind
+        self.index_params = index_params or {}
+        self.index = create_index(index_kind, **self.index_params)
+        self.snapshot_dir = snapshot_dir
+        self.snapshot_tail_rows = snapshot_tail_rows
+        self._snapshot_stamp = None
+        self.loaded = False
+        self.version = 0
+        # Rows [0, len(base)) come from the snapshot mmap (or the last full
+        # load), rows after that are enrolments appended since
+        self.base = np.zeros((0, 0), dtype=np.float32)
+        self.tail = np.zeros((0, 0), dtype=np.float32)
+        self.student_ids = np.zeros(0, dtype=np.int64)
+        self.roll_numbers = np.zeros(0, dtype=object)
+        self.names = np.zeros(0, dtype=object)
+        self.alive = np.zeros(0, dtype=bool)
+        self._row_of = {}
+
+    def __len__(self):
+        return len(self._row_of)
+
+    @property
+    def embeddings(self):
+        """All rows (including tombstones) as one matrix"""
+        if self.tail.size == 0:
+            return self.base
+        if self.base.size == 0:
+            return self.tail
+        return np.concatenate([self.base, self.tail])
+
+    def _build_index(self, base):
+        """Index the base rows (the tail is always scanned exactly)"""
+        index = create_index(self.index_kind, **self.index_params)
+        index.build(base)
+        return index
+
+    def _reset(self, base, index, ids, rolls, names, version):
+        """Replace the whole gallery (caller holds the lock)"""
+        self.base = base
+        self.index = index
+        self.tail = np.zeros((0, 0), dtype=np.float32)
+        self.student_ids = np.asarray(ids, dtype=np.int64)
+        self.roll_numbers = np.asarray(rolls, dtype=object)
+        self.names = np.asarray(names, dtype=object)
+        self.alive = np.ones(len(self.student_ids), dtype=bool)
+        self._row_of = {}
+        for row, student_id in enumerate(self.student_ids):
+            self._row_of.setdefault(int(student_id), []).append(row)
+        self.version = version
+        self.loaded = True
+
+    def load(self, cursor):
+        """Load the gallery from the shared snapshot, or from the database"""
+        with self._write_lock:
+            self._load(cursor)
+
+    def _load(self, cursor):
+        if self.snapshot_dir and self._load_snapshot():
+            self._refresh(cursor)
+            return
+
+        # Read the version first: changes committed during the load are
+        # simply re-applied by the next refresh
+        cursor.execute("SELECT COALESCE(MAX(id), 0) FROM gallery_changes")
+        version = cursor.fetchone()[0]
+
+        cursor.execute(TEMPLATE_ROWS_SQL.format(students='', templates=''))
+        ids, rolls, names, vectors = _decode_rows(cursor.fetchall())
+
+        base = normalize_rows(vectors) if len(vectors) else np.zeros((0, 0), dtype=np.float32)
+        index = self._build_index(base)
+        with self._lock:
+            self._reset(base, index, ids, rolls, names, version)
+
+        # Publish for the other workers and switch to the shared copy
+        if self.snapshot_dir and self.write_snapshot():
+            self._load_snapshot()
+
+    def _load_snapshot(self):
+        """Map the shared snapshot if it is at least as new as our state"""
+        snapshot = gallery_snapshot.read_snapshot(self.snapshot_dir)
+        if snapshot is None:
+            return False
+
+        self._snapshot_stamp = snapshot['stamp']
+        if self.loaded and snapshot['version'] < self.version:
+            return False
+
+        index = self._build_index(snapshot['embeddings'])
+        with self._lock:
+            self._reset(snapshot['embeddings'], index, snapshot['student_ids'],
+                        snapshot['roll_numbers'], snapshot['names'], snapshot['version'])
+        return True
+
+    def write_snapshot(self):
+        """Publish the live rows of this gallery as the shared snapshot"""
+        with self._lock:
+            embeddings, keep, version = self.embeddings, self.alive, self.version
+            ids, rolls, names = self.student_ids, self.roll_numbers, self.names
+        embeddings = embeddings[keep] if keep.size else np.zeros((0, 0), dtype=np.float32)
+        return gallery_snapshot.write_snapshot(self.snapshot_dir, version, embeddings,
+                                               ids[keep], rolls[keep], names[keep])
+
+    def refresh(self, cursor):
+        """Bring the gallery up to date, applying only the pending changes"""
+        with self._write_lock:
+            self._refresh(cursor)
+
+    def _refresh(self, cursor):
+        if not self.loaded:
+            self._load(cursor)
+            return
+
+        # Another worker published a newer snapshot: drop our private rows
+        if self.snapshot_dir and gallery_snapshot.index_stamp(self.snapshot_dir) != self._snapshot_stamp:
+            self._load_snapshot()
+
+        cursor.execute("""
+            SELECT id, student_id, operation FROM gallery_changes
+            WHERE id > %s ORDER BY id
+        """, [self.version])
+        changes = cursor.fetchall()
+        if not changes:
+            return
+
+        # Only the last operation per student matters
+        latest = {}
+        for change_id, student_id, operation in changes:
+            latest[student_id] = operation
+        upserts = [sid for sid, op in latest.items() if op == 'upsert']
+
+        rows = []
+        if upserts:
+            placeholders = ', '.join(['%s'] * len(upserts))
+            cursor.execute(TEMPLATE_ROWS_SQL.format(students=f"WHERE id IN ({placeholders})",
+                                                    templates=f"WHERE s.id IN ({placeholders})"),
+                           upserts + upserts)
+            rows = cursor.fetchall()
+
+        self.apply_changes(latest.keys(), rows, changes[-1][0])
+
+    def apply_changes(self, changed_ids, rows, version):
+        """Tombstone every row of each changed student and append the fresh rows"""
+        with self._write_lock:
+            self._apply_changes(changed_ids, rows, version)
+
+    def _apply_changes(self, changed_ids, rows, version):
+        ids, rolls, names, vectors = _decode_rows(rows)
+
+        # Build the new arrays privately, then swap them in
+        alive = self.alive.copy()
+        row_of = dict(self._row_of)
+        for student_id in changed_ids:
+            for row in row_of.pop(student_id, ()):
+                alive[row] = False
+
+        tail = self.tail
+        student_ids, roll_numbers, all_names = self.student_ids, self.roll_numbers, self.names
+        if len(vectors):
+            new_rows = normalize_rows(vectors)
+            tail = new_rows if tail.size == 0 else np.concatenate([tail, new_rows])
+            start = len(student_ids)
+            for offset, student_id in enumerate(ids):
+                row_of[student_id] = row_of.get(student_id, []) + [start + offset]
+            student_ids = np.concatenate([student_ids, np.asarray(ids, dtype=np.int64)])
+            roll_numbers = np.concatenate([roll_numbers, np.asarray(rolls, dtype=object)])
+            all_names = np.concatenate([all_names, np.asarray(names, dtype=object)])
+            alive = np.concatenate([alive, np.ones(len(ids), dtype=bool)])
+
+        with self._lock:
+            self.tail = tail
+            self.student_ids, self.roll_numbers, self.names = student_ids, roll_numbers, all_names
+            self.alive = alive
+            self._row_of = row_of
+            self.version = max(self.version, version)
+
+        dead = len(alive) - int(alive.sum())
+        needs_compact = dead and dead >= COMPACT_RATIO * len(alive)
+        needs_snapshot = len(tail) >= self.snapshot_tail_rows
+        if self.snapshot_dir:
+            if (needs_compact or needs_snapshot) and self.write_snapshot():
+                self._load_snapshot()
+        elif needs_compact:
+            self._compact()
+
+    def _compact(self):
+        """Drop tombstoned rows into a private matrix"""
+        keep = self.alive
+        base = self.embeddings[keep]
+        index = self._build_index(base)
+        with self._lock:
+            self._reset(base, index, self.student_ids[keep], self.roll_numbers[keep],
+                        self.names[keep], self.version)
+
+    def _state(self):
+        """Consistent view of the rows for one lock-free search"""
+        with self._lock:
+            return (self.base, self.tail, self.alive, self.index, self._row_of,
+                    self.student_ids, self.roll_numbers, self.names)
+
+    @staticmethod
+    def _search_all(queries, base, tail, alive, index):
+        """
+        Best row and score per query over the whole gallery
+
+        The best template overall belongs to the student with the best
+        per-student maximum, so top-1 over rows needs no segment reduction.
+        """
+        n_base = base.shape[0] if base.size else 0
+
+        # Base rows go through the configured index
+        scores, rows = index.search(queries, k=1, alive=alive[:n_base])
+        best_scores, best = scores[:, 0], rows[:, 0]
+
+        # Rows enrolled since the last snapshot are always scanned exactly
+        if tail.size:
+            tail_similarities = queries @ tail.T
+            tail_similarities[:, ~alive[n_base:]] = -np.inf
+            tail_best = np.argmax(tail_similarities, axis=1)
+            tail_scores = tail_similarities[np.arange(len(tail_best)), tail_best]
+            better = tail_scores > best_scores
+            best_scores = np.where(better, tail_scores, best_scores)
+            best = np.where(better, n_base + tail_best, best)
+        return best_scores, best
+
+    @staticmethod
+    def _search_rows(queries, base, tail, rows, ids):
+        """
+        Best student and score per query over an explicit set of live rows
+
+        Each student's templates are scored in one multiply and reduced to
+        the student's best with a segment max. Returns the first row of the
+        winning student.
+        """
+        # Sort so each student's templates form one contiguous segment
+        rows = rows[np.argsort(ids[rows], kind='stable')]
+        owners = ids[rows]
+        starts = np.flatnonzero(np.r_[True, owners[1:] != owners[:-1]])
+
+        n_base = base.shape[0] if base.size else 0
+        in_base = rows < n_base
+        matrix = np.empty((len(rows), queries.shape[1]), dtype=np.float32)
+        if in_base.any():
+            matrix[in_base] = base[rows[in_base]]
+        if not in_base.all():
+            matrix[~in_base] = tail[rows[~in_base] - n_base]
+
+        per_student = segment_max(queries @ matrix.T, starts)
+        best = np.argmax(per_student, axis=1)
+        return per_student[np.arange(len(best)), best], rows[starts[best]]
+
+    def match(self, face_embeddings, threshold=0.4, candidates=None):
+        """
+        Match detected faces against the gallery
+
+        Args:
+            face_embeddings: array-like of shape (faces, dim)
+            threshold: minimum cosine similarity for a match
+            candidates: optional student ids (a session roster) searched
+                first; only faces with no match among them are searched
+                against the whole gallery
+
+        Returns:
+            list with one entry per face: (student_id, roll_number, name, similarity)
+            for a match, or None when no student clears the threshold
+        """
+        if len(face_embeddings) == 0:
+            return []
+
+        base, tail, alive, index, row_of, ids, rolls, names = self._state()
+        if not alive.any():
+            return [None] * len(face_embeddings)
+
+        queries = normalize_rows(face_embeddings)
+        best_scores = np.full(len(queries), -np.inf, dtype=np.float32)
+        best = np.full(len(queries), -1, dtype=np.int64)
+        pending = np.arange(len(queries))
+
+        if candidates:
+            rows = np.fromiter((row for sid in candidates for row in row_of.get(sid, ())), dtype=np.int64)
+            if rows.size:
+                scores, found = self._search_rows(queries, base, tail, rows, ids)
+                hit = scores > threshold
+                best_scores[hit], best[hit] = scores[hit], found[hit]
+                pending = pending[~hit]
+
+        if pending.size:
+            scores, found = self._search_all(queries[pending], base, tail, alive, index)
+            best_scores[pending], best[pending] = scores, found
+
+        matched = best_scores > threshold
+
+        results = []
+        for face_idx, row in enumerate(best):
+            if matched[face_idx]:
+                results.append((int(ids[row]), rolls[row], names[row], float(best_scores[face_idx])))
+            else:
+                results.append(None)
+        return results
@@ -0,0 +1,161 @@
+"""
+Nearest-neighbour indexes over the L2-normalised gallery matrix.
+
+ExactIndex is a brute-force matrix multiply and is the default. IVFIndex
+partitions the gallery with spherical k-means and only scans the ``nprobe``
+partitions whose centroids are closest to each query, trading a little
+recall for latency on very large galleries. Use benchmark_index.py to
+measure recall@1 against exact search before switching.
+"""
+
+import numpy as np
+
+
+class ExactIndex:
+    """Brute-force cosine search"""
+
+    kind = 'exact'
+
+    def __init__(self):
+        self.matrix = np.zeros((0, 0), dtype=np.float32)
+
+    def build(self, matrix):
+        """Index a (rows x dim) matrix of normalised embeddings"""
+        self.matrix = matrix
+
+    def search(self, queries, k=1, alive=None):
+        """
+        Find the k most similar rows for every query
+
+        Returns:
+            (scores, rows): two (queries x k) arrays, padded with -inf / -1
+        """
+        n_queries = len(queries)
+        if self.matrix.size == 0:
+            return _empty(n_queries, k)
+
+        similarities = queries @ self.matrix.T
+        if alive is not None:
+            similarities[:, ~alive] = -np.inf
+        return _top_k(similarities, np.arange(similarities.shape[1]), k)
+
+
+class IVFIndex:
+    """Inverted-file index with spherical k-means partitions"""
+
+    kind = 'ivf'
+
+    def __init__(self, nlist=0, nprobe=8, train_iters=10, train_size=50000, seed=0):
+        """
+        Args:
+            nlist: number of partitions (0 = 4 * sqrt(rows))
+            nprobe: partitions scanned per query; higher = better recall
+            train_iters: k-means iterations
+            train_size: rows sampled to train the centroids
+        """
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.train_iters = train_iters
+        self.train_size = train_size
+        self.seed = seed
+        self.matrix = np.zeros((0, 0), dtype=np.float32)
+        self.centroids = np.zeros((0, 0), dtype=np.float32)
+        self.lists = []
+
+    def build(self, matrix):
+        """Train centroids and assign every row to its nearest partition"""
+        self.matrix = matrix
+        n_rows = len(matrix)
+        if n_rows == 0:
+            self.centroids = np.zeros((0, 0), dtype=np.float32)
+            self.lists = []
+            return
+
+        nlist = self.nlist or int(4 * np.sqrt(n_rows))
+        nlist = max(1, min(nlist, n_rows))
+
+        rng = np.random.default_rng(self.seed)
+        sample = matrix
+        if n_rows > self.train_size:
+            sample = matrix[np.sort(rng.choice(n_rows, self.train_size, replace=False))]
+        sample = np.asarray(sample, dtype=np.float32)
+
+        centroids = sample[rng.choice(len(sample), nlist, replace=False)].copy()
+        for _ in range(self.train_iters):
+            assignment = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignment, sample)
+            norms = np.linalg.norm(sums, axis=1, keepdims=True)
+            # Empty partitions keep their previous centroid
+            filled = norms[:, 0] > 0
+            centroids[filled] = sums[filled] / norms[filled]
+
+        # Assign in chunks so a 100k-row gallery doesn't need a huge temporary
+        assignment = np.empty(n_rows, dtype=np.int64)
+        for start in range(0, n_rows, 8192):
+            chunk = np.asarray(matrix[start:start + 8192])
+            assignment[start:start + len(chunk)] = np.argmax(chunk @ centroids.T, axis=1)
+
+        order = np.argsort(assignment, kind='stable')
+        bounds = np.searchsorted(assignment[order], np.arange(nlist + 1))
+        self.centroids = centroids
+        self.lists = [order[bounds[i]:bounds[i + 1]] for i in range(nlist)]
+
+    def search(self, queries, k=1, alive=None):
+        """Approximate top-k search over the nprobe closest partitions"""
+        n_queries = len(queries)
+        if self.matrix.size == 0:
+            return _empty(n_queries, k)
+
+        nprobe = min(self.nprobe, len(self.lists))
+        centroid_scores = queries @ self.centroids.T
+        probes = np.argpartition(-centroid_scores, nprobe - 1, axis=1)[:, :nprobe]
+
+        scores = np.full((n_queries, k), -np.inf, dtype=np.float32)
+        rows = np.full((n_queries, k), -1, dtype=np.int64)
+        for q in range(n_queries):
+            candidates = np.concatenate([self.lists[p] for p in probes[q]])
+            if alive is not None:
+                candidates = candidates[alive[candidates]]
+            if candidates.size == 0:
+                continue
+            similarities = self.matrix[candidates] @ queries[q]
+            top_scores, top_rows = _top_k(similarities[np.newaxis, :], candidates, k)
+            scores[q], rows[q] = top_scores[0], top_rows[0]
+        return scores, rows
+
+
+def _empty(n_queries, k):
+    return (np.full((n_queries, k), -np.inf, dtype=np.float32),
+            np.full((n_queries, k), -1, dtype=np.int64))
+
+
+def _top_k(similarities, row_ids, k):
+    """Top-k (sorted, descending) of each row of a similarity matrix"""
+    n_queries, n_rows = similarities.shape
+    scores, rows = _empty(n_queries, k)
+    take = min(k, n_rows)
+    if take == 0:
+        return scores, rows
+
+    if take < n_rows:
+        part = np.argpartition(-similarities, take - 1, axis=1)[:, :take]
+    else:
+        part = np.tile(np.arange(n_rows), (n_queries, 1))
+    part_scores = np.take_along_axis(similarities, part, axis=1)
+    order = np.argsort(-part_scores, axis=1)
+    best = np.take_along_axis(part, order, axis=1)
+
+    scores[:, :take] = np.take_along_axis(similarities, best, axis=1)
+    rows[:, :take] = row_ids[best]
+    rows[scores == -np.inf] = -1
+    return scores, rows
+
+
+def create_index(kind='exact', **params):
+    """Build an empty index by name ('exact' or 'ivf'); exact ignores params"""
+    if kind == 'exact':
+        return ExactIndex()
+    if kind == 'ivf':
+        return IVFIndex(**params)
+    raise ValueError(f"Unknown face index type: {kind}")
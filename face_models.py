@@ -0,0 +1,91 @@
+"""
+Lazy, background loading of the face recognition models.
+
+Importing app.py no longer touches ONNX: the models are built on a
+background thread the first time anything asks for them (the first
+request, or an explicit start() from a server hook), then warmed up on a
+synthetic frame so the first real request doesn't pay for ONNX Runtime's
+graph optimisation. /readyz reports ready only once that is done.
+
+Under gunicorn, start loading as soon as a worker forks:
+
+    def post_fork(server, worker):
+        from app import face_models
+        face_models.start()
+"""
+
+import threading
+import time
+
+
+class ModelsNotReady(RuntimeError):
+    """Raised when the models are still loading (or failed to load)"""
+
+
+class FaceModelManager:
+    def __init__(self, factory, warm_up=True):
+        """
+        Args:
+            factory: callable building a FaceRecognitionSystem
+            warm_up: run one synthetic inference before reporting ready
+        """
+        self._factory = factory
+        self._warm_up = warm_up
+        self._lock = threading.Lock()
+        self._ready = threading.Event()
+        self._thread = None
+        self._system = None
+        self.error = None
+        self.load_seconds = None
+
+    @property
+    def ready(self):
+        return self._system is not None
+
+    def start(self):
+        """Begin loading in the background (no-op once started)"""
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._load, name='face-model-loader', daemon=True)
+                self._thread.start()
+
+    def _load(self):
+        start = time.perf_counter()
+        try:
+            system = self._factory()
+            if self._warm_up:
+                system.warm_up()
+            self.load_seconds = time.perf_counter() - start
+            self._system = system
+        except Exception as e:
+            self.error = e
+        finally:
+            self._ready.set()
+
+    def get(self, timeout=None):
+        """
+        The loaded FaceRecognitionSystem, waiting up to ``timeout`` seconds
+
+        Raises:
+            ModelsNotReady: still loading after the timeout, or loading failed
+        """
+        self.start()
+        self._ready.wait(timeout)
+        if self._system is not None:
+            return self._system
+        if self.error is not None:
+            raise ModelsNotReady(f"Face models failed to load: {self.error}")
+        raise ModelsNotReady("Face models are still loading, please retry shortly")
+
+    def status(self):
+        """Readiness summary for /readyz"""
+        if self._system is not None:
+            status = {'status': 'ready', 'load_seconds': round(self.load_seconds, 2)}
+            if hasattr(self._system, 'stats'):
+                status['inference'] = self._system.stats()
+            return status
+        if self.error is not None:
+            return {'status': 'failed', 'error': str(self.error)}
+        if self._thread is None:
+            return {'status': 'not_started'}
+        return {'status': 'loading'}
@@ -0,0 +1,216 @@
+"""
+Face detection and embedding extraction on top of InsightFace.
+
+Detection resolution is chosen per use case: registration photos hold a
+single large face and use a small detector input, classroom photos use one
+or more larger sizes (multi-scale, merged with NMS). Oversized frames are
+downscaled before detection and the boxes/landmarks mapped back, so the
+ArcFace alignment still crops from the full-resolution frame.
+"""
+
+import cv2
+import numpy as np
+from insightface.app import FaceAnalysis
+from insightface.app.common import Face
+from insightface.utils import face_align
+
+# InsightFace tasks needed for attendance: app.py only reads the embedding,
+# bbox, det_score and kps of each face
+DEFAULT_MODULES = ('detection', 'recognition')
+
+# IoU above which detections from different scales are the same face
+MULTI_SCALE_NMS_IOU = 0.4
+
+
+def downscale(image, max_size):
+    """
+    Shrink an image so its longest side is at most ``max_size``
+
+    Returns:
+        (image, scale): the possibly resized image and the factor applied
+        (coordinates on it divided by ``scale`` map back to the original)
+    """
+    height, width = image.shape[:2]
+    longest = max(height, width)
+    if not max_size or longest <= max_size:
+        return image, 1.0
+    scale = max_size / longest
+    resized = cv2.resize(image, (round(width * scale), round(height * scale)),
+                         interpolation=cv2.INTER_AREA)
+    return resized, scale
+
+
+def nms(bboxes, iou_threshold=MULTI_SCALE_NMS_IOU):
+    """Indices of boxes kept by greedy non-maximum suppression (score in column 4)"""
+    x1, y1, x2, y2, scores = bboxes[:, 0], bboxes[:, 1], bboxes[:, 2], bboxes[:, 3], bboxes[:, 4]
+    areas = (x2 - x1 + 1) * (y2 - y1 + 1)
+    order = scores.argsort()[::-1]
+
+    keep = []
+    while order.size > 0:
+        i = order[0]
+        keep.append(i)
+        xx1 = np.maximum(x1[i], x1[order[1:]])
+        yy1 = np.maximum(y1[i], y1[order[1:]])
+        xx2 = np.minimum(x2[i], x2[order[1:]])
+        yy2 = np.minimum(y2[i], y2[order[1:]])
+        inter = np.maximum(0.0, xx2 - xx1 + 1) * np.maximum(0.0, yy2 - yy1 + 1)
+        iou = inter / (areas[i] + areas[order[1:]] - inter)
+        order = order[1:][iou <= iou_threshold]
+    return np.asarray(keep, dtype=np.int64)
+
+
+class FaceRecognitionSystem:
+    def __init__(self, use_gpu=True, registration_det_size=(320, 320),
+                 attendance_det_sizes=((640, 640),), max_input_size=1920, det_thresh=0.5,
+                 modules=DEFAULT_MODULES):
+        """
+        Args:
+            use_gpu: try the CUDA execution provider before the CPU one
+            registration_det_size: detector input for single-face registration
+            attendance_det_sizes: one or more detector inputs for classroom
+                photos; several sizes are run and merged (multi-scale)
+            max_input_size: frames whose longest side exceeds this are
+                downscaled before detection (None/0 disables)
+            det_thresh: minimum detection score
+            modules: InsightFace tasks to load from the model pack (None loads
+                all of them, e.g. landmark_3d_68 and genderage); extra tasks
+                are run on every face after recognition
+        """
+        providers = ['CUDAExecutionProvider', 'CPUExecutionProvider'] if use_gpu else ['CPUExecutionProvider']
+        self.registration_det_size = tuple(registration_det_size)
+        self.attendance_det_sizes = [tuple(size) for size in attendance_det_sizes]
+        self.max_input_size = max_input_size
+
+        allowed_modules = list(modules) if modules else None
+        self.app = FaceAnalysis(providers=providers, allowed_modules=allowed_modules)
+        self.app.prepare(ctx_id=0 if use_gpu else -1, det_thresh=det_thresh,
+                         det_size=self.attendance_det_sizes[0])
+        self.det_model = self.app.det_model
+        self.rec_model = self.app.models['recognition']
+        self.extra_models = [model for task, model in self.app.models.items()
+                             if task not in DEFAULT_MODULES]
+
+    def warm_up(self):
+        """
+        Run every configured detector size and the recognition model once on
+        synthetic input so ONNX Runtime finishes its lazy initialisation
+        """
+        height, width = max(self.attendance_det_sizes + [self.registration_det_size])[::-1]
+        frame = np.random.default_rng(0).integers(0, 256, (height, width, 3), dtype=np.uint8)
+        for det_size in set(self.attendance_det_sizes + [self.registration_det_size]):
+            self.det_model.detect(frame, input_size=det_size)
+        crop_size = self.rec_model.input_size[0]
+        self.rec_model.get_feat([frame[:crop_size, :crop_size]])
+
+    def detect(self, image, det_sizes):
+        """
+        Detect faces at one or more detector resolutions
+
+        Returns:
+            (bboxes, kpss): (N x 5) boxes with score and (N x 5 x 2)
+            landmarks, both in the coordinates of ``image``
+        """
+        small, scale = downscale(image, self.max_input_size)
+
+        all_bboxes, all_kpss = [], []
+        for det_size in det_sizes:
+            bboxes, kpss = self.det_model.detect(small, input_size=tuple(det_size))
+            if len(bboxes):
+                all_bboxes.append(bboxes)
+                all_kpss.append(kpss)
+
+        if not all_bboxes:
+            return np.zeros((0, 5), dtype=np.float32), np.zeros((0, 5, 2), dtype=np.float32)
+
+        bboxes = np.concatenate(all_bboxes)
+        kpss = np.concatenate(all_kpss)
+        if len(all_bboxes) > 1:
+            keep = nms(bboxes)
+            bboxes, kpss = bboxes[keep], kpss[keep]
+
+        if scale != 1.0:
+            bboxes = bboxes.copy()
+            bboxes[:, :4] /= scale
+            kpss = kpss / scale
+        return bboxes, kpss
+
+    def align(self, image, kpss):
+        """Aligned recognition crops (N x 112 x 112 x 3) for the given landmarks"""
+        crop_size = self.rec_model.input_size[0]
+        if len(kpss) == 0:
+            return np.zeros((0, crop_size, crop_size, 3), dtype=np.uint8)
+        return np.stack([face_align.norm_crop(image, landmark=kps, image_size=crop_size) for kps in kpss])
+
+    def embed_crops(self, crops):
+        """Embeddings (N x 512) for aligned crops, in one batched model call"""
+        if len(crops) == 0:
+            return np.zeros((0, 512), dtype=np.float32)
+        return self.rec_model.get_feat(list(crops))
+
+    def detect_faces(self, image):
+        """Detection only, at the attendance resolutions: (bboxes, kpss)"""
+        return self.detect(image, self.attendance_det_sizes)
+
+    def embed_faces(self, image, kpss):
+        """Embeddings for the faces at the given landmarks of ``image``"""
+        return self.embed_crops(self.align(image, kpss))
+
+    def get_faces(self, image, det_sizes):
+        """
+        Detect, align on the full-resolution frame and embed every face
+
+        All aligned crops of the frame go through the recognition model as
+        a single NCHW batch instead of one inference per face.
+        """
+        bboxes, kpss = self.detect(image, det_sizes)
+        embeddings = self.embed_crops(self.align(image, kpss))
+
+        faces = []
+        for bbox, kps, embedding in zip(bboxes, kpss, embeddings):
+            face = Face(bbox=bbox[:4], kps=kps, det_score=bbox[4], embedding=embedding)
+            for model in self.extra_models:
+                model.get(image, face)
+            faces.append(face)
+        return faces
+
+    def extract_embedding(self, image):
+        """Extract face embedding from image - returns single face"""
+        faces = self.get_faces(image, [self.registration_det_size])
+        if len(faces) == 1:
+            return faces[0].embedding, True
+        elif len(faces) == 0:
+            return None, False  # No face detected
+        else:
+            return None, False  # Multiple faces detected
+
+    def extract_multiple_embeddings(self, image):
+        """
+        Extract embeddings from all detected faces in the image
+
+        Returns:
+            list of dicts: [{'embedding', 'bbox', 'confidence', 'landmarks'}, ...]
+            success: boolean
+        """
+        faces = self.get_faces(image, self.attendance_det_sizes)
+
+        if len(faces) == 0:
+            return [], False
+
+        # Extract all face embeddings with their metadata
+        face_data = []
+        for face in faces:
+            face_info = {
+                'embedding': face.embedding,
+                'bbox': face.bbox,
+                'confidence': face.det_score,
+                'landmarks': face.kps if hasattr(face, 'kps') else None
+            }
+            face_data.append(face_info)
+
+        return face_data, True
+
+    def compare_embeddings(self, emb1, emb2, threshold=0.4):
+        """Compare two face embeddings"""
+        similarity = np.dot(emb1, emb2) / (np.linalg.norm(emb1) * np.linalg.norm(emb2))
+        return similarity > threshold, similarity
@@ -0,0 +1,187 @@
+"""
+Face tracking for continuous (video) attendance.
+
+In continuous mode the browser posts a frame every second or so. Every
+frame is run through the detector, but each detection is first matched
+to an existing track by bounding-box IoU. A face only gets an embedding
+when it starts a new track, while its identity is still unknown or
+uncertain, or after ``reembed_every`` frames as a guard against identity
+switches. Once a student is identified, their face costs only detection
+for as long as they stay in view.
+
+Trackers live in the web process's memory. With several gunicorn workers,
+the frames of a stream must reach the same worker (sticky sessions).
+"""
+
+import threading
+import time
+import uuid
+
+import numpy as np
+
+
+def iou(box, boxes):
+    """IoU of one (x1, y1, x2, y2) box against an (N x 4) array of boxes"""
+    if len(boxes) == 0:
+        return np.zeros(0, dtype=np.float32)
+    x1 = np.maximum(box[0], boxes[:, 0])
+    y1 = np.maximum(box[1], boxes[:, 1])
+    x2 = np.minimum(box[2], boxes[:, 2])
+    y2 = np.minimum(box[3], boxes[:, 3])
+    inter = np.maximum(0.0, x2 - x1) * np.maximum(0.0, y2 - y1)
+    area = (box[2] - box[0]) * (box[3] - box[1])
+    areas = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+    return inter / np.maximum(area + areas - inter, 1e-6)
+
+
+class Track:
+    def __init__(self, track_id, bbox, frame):
+        self.id = track_id
+        self.bbox = bbox
+        self.last_seen = frame
+        self.embedded_at = None
+        self.identity = None       # (student_id, roll_number, name)
+        self.similarity = 0.0
+
+
+class FaceTracker:
+    def __init__(self, iou_threshold=0.3, max_missed=10, confident_similarity=0.5,
+                 retry_every=2, reembed_every=30):
+        """
+        Args:
+            iou_threshold: least overlap for a detection to continue a track
+            max_missed: frames a track survives without a detection
+            confident_similarity: identities below this are re-checked
+            retry_every: frames between attempts for unknown/uncertain faces
+            reembed_every: frames between re-checks of confident identities
+        """
+        self.iou_threshold = iou_threshold
+        self.max_missed = max_missed
+        self.confident_similarity = confident_similarity
+        self.retry_every = retry_every
+        self.reembed_every = reembed_every
+        self.tracks = []
+        self.frame = 0
+        self._next_id = 1
+        self.detections = 0
+        self.embeddings = 0
+
+    def update(self, bboxes):
+        """
+        Assign this frame's detections to tracks
+
+        Returns:
+            (tracks, pending): the track of each detection, and the indices
+            of detections that need an embedding this frame
+        """
+        self.frame += 1
+        self.detections += len(bboxes)
+        boxes = np.asarray(bboxes, dtype=np.float32)[:, :4] if len(bboxes) else np.zeros((0, 4), np.float32)
+
+        # Greedy association, highest overlap first
+        pairs = []
+        for t, track in enumerate(self.tracks):
+            overlaps = iou(track.bbox, boxes)
+            pairs.extend((overlap, t, d) for d, overlap in enumerate(overlaps) if overlap >= self.iou_threshold)
+        pairs.sort(reverse=True)
+
+        assigned = [None] * len(boxes)
+        used = set()
+        for _, t, d in pairs:
+            if t in used or assigned[d] is not None:
+                continue
+            used.add(t)
+            assigned[d] = self.tracks[t]
+
+        for d, box in enumerate(boxes):
+            if assigned[d] is None:
+                assigned[d] = Track(self._next_id, box, self.frame)
+                self._next_id += 1
+                self.tracks.append(assigned[d])
+            else:
+                assigned[d].bbox = box
+                assigned[d].last_seen = self.frame
+
+        self.tracks = [t for t in self.tracks if self.frame - t.last_seen <= self.max_missed]
+
+        pending = [d for d, track in enumerate(assigned) if self._needs_embedding(track)]
+        self.embeddings += len(pending)
+        return assigned, pending
+
+    def _needs_embedding(self, track):
+        if track.embedded_at is None:
+            return True
+        age = self.frame - track.embedded_at
+        if track.identity is None or track.similarity < self.confident_similarity:
+            return age >= self.retry_every
+        return age >= self.reembed_every
+
+    def resolve(self, track, match):
+        """Record a gallery match (or None) for a freshly embedded track"""
+        track.embedded_at = self.frame
+        if match:
+            track.identity = tuple(match[:3])
+            track.similarity = float(match[3])
+        elif track.similarity < self.confident_similarity:
+            # An uncertain identity that no longer matches is dropped
+            track.identity = None
+            track.similarity = 0.0
+
+    def stats(self):
+        return {
+            'frames': self.frame,
+            'tracks': len(self.tracks),
+            'detections': self.detections,
+            'embeddings': self.embeddings,
+            'embedding_ratio': round(self.embeddings / self.detections, 3) if self.detections else 0
+        }
+
+
+class AttendanceStream:
+    """One continuous-mode capture: its class details, tracker and marked students"""
+
+    def __init__(self, owner, faculty_id, subject, period, session_id=None, **tracker_options):
+        self.id = uuid.uuid4().hex
+        self.owner = owner
+        self.faculty_id = faculty_id
+        self.subject = subject
+        self.period = period
+        self.session_id = session_id
+        self.tracker = FaceTracker(**tracker_options)
+        self.marked = set()
+        self.last_active = time.time()
+        # Frames of one stream are processed one at a time
+        self.lock = threading.Lock()
+
+
+class StreamRegistry:
+    def __init__(self, idle_timeout=300):
+        self.idle_timeout = idle_timeout
+        self._streams = {}
+        self._lock = threading.Lock()
+
+    def open(self, owner, faculty_id, subject, period, session_id=None, **tracker_options):
+        stream = AttendanceStream(owner, faculty_id, subject, period, session_id, **tracker_options)
+        with self._lock:
+            self._expire()
+            self._streams[stream.id] = stream
+        return stream
+
+    def get(self, stream_id, owner=None):
+        """The stream, or None if unknown, idle too long or owned by someone else"""
+        with self._lock:
+            self._expire()
+            stream = self._streams.get(stream_id)
+        if stream is None or (owner is not None and stream.owner != owner):
+            return None
+        stream.last_active = time.time()
+        return stream
+
+    def close(self, stream_id):
+        with self._lock:
+            return self._streams.pop(stream_id, None)
+
+    def _expire(self):
+        cutoff = time.time() - self.idle_timeout
+        for stream_id in [sid for sid, s in self._streams.items() if s.last_active < cutoff]:
+            del self._streams[stream_id]
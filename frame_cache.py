@@ -0,0 +1,142 @@
+"""
+Change detection for resubmitted attendance frames.
+
+Faculty often capture the same class several times in a row. Before any
+face model runs, each frame is reduced to a small blurred grayscale
+thumbnail and a 64-bit difference hash, and compared with the last frame
+processed for the same class (faculty, subject, period, session and day):
+
+- hit: nothing moved, so the previous result is returned as-is
+- region: only part of the frame changed, so detection runs on that
+  part alone (padded so faces on its edge are not cut)
+- miss: new scene, or too much changed, so the whole frame is processed
+
+Thumbnails cost a single cv2.resize of the frame, far below detection.
+"""
+
+import threading
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+THUMB_WIDTH = 160
+HASH_SIZE = 8
+
+
+def frame_signature(image):
+    """(blurred grayscale thumbnail, 64-bit dHash) of a BGR frame"""
+    height, width = image.shape[:2]
+    thumb_height = max(1, round(height * THUMB_WIDTH / width))
+    gray = cv2.cvtColor(cv2.resize(image, (THUMB_WIDTH, thumb_height), interpolation=cv2.INTER_AREA),
+                        cv2.COLOR_BGR2GRAY)
+    # Blur away JPEG and sensor noise so it doesn't read as motion
+    thumb = cv2.GaussianBlur(gray, (3, 3), 0).astype(np.int16)
+
+    small = cv2.resize(gray, (HASH_SIZE + 1, HASH_SIZE), interpolation=cv2.INTER_AREA)
+    bits = (small[:, 1:] > small[:, :-1]).flatten()
+    dhash = int(np.packbits(bits).view('>u8')[0])
+    return thumb, dhash
+
+
+class FrameCache:
+    def __init__(self, max_entries=256, hash_distance=10, pixel_threshold=12,
+                 min_changed_pixels=3, max_region_fraction=0.5, margin=0.1):
+        """
+        Args:
+            max_entries: classes remembered (least recently used dropped)
+            hash_distance: dHash bits that may differ before it's a new scene
+            pixel_threshold: thumbnail gray-level change counted as motion
+            min_changed_pixels: moving thumbnail pixels tolerated as a hit
+            max_region_fraction: larger changed regions process the whole frame
+            margin: padding around the changed region, as a fraction of the frame
+        """
+        self.max_entries = max_entries
+        self.hash_distance = hash_distance
+        self.pixel_threshold = pixel_threshold
+        self.min_changed_pixels = min_changed_pixels
+        self.max_region_fraction = max_region_fraction
+        self.margin = margin
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {'lookups': 0, 'hits': 0, 'regions': 0, 'misses': 0, 'pixels_skipped': 0.0}
+
+    def check(self, key, image):
+        """
+        Compare a frame with the last one stored under ``key``
+
+        Returns:
+            (decision, signature, result, region): decision is 'hit',
+            'region' or 'miss'; result is the stored result (hit/region);
+            region is (x1, y1, x2, y2) in frame pixels for 'region'
+        """
+        signature = frame_signature(image)
+        with self._lock:
+            self._stats['lookups'] += 1
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+
+        decision, region = 'miss', None
+        if entry is not None:
+            decision, region = self._compare(entry[0], signature, image.shape)
+
+        with self._lock:
+            if decision == 'hit':
+                self._stats['hits'] += 1
+                self._stats['pixels_skipped'] += 1.0
+            elif decision == 'region':
+                # Pixels skipped are counted by region_processed(), once the
+                # region has actually been recognised
+                self._stats['regions'] += 1
+            else:
+                self._stats['misses'] += 1
+        return decision, signature, entry[1] if entry is not None else None, region
+
+    def _compare(self, previous, signature, shape):
+        (old_thumb, old_hash), (thumb, dhash) = previous, signature
+        if old_thumb.shape != thumb.shape or bin(old_hash ^ dhash).count('1') > self.hash_distance:
+            return 'miss', None
+
+        changed = np.abs(thumb - old_thumb) > self.pixel_threshold
+        if changed.sum() <= self.min_changed_pixels:
+            return 'hit', None
+
+        # Bounding box of the motion, padded and scaled back to the frame
+        rows = np.flatnonzero(changed.any(axis=1))
+        cols = np.flatnonzero(changed.any(axis=0))
+        height, width = shape[:2]
+        scale_y, scale_x = height / thumb.shape[0], width / thumb.shape[1]
+        pad_y, pad_x = self.margin * height, self.margin * width
+        x1 = max(0, int(cols[0] * scale_x - pad_x))
+        y1 = max(0, int(rows[0] * scale_y - pad_y))
+        x2 = min(width, int((cols[-1] + 1) * scale_x + pad_x))
+        y2 = min(height, int((rows[-1] + 1) * scale_y + pad_y))
+
+        if (x2 - x1) * (y2 - y1) > self.max_region_fraction * width * height:
+            return 'miss', None
+        return 'region', (x1, y1, x2, y2)
+
+    def region_processed(self, region, shape):
+        """Credit the pixels outside a 'region' that was recognised successfully"""
+        x1, y1, x2, y2 = region
+        with self._lock:
+            self._stats['pixels_skipped'] += 1.0 - (x2 - x1) * (y2 - y1) / (shape[0] * shape[1])
+
+    def store(self, key, signature, result):
+        """Remember a processed frame's signature and result"""
+        with self._lock:
+            self._entries[key] = (signature, result)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        lookups = stats['lookups']
+        stats['hit_rate'] = round(stats['hits'] / lookups, 3) if lookups else 0
+        # Share of frame pixels that never reached the detector
+        stats['compute_saved'] = round(stats.pop('pixels_skipped') / lookups, 3) if lookups else 0
+        stats['classes'] = len(self._entries)
+        return stats
@@ -0,0 +1,172 @@
+"""
+On-disk snapshot of the face gallery shared by all worker processes.
+
+Layout of a snapshot directory:
+
+    index.json               version, row count, dim and the matrix file name,
+                             plus parallel student_ids / roll_numbers / names
+    embeddings-<v>.npy       float32 (rows x dim) matrix of L2-normalised
+                             embeddings, row i belongs to student_ids[i]
+
+Workers open the matrix with ``np.load(mmap_mode='r')`` so the OS page cache
+holds a single copy no matter how many workers are running. Both files are
+written to a temporary name and renamed into place, so readers only ever
+see complete snapshots; the matrix is renamed before the index that points
+to it.
+
+Run this module directly to (re)build the snapshot from the database:
+
+    python gallery_snapshot.py
+"""
+
+import glob
+import json
+import os
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: no advisory locks, atomic rename still applies
+    fcntl = None
+
+INDEX_FILE = 'index.json'
+LOCK_FILE = '.lock'
+
+# Matrices kept around after a new snapshot so readers mid-open don't race
+KEEP_MATRICES = 2
+
+
+def index_stamp(directory):
+    """Cheap change marker for the snapshot (None if there is none yet)"""
+    try:
+        st = os.stat(os.path.join(directory, INDEX_FILE))
+    except FileNotFoundError:
+        return None
+    return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+
+def read_snapshot(directory):
+    """
+    Map the current snapshot read-only
+
+    Returns:
+        dict with version, embeddings (memmap), student_ids, roll_numbers,
+        names and stamp, or None if no snapshot exists
+    """
+    for _ in range(3):
+        stamp = index_stamp(directory)
+        if stamp is None:
+            return None
+        try:
+            with open(os.path.join(directory, INDEX_FILE)) as f:
+                index = json.load(f)
+            embeddings = np.load(os.path.join(directory, index['matrix']), mmap_mode='r')
+        except FileNotFoundError:
+            # A writer replaced the snapshot between the two opens; retry
+            continue
+
+        if embeddings.shape[0] != len(index['student_ids']):
+            raise ValueError(f"Corrupt gallery snapshot in {directory}: row count mismatch")
+
+        return {
+            'version': index['version'],
+            'embeddings': embeddings,
+            'student_ids': np.asarray(index['student_ids'], dtype=np.int64),
+            'roll_numbers': np.asarray(index['roll_numbers'], dtype=object),
+            'names': np.asarray(index['names'], dtype=object),
+            'stamp': stamp,
+        }
+    return None
+
+
+def _replace_atomically(path, write):
+    """Write via a process-unique temp file and rename it over ``path``"""
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, 'wb') as f:
+            write(f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def write_snapshot(directory, version, embeddings, student_ids, roll_numbers, names):
+    """
+    Atomically publish a new snapshot
+
+    Returns False without writing if another process is already writing one.
+    """
+    os.makedirs(directory, exist_ok=True)
+
+    lock = open(os.path.join(directory, LOCK_FILE), 'w')
+    try:
+        if fcntl is not None:
+            try:
+                fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return False
+
+        embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
+        matrix_name = f"embeddings-{version}.npy"
+        _replace_atomically(os.path.join(directory, matrix_name),
+                            lambda f: np.save(f, embeddings, allow_pickle=False))
+
+        index = {
+            'version': int(version),
+            'rows': int(embeddings.shape[0]),
+            'dim': int(embeddings.shape[1]) if embeddings.ndim == 2 else 0,
+            'matrix': matrix_name,
+            'student_ids': [int(i) for i in student_ids],
+            'roll_numbers': [str(r) for r in roll_numbers],
+            'names': [str(n) for n in names],
+        }
+        _replace_atomically(os.path.join(directory, INDEX_FILE),
+                            lambda f: f.write(json.dumps(index).encode('utf-8')))
+
+        # Drop old matrices; workers that still map them keep their pages
+        old = sorted(glob.glob(os.path.join(directory, 'embeddings-*.npy')),
+                     key=os.path.getmtime, reverse=True)
+        for path in old[KEEP_MATRICES:]:
+            if os.path.basename(path) != matrix_name:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+        return True
+    finally:
+        lock.close()
+
+
+def build_from_database():
+    """Build a fresh snapshot straight from the students table"""
+    import MySQLdb
+    from config import Config
+    from face_gallery import FaceGallery
+
+    conn = MySQLdb.connect(
+        host=Config.MYSQL_HOST,
+        user=Config.MYSQL_USER,
+        passwd=Config.MYSQL_PASSWORD,
+        db=Config.MYSQL_DB
+    )
+    try:
+        cursor = conn.cursor()
+        gallery = FaceGallery()
+        gallery.load(cursor)
+        cursor.close()
+    finally:
+        conn.close()
+
+    gallery.snapshot_dir = Config.GALLERY_SNAPSHOT_DIR
+    if gallery.write_snapshot():
+        print(f"✓ Snapshot v{gallery.version} with {len(gallery)} student(s) written to {Config.GALLERY_SNAPSHOT_DIR}")
+    else:
+        print("⚠️  Another process is writing a snapshot, try again shortly")
+
+
+if __name__ == '__main__':
+    build_from_database()
@@ -0,0 +1,339 @@
+"""
+Out-of-process face inference with cross-request micro-batching.
+
+A pool of worker processes each holds its own FaceRecognitionSystem, so
+concurrent requests stop contending for one ONNX session. Each frame is
+detected and aligned in a worker; the aligned crops then go to a batcher
+thread that coalesces crops from all in-flight requests into recognition
+calls of up to ``max_batch`` crops, waiting at most ``max_wait_ms`` for a
+batch to fill. Request handlers block on a future for their own slice,
+for at most ``result_timeout`` seconds.
+
+If a worker dies the pool is broken for good, so it is replaced and the
+requests caught in it fail with InferenceBusy (a 503) instead of hanging.
+
+Workers only run detection and recognition; extra InsightFace tasks
+(genderage, landmark_3d_68, ...) need the in-process FaceRecognitionSystem.
+
+InferenceService exposes the same extract_* methods as
+FaceRecognitionSystem, so app.py uses whichever one config selects.
+"""
+
+import atexit
+import multiprocessing
+import queue
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
+
+import numpy as np
+
+
+class InferenceBusy(RuntimeError):
+    """Raised when the inference queue is full or the workers fail"""
+
+
+# ---------------------------------------------------------------------------
+# Worker process side
+# ---------------------------------------------------------------------------
+
+_system = None
+_warm_up_barrier = None
+
+
+def _init_worker(options, warm_up_barrier):
+    global _system, _warm_up_barrier
+    from face_recognition_system import FaceRecognitionSystem
+    _system = FaceRecognitionSystem(**options)
+    _warm_up_barrier = warm_up_barrier
+
+
+def _warm_up(timeout):
+    _system.warm_up()
+    # Hold this worker until every worker has taken a warm-up task, so no
+    # worker runs two of them while another stays cold
+    _warm_up_barrier.wait(timeout)
+
+
+def _detect(image, det_sizes):
+    return _system.detect(image, det_sizes)
+
+
+def _align(image, kpss):
+    return _system.align(image, kpss)
+
+
+def _detect_and_align(image, det_sizes):
+    bboxes, kpss = _system.detect(image, det_sizes)
+    return bboxes, kpss, _system.align(image, kpss)
+
+
+def _embed(crops):
+    return _system.embed_crops(crops)
+
+
+# ---------------------------------------------------------------------------
+# Request side
+# ---------------------------------------------------------------------------
+
+class _CropJob:
+    __slots__ = ('crops', 'future')
+
+    def __init__(self, crops):
+        self.crops = crops
+        self.future = Future()
+
+
+class InferenceService:
+    def __init__(self, options, workers=2, max_batch=64, max_wait_ms=10,
+                 queue_size=32, queue_timeout=10, result_timeout=30):
+        """
+        Args:
+            options: keyword arguments for FaceRecognitionSystem in each worker
+            workers: number of worker processes (one model copy each)
+            max_batch: most crops per recognition call
+            max_wait_ms: longest a crop waits for its batch to fill
+            queue_size: most frames in flight before new ones are refused
+            queue_timeout: seconds a request waits for a queue slot
+            result_timeout: seconds a request waits for the workers
+        """
+        modules = options.get('modules')
+        if modules is None or set(modules) - {'detection', 'recognition'}:
+            raise ValueError("Inference workers only run the 'detection' and 'recognition' "
+                             "models; set FACE_MODEL_MODULES to those or INFERENCE_WORKERS = 0")
+        self.options = options
+        self.registration_det_size = tuple(options.get('registration_det_size', (320, 320)))
+        self.attendance_det_sizes = [tuple(s) for s in options.get('attendance_det_sizes', [(640, 640)])]
+        self.workers = workers
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000.0
+        self.queue_timeout = queue_timeout
+        self.result_timeout = result_timeout
+        self._slots = threading.BoundedSemaphore(queue_size)
+
+        self._pool_lock = threading.Lock()
+        self._closed = False
+        self._pool = self._start_pool()
+        atexit.register(self.shutdown)
+
+        self._pending = queue.Queue()
+        self._stats_lock = threading.Lock()
+        self._batches = 0
+        self._crops = 0
+        self._batcher = threading.Thread(target=self._run_batcher, name='face-batcher', daemon=True)
+        self._batcher.start()
+
+    def _start_pool(self):
+        # spawn: CUDA/ONNX Runtime state must not be forked
+        context = multiprocessing.get_context('spawn')
+        self._warm_up_barrier = context.Barrier(self.workers)
+        return ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=context,
+            initializer=_init_worker,
+            initargs=(self.options, self._warm_up_barrier)
+        )
+
+    def _replace_pool(self, broken):
+        """Swap in a fresh pool for one that lost a worker (once per breakage)"""
+        with self._pool_lock:
+            if self._pool is not broken or self._closed:
+                return
+            self._pool = self._start_pool()
+        broken.shutdown(wait=False, cancel_futures=True)
+
+    def _submit(self, fn, *args):
+        pool = self._pool
+        try:
+            return pool.submit(fn, *args)
+        except BrokenProcessPool:
+            self._replace_pool(pool)
+            return self._pool.submit(fn, *args)
+
+    def _wait(self, future, pool=None):
+        """A worker result, or InferenceBusy if the workers fail or take too long"""
+        try:
+            return future.result(timeout=self.result_timeout)
+        except FutureTimeout:
+            future.cancel()
+            raise InferenceBusy("Face recognition timed out, please retry shortly")
+        except BrokenProcessPool:
+            if pool is not None:
+                self._replace_pool(pool)
+            raise InferenceBusy("Face recognition restarted after a worker failure, please retry")
+
+    def _call(self, fn, *args):
+        """Run fn in a worker and wait for it"""
+        pool = self._pool
+        return self._wait(self._submit(fn, *args), pool)
+
+    def shutdown(self):
+        self._closed = True
+        self._pending.put(None)
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+    def warm_up(self, timeout=300):
+        """Start every worker (loading its models) and warm each one up"""
+        futures = [self._submit(_warm_up, timeout) for _ in range(self.workers)]
+        for future in futures:
+            future.result()
+
+    def stats(self):
+        with self._stats_lock:
+            return {
+                'workers': self.workers,
+                'batches': self._batches,
+                'crops': self._crops,
+                'mean_batch': round(self._crops / self._batches, 2) if self._batches else 0
+            }
+
+    # -- micro-batching ---------------------------------------------------
+
+    def _run_batcher(self):
+        try:
+            while self._collect_and_dispatch():
+                pass
+        finally:
+            # Never leave a request waiting on a batcher that is gone
+            while True:
+                try:
+                    job = self._pending.get_nowait()
+                except queue.Empty:
+                    break
+                if job is not None and not job.future.done():
+                    job.future.set_exception(InferenceBusy("Face recognition is shutting down"))
+
+    def _collect_and_dispatch(self):
+        """Gather one batch and send it to the workers; False once shut down"""
+        job = self._pending.get()
+        if job is None:
+            return False
+        batch, size = [job], len(job.crops)
+        deadline = time.monotonic() + self.max_wait
+
+        # Keep collecting until the batch is full or the first crop has waited long enough
+        while size < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                job = self._pending.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if job is None:
+                self._pending.put(None)
+                break
+            batch.append(job)
+            size += len(job.crops)
+
+        try:
+            self._dispatch(batch)
+        except Exception as e:
+            for job in batch:
+                if not job.future.done():
+                    job.future.set_exception(e)
+        return True
+
+    def _dispatch(self, batch):
+        crops = np.concatenate([job.crops for job in batch])
+        pool = self._pool
+        chunks = [self._submit(_embed, crops[i:i + self.max_batch])
+                  for i in range(0, len(crops), self.max_batch)]
+        with self._stats_lock:
+            self._batches += len(chunks)
+            self._crops += len(crops)
+
+        results = [None] * len(chunks)
+        remaining = [len(chunks)]
+        lock = threading.Lock()
+
+        def chunk_done(index, future):
+            try:
+                results[index] = future.result()
+            except Exception as e:
+                if isinstance(e, BrokenProcessPool):
+                    self._replace_pool(pool)
+                for job in batch:
+                    if not job.future.done():
+                        job.future.set_exception(e)
+                return
+            with lock:
+                remaining[0] -= 1
+                if remaining[0]:
+                    return
+
+            # Hand every request back its own rows
+            embeddings = np.concatenate(results)
+            offset = 0
+            for job in batch:
+                if not job.future.done():
+                    job.future.set_result(embeddings[offset:offset + len(job.crops)])
+                offset += len(job.crops)
+
+        for index, future in enumerate(chunks):
+            future.add_done_callback(lambda f, i=index: chunk_done(i, f))
+
+    # -- FaceRecognitionSystem interface ----------------------------------
+
+    def _acquire_slot(self):
+        if not self._slots.acquire(timeout=self.queue_timeout):
+            raise InferenceBusy("Face recognition is busy, please retry shortly")
+
+    def _embed_batched(self, crops):
+        """Embed crops through the cross-request batcher"""
+        if not self._batcher.is_alive():
+            raise InferenceBusy("Face recognition is shutting down")
+        job = _CropJob(crops)
+        self._pending.put(job)
+        return self._wait(job.future)
+
+    def _faces(self, image, det_sizes):
+        """Detect/align in a worker, then embed through the batcher"""
+        self._acquire_slot()
+        try:
+            bboxes, kpss, crops = self._call(_detect_and_align, image, det_sizes)
+            if len(crops) == 0:
+                return []
+            embeddings = self._embed_batched(crops)
+        finally:
+            self._slots.release()
+
+        return [{
+            'embedding': embedding,
+            'bbox': bbox[:4],
+            'confidence': bbox[4],
+            'landmarks': kps
+        } for embedding, bbox, kps in zip(embeddings, bboxes, kpss)]
+
+    def extract_embedding(self, image):
+        """Extract face embedding from image - returns single face"""
+        faces = self._faces(image, [self.registration_det_size])
+        if len(faces) == 1:
+            return faces[0]['embedding'], True
+        return None, False  # No face, or multiple faces detected
+
+    def extract_multiple_embeddings(self, image):
+        """Same contract as FaceRecognitionSystem.extract_multiple_embeddings"""
+        faces = self._faces(image, self.attendance_det_sizes)
+        return faces, len(faces) > 0
+
+    def detect_faces(self, image):
+        """Same contract as FaceRecognitionSystem.detect_faces"""
+        self._acquire_slot()
+        try:
+            return self._call(_detect, image, self.attendance_det_sizes)
+        finally:
+            self._slots.release()
+
+    def embed_faces(self, image, kpss):
+        """Same contract as FaceRecognitionSystem.embed_faces"""
+        if len(kpss) == 0:
+            return np.zeros((0, 512), dtype=np.float32)
+        self._acquire_slot()
+        try:
+            crops = self._call(_align, image, kpss)
+            return self._embed_batched(crops)
+        finally:
+            self._slots.release()
@@ -0,0 +1,157 @@
+"""
+Keyset-paginated listings.
+
+The student, faculty and attendance listings fetch one page at a time,
+ordered by an indexed key, and continue from the last key of the previous
+page (WHERE key > last) instead of using OFFSET. A page costs the same
+whether it is the first or the thousandth, and only ``limit`` rows are
+ever held in memory.
+
+    students     roll_number                      (unique index)
+    faculty      emp_id                           (unique index)
+    attendance   (period_number, student_id)      idx_date_period_student
+
+Search is by prefix of roll number / employee id or name, so it can use
+the idx_*_name indexes. The cursor handed to clients is opaque: the
+URL-safe base64 of the last row's key.
+"""
+
+import base64
+import json
+
+STUDENT_COLUMNS = ('id', 'roll_number', 'name', 'branch', 'mobile_number', 'mail_id')
+FACULTY_COLUMNS = ('id', 'emp_id', 'name', 'department', 'mobile_number')
+ATTENDANCE_COLUMNS = ('roll_number', 'name', 'subject', 'period_number',
+                      'status', 'marked_at', 'confidence_score', 'student_id')
+
+
+def encode_cursor(values):
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode().rstrip('=')
+
+
+def decode_cursor(token, size):
+    """Key values from a cursor token; raises ValueError if it is malformed"""
+    try:
+        values = json.loads(base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)))
+    except (ValueError, TypeError):
+        raise ValueError("Invalid cursor")
+    if not isinstance(values, list) or len(values) != size:
+        raise ValueError("Invalid cursor")
+    return values
+
+
+def _prefix(text):
+    """LIKE pattern matching values that start with ``text``"""
+    return text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+
+
+def _page(cursor, sql, params, limit, key):
+    """Run a page query that selects limit + 1 rows; returns (rows, next_cursor)"""
+    cursor.execute(sql + " LIMIT %s", params + [limit + 1])
+    rows = cursor.fetchall()
+    if len(rows) <= limit:
+        return list(rows), None
+    rows = list(rows[:limit])
+    return rows, encode_cursor(key(rows[-1]))
+
+
+def page_students(cursor, after=None, limit=50, search=None, branch=None, section=None):
+    """
+    One page of students ordered by roll number
+
+    Returns:
+        (rows, next_cursor): rows as STUDENT_COLUMNS tuples; next_cursor is
+        None on the last page
+    """
+    where, params = [], []
+    if search:
+        where.append("(roll_number LIKE %s OR name LIKE %s)")
+        params.extend([_prefix(search), _prefix(search)])
+    if branch:
+        where.append("branch = %s")
+        params.append(branch)
+    if section:
+        where.append("section = %s")
+        params.append(section)
+    if after:
+        where.append("roll_number > %s")
+        params.extend(decode_cursor(after, 1))
+
+    sql = f"SELECT {', '.join(STUDENT_COLUMNS)} FROM students"
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    sql += " ORDER BY roll_number"
+    return _page(cursor, sql, params, limit, lambda row: [row[1]])
+
+
+def page_faculty(cursor, after=None, limit=50, search=None, department=None):
+    """
+    One page of faculty ordered by employee id
+
+    Returns:
+        (rows, next_cursor): rows as FACULTY_COLUMNS tuples
+    """
+    where, params = [], []
+    if search:
+        where.append("(emp_id LIKE %s OR name LIKE %s)")
+        params.extend([_prefix(search), _prefix(search)])
+    if department:
+        where.append("department = %s")
+        params.append(department)
+    if after:
+        where.append("emp_id > %s")
+        params.extend(decode_cursor(after, 1))
+
+    sql = f"SELECT {', '.join(FACULTY_COLUMNS)} FROM faculty"
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    sql += " ORDER BY emp_id"
+    return _page(cursor, sql, params, limit, lambda row: [row[1]])
+
+
+def page_attendance(cursor, session_date, after=None, limit=50, search=None,
+                    period=None, status=None, subject=None):
+    """
+    One page of a day's attendance ordered by period, then student
+
+    Returns:
+        (rows, next_cursor): rows as ATTENDANCE_COLUMNS tuples
+    """
+    where, params = ["a.session_date = %s"], [session_date]
+    if period:
+        where.append("a.period_number = %s")
+        params.append(period)
+    if status:
+        where.append("a.status = %s")
+        params.append(status)
+    if subject:
+        where.append("a.subject = %s")
+        params.append(subject)
+    if search:
+        where.append("(s.roll_number LIKE %s OR s.name LIKE %s)")
+        params.extend([_prefix(search), _prefix(search)])
+    if after:
+        last_period, last_student = decode_cursor(after, 2)
+        where.append("(a.period_number > %s OR (a.period_number = %s AND a.student_id > %s))")
+        params.extend([last_period, last_period, last_student])
+
+    sql = f"""
+        SELECT s.roll_number, s.name, a.subject, a.period_number,
+               a.status, a.marked_at, a.confidence_score, a.student_id
+        FROM attendance a
+        JOIN students s ON a.student_id = s.id
+        WHERE {' AND '.join(where)}
+        ORDER BY a.period_number, a.student_id
+    """
+    return _page(cursor, sql, params, limit, lambda row: [row[3], row[7]])
+
+
+def to_dicts(columns, rows):
+    """Rows as JSON-ready dicts (dates and times as ISO strings)"""
+    items = []
+    for row in rows:
+        item = {}
+        for column, value in zip(columns, row):
+            item[column] = value.isoformat() if hasattr(value, 'isoformat') else value
+        items.append(item)
+    return items
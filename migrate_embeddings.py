@@ -0,0 +1,94 @@
+"""
+Embedding Migration Script
+Converts pickled face embeddings in students.face_embedding to the binary
+format described in embedding_format.py, in place and in batches.
+
+    python migrate_embeddings.py            # convert every legacy row
+    python migrate_embeddings.py --dry-run  # only count them
+
+Safe to re-run: rows already in the binary format are skipped. The stored
+values don't change, so the face gallery needs no reload.
+"""
+
+import argparse
+import sys
+
+import MySQLdb
+
+from config import Config
+from embedding_format import decode_embedding, encode_embedding, is_binary
+
+
+def migrate(batch_size=500, dry_run=False):
+    """Convert legacy rows; returns (converted, already_binary, failed)"""
+    conn = MySQLdb.connect(
+        host=Config.MYSQL_HOST,
+        user=Config.MYSQL_USER,
+        passwd=Config.MYSQL_PASSWORD,
+        db=Config.MYSQL_DB
+    )
+    cursor = conn.cursor()
+
+    converted = already_binary = failed = 0
+    last_id = 0
+    try:
+        while True:
+            # Keyset pagination keeps each batch an index range scan
+            cursor.execute("""
+                SELECT id, roll_number, face_embedding FROM students
+                WHERE id > %s AND face_embedding IS NOT NULL
+                ORDER BY id LIMIT %s
+            """, (last_id, batch_size))
+            rows = cursor.fetchall()
+            if not rows:
+                break
+            last_id = rows[-1][0]
+
+            updates = []
+            for student_id, roll_number, blob in rows:
+                if is_binary(blob):
+                    already_binary += 1
+                    continue
+                try:
+                    updates.append((encode_embedding(decode_embedding(blob)), student_id))
+                except Exception as e:
+                    failed += 1
+                    print(f"   ❌ {roll_number}: {e}")
+
+            if updates and not dry_run:
+                cursor.executemany("UPDATE students SET face_embedding = %s WHERE id = %s", updates)
+                conn.commit()
+            converted += len(updates)
+            print(f"   ✓ Up to student id {last_id}: {converted} converted so far")
+    finally:
+        cursor.close()
+        conn.close()
+
+    return converted, already_binary, failed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert pickled face embeddings to the binary format")
+    parser.add_argument('--batch-size', type=int, default=500)
+    parser.add_argument('--dry-run', action='store_true', help="count legacy rows without writing")
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("  Face Embedding Migration")
+    print("=" * 60)
+
+    try:
+        converted, already_binary, failed = migrate(args.batch_size, args.dry_run)
+    except MySQLdb.Error as e:
+        print(f"\n❌ Database Error: {e}")
+        return False
+
+    action = "Would convert" if args.dry_run else "Converted"
+    print(f"\n{action}: {converted}")
+    print(f"Already binary: {already_binary}")
+    print(f"Failed: {failed}")
+    return failed == 0
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
@@ -0,0 +1,360 @@
+"""
+Schema Migration Script
+Upgrades an existing attendance_system database to database_schema.sql in
+place, keeping its data. database_schema.sql itself drops and recreates the
+database, so it is only for new installs.
+
+    python migrate_schema.py            # apply every pending step
+    python migrate_schema.py --dry-run  # only list them
+
+Each step checks information_schema before running, so the script is safe
+to re-run. Some steps need a follow-up command once the schema is in place
+(filling a new table from existing rows); those are printed at the end.
+"""
+
+import argparse
+import sys
+
+import MySQLdb
+
+from config import Config
+
+
+def table_exists(cursor, table):
+    cursor.execute("""
+        SELECT 1 FROM information_schema.TABLES
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s
+    """, [table])
+    return cursor.fetchone() is not None
+
+
+def column_exists(cursor, table, column):
+    cursor.execute("""
+        SELECT 1 FROM information_schema.COLUMNS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND COLUMN_NAME = %s
+    """, [table, column])
+    return cursor.fetchone() is not None
+
+
+def index_exists(cursor, table, index):
+    cursor.execute("""
+        SELECT 1 FROM information_schema.STATISTICS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND INDEX_NAME = %s
+    """, [table, index])
+    return cursor.fetchone() is not None
+
+
+def view_mentions(cursor, view, text):
+    cursor.execute("""
+        SELECT 1 FROM information_schema.VIEWS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND VIEW_DEFINITION LIKE %s
+    """, [view, f"%{text}%"])
+    return cursor.fetchone() is not None
+
+
+def routine_mentions(cursor, routine, text):
+    cursor.execute("""
+        SELECT 1 FROM information_schema.ROUTINES
+        WHERE ROUTINE_SCHEMA = DATABASE() AND ROUTINE_NAME = %s AND ROUTINE_DEFINITION LIKE %s
+    """, [routine, f"%{text}%"])
+    return cursor.fetchone() is not None
+
+
+class Step:
+    """One idempotent schema change"""
+
+    def __init__(self, description, pending, statements, follow_up=None):
+        self.description = description
+        self.pending = pending          # cursor -> True if the change is missing
+        self.statements = statements
+        self.follow_up = follow_up      # command to run after the change, if any
+
+
+def create_table(table, sql, follow_up=None):
+    return Step(f"create table {table}", lambda cursor: not table_exists(cursor, table),
+                [sql], follow_up)
+
+
+def add_column(table, column, definition):
+    return Step(f"add column {table}.{column}", lambda cursor: not column_exists(cursor, table, column),
+                [f"ALTER TABLE {table} ADD COLUMN {column} {definition}"])
+
+
+def add_index(table, index, columns):
+    return Step(f"add index {table}.{index}", lambda cursor: not index_exists(cursor, table, index),
+                [f"ALTER TABLE {table} ADD INDEX {index} ({columns})"])
+
+
+def drop_index(table, index):
+    return Step(f"drop index {table}.{index}", lambda cursor: index_exists(cursor, table, index),
+                [f"ALTER TABLE {table} DROP INDEX {index}"])
+
+
+def replace_view(view, marker, sql):
+    """Recreate a view whose definition doesn't mention ``marker`` yet"""
+    return Step(f"replace view {view}", lambda cursor: not view_mentions(cursor, view, marker),
+                [sql])
+
+
+def replace_procedure(procedure, marker, sql):
+    """Recreate a procedure whose body doesn't mention ``marker`` yet"""
+    return Step(f"replace procedure {procedure}",
+                lambda cursor: not routine_mentions(cursor, procedure, marker),
+                [f"DROP PROCEDURE IF EXISTS {procedure}", sql])
+
+
+STATS_FOLLOW_UP = "python attendance_stats.py      # fill the attendance aggregates from existing attendance"
+
+# In the order the schema gained them
+MIGRATIONS = [
+    # Face gallery versioning
+    create_table('gallery_changes', """
+        CREATE TABLE IF NOT EXISTS gallery_changes (
+            id BIGINT PRIMARY KEY AUTO_INCREMENT,
+            student_id INT NOT NULL,
+            operation ENUM('upsert', 'delete') NOT NULL DEFAULT 'upsert',
+            changed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            INDEX idx_gallery_student (student_id)
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+    """, follow_up="python gallery_snapshot.py      # publish a gallery snapshot at the new version"),
+
+    # Session rosters
+    add_column('students', 'section', "VARCHAR(10) AFTER address"),
+    add_index('students', 'idx_branch_section', "branch, section"),
+    add_column('sessions', 'branch', "VARCHAR(50) AFTER period_number"),
+    add_column('sessions', 'section', "VARCHAR(10) AFTER branch"),
+    add_column('sessions', 'explicit_roster', "BOOLEAN NOT NULL DEFAULT FALSE AFTER section"),
+    create_table('session_roster', """
+        CREATE TABLE IF NOT EXISTS session_roster (
+            session_id INT NOT NULL,
+            student_id INT NOT NULL,
+            PRIMARY KEY (session_id, student_id),
+            FOREIGN KEY (session_id) REFERENCES sessions(id) ON DELETE CASCADE,
+            FOREIGN KEY (student_id) REFERENCES students(id) ON DELETE CASCADE
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+    """),
+
+    # Asynchronous attendance job state, shared by the web workers
+    create_table('attendance_jobs', """
+        CREATE TABLE IF NOT EXISTS attendance_jobs (
+            id CHAR(32) PRIMARY KEY,
+            owner INT,
+            stage VARCHAR(20) NOT NULL DEFAULT 'queued',
+            progress FLOAT NOT NULL DEFAULT 0,
+            status_code INT,
+            result LONGTEXT,
+            error TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            finished_at TIMESTAMP NULL,
+            INDEX idx_job_created (created_at)
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+    """),
+
+    # Extra face templates (students.face_embedding stays the primary one)
+    create_table('student_templates', """
+        CREATE TABLE IF NOT EXISTS student_templates (
+            id INT PRIMARY KEY AUTO_INCREMENT,
+            student_id INT NOT NULL,
+            embedding LONGBLOB NOT NULL,
+            source ENUM('enrolment', 'attendance') NOT NULL DEFAULT 'enrolment',
+            quality FLOAT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (student_id) REFERENCES students(id) ON DELETE CASCADE,
+            INDEX idx_template_student (student_id, source, created_at)
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+    """),
+
+    # Dashboard counters (missing ones are computed on read until seeded)
+    create_table('dashboard_counters', """
+        CREATE TABLE IF NOT EXISTS dashboard_counters (
+            name VARCHAR(50) PRIMARY KEY,
+            value BIGINT NOT NULL DEFAULT 0,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+    """, follow_up="python dashboard_stats.py       # seed the dashboard counters"),
+
+    # Materialized attendance aggregates, and the report views and
+    # procedures that read or maintain them
+    create_table('student_attendance_stats', """
+        CREATE TABLE IF NOT EXISTS student_attendance_stats (
+            student_id INT PRIMARY KEY,
+            present INT NOT NULL DEFAULT 0,
+            total INT NOT NULL DEFAULT 0,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+            FOREIGN KEY (student_id) REFERENCES students(id) ON DELETE CASCADE
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+    """, follow_up=STATS_FOLLOW_UP),
+    create_table('student_subject_stats', """
+        CREATE TABLE IF NOT EXISTS student_subject_stats (
+            student_id INT NOT NULL,
+            subject VARCHAR(100) NOT NULL,
+            present INT NOT NULL DEFAULT 0,
+            total INT NOT NULL DEFAULT 0,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+            PRIMARY KEY (student_id, subject),
+            FOREIGN KEY (student_id) REFERENCES students(id) ON DELETE CASCADE
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+    """, follow_up=STATS_FOLLOW_UP),
+    replace_view('attendance_summary', 'periods_attended', """
+        CREATE OR REPLACE VIEW attendance_summary AS
+        SELECT
+            s.id as student_id,
+            s.roll_number,
+            s.name,
+            s.branch,
+            COUNT(DISTINCT CASE WHEN a.status = 'present' THEN a.session_date END) as classes_attended,
+            COUNT(DISTINCT a.session_date) as total_classes,
+            ROUND(
+                (COUNT(DISTINCT CASE WHEN a.status = 'present' THEN a.session_date END) * 100.0 /
+                NULLIF(COUNT(DISTINCT a.session_date), 0)),
+                2
+            ) as attendance_percentage,
+            COALESCE(MAX(st.present), 0) as periods_attended,
+            COALESCE(MAX(st.total), 0) as total_periods,
+            ROUND(MAX(st.present) * 100.0 / NULLIF(MAX(st.total), 0), 2) as period_percentage
+        FROM students s
+        LEFT JOIN attendance a ON s.id = a.student_id
+        LEFT JOIN student_attendance_stats st ON st.student_id = s.id
+        GROUP BY s.id, s.roll_number, s.name, s.branch
+    """),
+    replace_procedure('mark_absent_students', 'IF EXISTS absent_students', """
+        CREATE PROCEDURE mark_absent_students(
+            IN p_session_date DATE,
+            IN p_period_number INT,
+            IN p_faculty_id INT,
+            IN p_subject VARCHAR(100)
+        )
+        BEGIN
+            DECLARE EXIT HANDLER FOR SQLEXCEPTION
+            BEGIN
+                DROP TEMPORARY TABLE IF EXISTS absent_students;
+                RESIGNAL;
+            END;
+            DROP TEMPORARY TABLE IF EXISTS absent_students;
+
+            CREATE TEMPORARY TABLE absent_students AS
+            SELECT s.id
+            FROM students s
+            WHERE NOT EXISTS (
+                SELECT 1
+                FROM attendance a
+                WHERE a.student_id = s.id
+                AND a.session_date = p_session_date
+                AND a.period_number = p_period_number
+            );
+
+            INSERT INTO attendance (student_id, faculty_id, subject, session_date, period_number, status)
+            SELECT id, p_faculty_id, p_subject, p_session_date, p_period_number, 'absent'
+            FROM absent_students;
+
+            INSERT INTO student_attendance_stats (student_id, present, total)
+            SELECT id, 0, 1 FROM absent_students
+            ON DUPLICATE KEY UPDATE total = total + 1;
+
+            INSERT INTO student_subject_stats (student_id, subject, present, total)
+            SELECT id, p_subject, 0, 1 FROM absent_students
+            ON DUPLICATE KEY UPDATE total = total + 1;
+
+            DROP TEMPORARY TABLE absent_students;
+        END
+    """),
+    replace_procedure('get_student_attendance', 'student_attendance_stats', """
+        CREATE PROCEDURE get_student_attendance(
+            IN p_student_id INT
+        )
+        BEGIN
+            SELECT
+                s.roll_number,
+                s.name,
+                s.branch,
+                COALESCE(st.present, 0) as present,
+                COALESCE(st.total, 0) as total,
+                ROUND(st.present * 100.0 / NULLIF(st.total, 0), 2) as percentage
+            FROM students s
+            LEFT JOIN student_attendance_stats st ON st.student_id = s.id
+            WHERE s.id = p_student_id;
+        END
+    """),
+
+    # Keyset-paginated listings (idx_date_period_student covers idx_date)
+    add_index('students', 'idx_student_name', "name"),
+    add_index('faculty', 'idx_faculty_name', "name"),
+    add_index('attendance', 'idx_date_period_student', "session_date, period_number, student_id"),
+    drop_index('attendance', 'idx_date'),
+]
+
+
+def migrate(cursor, dry_run=False):
+    """
+    Apply pending steps
+
+    Returns:
+        (applied descriptions, follow-up commands)
+    """
+    applied, follow_ups = [], []
+    for step in MIGRATIONS:
+        if not step.pending(cursor):
+            continue
+        print(f"   {'•' if dry_run else '✓'} {step.description}")
+        if not dry_run:
+            for statement in step.statements:
+                cursor.execute(statement)
+        applied.append(step.description)
+        if step.follow_up and step.follow_up not in follow_ups:
+            follow_ups.append(step.follow_up)
+    return applied, follow_ups
+
+
+def print_follow_ups(follow_ups):
+    if follow_ups:
+        print("\nNext, run:")
+        for command in follow_ups:
+            print(f"   {command}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Upgrade the database schema in place")
+    parser.add_argument('--dry-run', action='store_true', help="list pending steps without applying them")
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("  Schema Migration")
+    print("=" * 60)
+
+    try:
+        conn = MySQLdb.connect(
+            host=Config.MYSQL_HOST,
+            user=Config.MYSQL_USER,
+            passwd=Config.MYSQL_PASSWORD,
+            db=Config.MYSQL_DB
+        )
+    except MySQLdb.Error as e:
+        print(f"\n❌ Database Error: {e}")
+        return False
+
+    cursor = conn.cursor()
+    print(f"\nDatabase: {Config.MYSQL_DB}")
+    try:
+        applied, follow_ups = migrate(cursor, args.dry_run)
+        conn.commit()
+    except MySQLdb.Error as e:
+        conn.rollback()
+        print(f"\n❌ Database Error: {e}")
+        print("   Steps before this one were applied; fix the error and re-run")
+        return False
+    finally:
+        cursor.close()
+        conn.close()
+
+    if not applied:
+        print("\n✓ Schema is up to date")
+    elif args.dry_run:
+        print(f"\n{len(applied)} step(s) pending")
+    else:
+        print(f"\n✓ Applied {len(applied)} step(s)")
+    print_follow_ups(follow_ups)
+    return True
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
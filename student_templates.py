@@ -0,0 +1,119 @@
+"""
+Additional face templates per student.
+
+students.face_embedding stays the primary template captured at
+registration. student_templates holds the rest: extra captures taken at
+registration ('enrolment') and templates learned from confident
+attendance matches ('attendance'), so a student whose lighting or
+appearance changes keeps being recognised without re-registering. The
+face gallery holds one row per template and scores each student by their
+best template.
+
+Learned templates are bounded. A student gains at most one per day, only
+from a match that is confident (it is them) yet not near-identical to an
+existing template (it adds something). Past ``max_templates`` the oldest
+learned ones are dropped; enrolment templates are never pruned.
+
+Callers record a gallery change for every student whose templates change,
+in the same transaction.
+"""
+
+from collections import defaultdict
+
+from embedding_format import encode_embedding
+
+# Per student, counting the primary template
+MAX_TEMPLATES = 5
+
+# Learn from matches in [LEARN_MIN_SIMILARITY, LEARN_MAX_SIMILARITY)
+LEARN_MIN_SIMILARITY = 0.6
+LEARN_MAX_SIMILARITY = 0.85
+
+
+def _insert(cursor, rows):
+    """Insert (student_id, embedding, source, quality) rows in one statement"""
+    values = ', '.join(['(%s, %s, %s, %s)'] * len(rows))
+    params = []
+    for student_id, embedding, source, quality in rows:
+        params.extend([student_id, encode_embedding(embedding), source, quality])
+    cursor.execute(f"""
+        INSERT INTO student_templates (student_id, embedding, source, quality)
+        VALUES {values}
+    """, params)
+
+
+def add_templates(cursor, student_id, embeddings, source='enrolment'):
+    """Store extra templates for one student; returns how many were added"""
+    if len(embeddings) == 0:
+        return 0
+    _insert(cursor, [(student_id, embedding, source, None) for embedding in embeddings])
+    return len(embeddings)
+
+
+def learn_templates(cursor, sightings, min_similarity=LEARN_MIN_SIMILARITY,
+                    max_similarity=LEARN_MAX_SIMILARITY, max_templates=MAX_TEMPLATES):
+    """
+    Add templates from attendance matches
+
+    Args:
+        sightings: iterable of (student_id, embedding, similarity)
+
+    Returns:
+        set of student ids that gained a template
+    """
+    # The most confident eligible sighting per student
+    best = {}
+    for student_id, embedding, similarity in sightings:
+        if min_similarity <= similarity < max_similarity:
+            if student_id not in best or similarity > best[student_id][1]:
+                best[student_id] = (embedding, similarity)
+    if not best:
+        return set()
+
+    student_ids = list(best)
+    placeholders = ', '.join(['%s'] * len(student_ids))
+    cursor.execute(f"""
+        SELECT DISTINCT student_id FROM student_templates
+        WHERE source = 'attendance' AND created_at >= CURDATE()
+        AND student_id IN ({placeholders})
+    """, student_ids)
+    learned_today = {row[0] for row in cursor.fetchall()}
+
+    new_ids = [sid for sid in student_ids if sid not in learned_today]
+    if not new_ids:
+        return set()
+
+    _insert(cursor, [(sid, best[sid][0], 'attendance', float(best[sid][1])) for sid in new_ids])
+    prune_templates(cursor, new_ids, max_templates)
+    return set(new_ids)
+
+
+def prune_templates(cursor, student_ids, max_templates=MAX_TEMPLATES):
+    """Drop the oldest learned templates of students over the cap"""
+    placeholders = ', '.join(['%s'] * len(student_ids))
+    cursor.execute(f"""
+        SELECT id, student_id, source FROM student_templates
+        WHERE student_id IN ({placeholders})
+        ORDER BY id DESC
+    """, list(student_ids))
+    rows = cursor.fetchall()
+
+    # The primary template and every enrolment template count first
+    used = defaultdict(lambda: 1)
+    for _, student_id, source in rows:
+        if source == 'enrolment':
+            used[student_id] += 1
+
+    drop = []
+    for template_id, student_id, source in rows:
+        if source != 'attendance':
+            continue
+        if used[student_id] < max_templates:
+            used[student_id] += 1
+        else:
+            drop.append(template_id)
+
+    if drop:
+        placeholders = ', '.join(['%s'] * len(drop))
+        cursor.execute(f"DELETE FROM student_templates WHERE id IN ({placeholders})", drop)
+    return len(drop)
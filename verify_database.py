@@ -6,6 +6,7 @@ This script checks if the database is properly set up and fixes common issues
 import sys
 import getpass
 import MySQLdb
+from migrate_schema import migrate, print_follow_ups
 from werkzeug.security import generate_password_hash
 
 def connect_to_mysql(host, user, password, database=None):
@@ -87,12 +88,22 @@ def verify_database():
     required_tables = {
         'admin': ['id', 'username', 'password', 'created_at'],
         'students': ['id', 'roll_number', 'name', 'branch', 'date_of_birth', 
-                    'mobile_number', 'mail_id', 'address', 'photo_path', 
+                    'mobile_number', 'mail_id', 'address', 'section', 'photo_path', 
                     'face_embedding', 'created_at'],
         'faculty': ['id', 'emp_id', 'name', 'department', 'mobile_number', 
                    'photo_path', 'created_at'],
         'attendance': ['id', 'student_id', 'faculty_id', 'subject', 'session_date', 
-                      'period_number', 'status', 'confidence_score', 'marked_at']
+                      'period_number', 'status', 'confidence_score', 'marked_at'],
+        'gallery_changes': ['id', 'student_id', 'operation', 'changed_at'],
+        'attendance_jobs': ['id', 'owner', 'stage', 'progress', 'status_code', 'result', 'error',
+                            'created_at', 'finished_at'],
+        'student_templates': ['id', 'student_id', 'embedding', 'source', 'quality', 'created_at'],
+        'dashboard_counters': ['name', 'value', 'updated_at'],
+        'student_attendance_stats': ['student_id', 'present', 'total', 'updated_at'],
+        'student_subject_stats': ['student_id', 'subject', 'present', 'total', 'updated_at'],
+        'sessions': ['id', 'faculty_id', 'subject', 'session_date', 'period_number',
+                    'branch', 'section', 'explicit_roster', 'start_time', 'end_time'],
+        'session_roster': ['session_id', 'student_id']
     }
     
     # Check each table
@@ -127,12 +138,29 @@ def verify_database():
         print("⚠️  Database has issues!")
         print("=" * 60)
         print("\nWould you like to:")
-        print("1. Drop and recreate database (WILL DELETE ALL DATA)")
-        print("2. Exit and fix manually")
+        print("1. Upgrade the schema in place (keeps all data)")
+        print("2. Drop and recreate database (WILL DELETE ALL DATA)")
+        print("3. Exit and fix manually")
         
-        choice = input("\nEnter choice (1/2): ").strip()
+        choice = input("\nEnter choice (1/2/3): ").strip()
         
         if choice == '1':
+            print("\nUpgrading schema...")
+            try:
+                _, follow_ups = migrate(cursor)
+                conn.commit()
+            except MySQLdb.Error as e:
+                print(f"❌ Error: {e}")
+                return False
+            print("✓ Schema upgraded")
+            print_follow_ups(follow_ups)
+            
+            # Verify again
+            print("\nVerifying...")
+            cursor.close()
+            conn.close()
+            return verify_database()
+        elif choice == '2':
             print("\n⚠️  WARNING: This will delete ALL existing data!")
             confirm = input("Type 'YES' to confirm: ").strip()
             
@@ -177,7 +205,9 @@ def verify_database():
                 return False
         else:
             print("\nPlease fix the database manually and try again")
-            print("\nRun this command:")
+            print("\nTo upgrade an existing database, keeping its data:")
+            print("python migrate_schema.py")
+            print("\nFor a new install (deletes all data):")
             print(f"mysql -u {user} -p < database_schema.sql")
             return False
     
@@ -229,12 +259,9 @@ def show_current_structure():
     password = getpass.getpass("Password: ")
     
     try:
-        conn = MySQLdb.connect(
-            host=host,
-            user=user,
-            passwd=password,
-            db='attendance_system'
-        )
+        conn = connect_to_mysql(host, user, password, 'attendance_system')
+        if not conn:
+            return
         cursor = conn.cursor()
         
         cursor.execute("SHOW TABLES")